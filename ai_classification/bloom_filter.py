@@ -0,0 +1,149 @@
+"""
+Bloom filter of AI classification cache keys.
+
+This module provides a compact, serializable set-membership filter. The cache
+manager uses it to answer "definitely not cached" without a database
+round-trip; a positive answer may be wrong with the configured probability
+and is confirmed against MongoDB.
+"""
+
+import hashlib
+import math
+import struct
+import threading
+from typing import Iterable, Union
+
+# Serialized layout: magic, bit count, hash count, item count, capacity,
+# false positive rate, then the bit array
+_HEADER = struct.Struct('>4sQIQQd')
+_MAGIC = b'DFBF'
+
+
+class BloomFilter:
+    """Thread-safe Bloom filter sized for a capacity and false positive rate."""
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        """
+        Initialize an empty filter.
+
+        Args:
+            capacity: Number of items the filter is sized for
+            false_positive_rate: Probability that an absent item is reported
+                present once the filter holds capacity items
+        """
+        capacity = max(1, capacity)
+        num_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self) -> bool:
+        """Whether more items were added than the filter is sized for."""
+        return self.count > self.capacity
+
+    @property
+    def size_bytes(self) -> int:
+        """Size of the bit array in bytes."""
+        return len(self._bits)
+
+    def add(self, key: Union[str, bytes]) -> bool:
+        """
+        Add a key.
+
+        Only keys that set a new bit are counted, so adding a key again (or
+        one indistinguishable from keys already added) leaves the count as it
+        is.
+
+        Args:
+            key: Key to add
+
+        Returns:
+            bool: True if the key was not already present
+        """
+        positions = self._positions(key)
+        with self._lock:
+            added = False
+            for position in positions:
+                mask = 1 << (position & 7)
+                if not self._bits[position >> 3] & mask:
+                    self._bits[position >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+            return added
+
+    def update(self, keys: Iterable[Union[str, bytes]]) -> None:
+        """
+        Add several keys.
+
+        Args:
+            keys: Keys to add
+        """
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: Union[str, bytes]) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the filter.
+
+        Returns:
+            bytes: Serialized filter
+        """
+        with self._lock:
+            header = _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.count,
+                                  self.capacity, self.false_positive_rate)
+            return header + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        """
+        Deserialize a filter.
+
+        Args:
+            data: Serialized filter
+
+        Returns:
+            BloomFilter: Filter
+
+        Raises:
+            ValueError: If the data is not a serialized filter
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated Bloom filter data")
+
+        magic, num_bits, num_hashes, count, capacity, false_positive_rate = _HEADER.unpack_from(data)
+        bits = data[_HEADER.size:]
+        if magic != _MAGIC or len(bits) != (num_bits + 7) // 8:
+            raise ValueError("Invalid Bloom filter data")
+
+        bloom_filter = cls.__new__(cls)
+        bloom_filter.capacity = capacity
+        bloom_filter.false_positive_rate = false_positive_rate
+        bloom_filter.num_bits = num_bits
+        bloom_filter.num_hashes = num_hashes
+        bloom_filter.count = count
+        bloom_filter._bits = bytearray(bits)
+        bloom_filter._lock = threading.Lock()
+        return bloom_filter
+
+    def _positions(self, key: Union[str, bytes]):
+        """Bit positions of a key, by double hashing one 128-bit digest."""
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
@@ -0,0 +1,880 @@
+"""
+Storage backends for the AI classification cache.
+
+This module provides the persistent tier behind CacheManager. Entries are
+documents keyed by a binary _id; the backend stores them, answers lookups
+and batch operations, and reports collection statistics. MongoDB is the
+shared backend used in production; SQLite (in WAL mode) is an embedded
+backend for offline runs, CI and single-node tools that have no MongoDB.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError, BulkWriteError
+
+from ai_classification.logging_config import setup_logging
+from ai_classification.mongo_clients import acquire_client, mongo_client_options, release_client
+
+logger = setup_logging(__name__)
+
+# Storage backends selectable with AI_CACHE_BACKEND
+CACHE_BACKENDS = ('mongo', 'sqlite')
+
+# Errors a backend raises when storage is unavailable or an operation fails
+CACHE_BACKEND_ERRORS = (PyMongoError, sqlite3.Error)
+
+# Fields bulk deletes can filter on
+DELETE_FIELDS = ('created_at', 'expires_at')
+
+# Field only entries written by earlier versions have (under their string key
+# rather than the _id digest); delete_batch() with it deletes those entries
+LEGACY_KEY_FIELD = 'cache_key'
+
+# MongoDB duplicate key error code
+_DUPLICATE_KEY_ERROR = 11000
+
+
+class CacheBackend(ABC):
+    """Persistent storage of cache entries keyed by binary _id."""
+
+    # Name reported as the cache tier of hits served by the backend
+    name = ''
+
+    def __init__(self, on_connect: Optional[Callable[[], None]] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            on_connect: Called once after the backend first connects
+        """
+        self.on_connect = on_connect
+
+    @abstractmethod
+    def connect(self) -> None:
+        """Connect to storage and prepare it, if not connected yet."""
+
+    @abstractmethod
+    def find(self, entry_id: bytes, min_expires_at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get an entry.
+
+        Args:
+            entry_id: Entry _id
+            min_expires_at: Only return the entry if it expires after this time
+
+        Returns:
+            Optional[Dict[str, Any]]: Entry, or None if not found
+        """
+
+    @abstractmethod
+    def find_many(self, entry_ids: List[bytes], min_expires_at: datetime) -> List[Dict[str, Any]]:
+        """
+        Get several entries in one round-trip.
+
+        Args:
+            entry_ids: Entry _ids
+            min_expires_at: Only return entries that expire after this time
+
+        Returns:
+            List[Dict[str, Any]]: Entries found
+        """
+
+    @abstractmethod
+    def replace(self, entry_id: bytes, entry: Dict[str, Any]) -> bool:
+        """
+        Insert or replace an entry.
+
+        Args:
+            entry_id: Entry _id
+            entry: Entry without its _id
+
+        Returns:
+            bool: True if the entry is new
+        """
+
+    @abstractmethod
+    def replace_many(self, entries: Dict[bytes, Dict[str, Any]]) -> Tuple[List[bytes], int]:
+        """
+        Insert or replace several entries in one round-trip.
+
+        Entries are written independently; a failure does not stop the rest.
+
+        Args:
+            entries: Entries without their _id, by _id
+
+        Returns:
+            Tuple[List[bytes], int]: _ids written and number of new entries
+        """
+
+    @abstractmethod
+    def insert_many(self, entries: List[Dict[str, Any]]) -> Tuple[List[Any], int]:
+        """
+        Insert entries, keeping any that already exist.
+
+        Args:
+            entries: Entries with their _id
+
+        Returns:
+            Tuple[List[Any], int]: _ids inserted and number already present
+        """
+
+    @abstractmethod
+    def touch(self, entry_ids: List[bytes], accessed_at: datetime) -> int:
+        """
+        Record an access time on entries.
+
+        Args:
+            entry_ids: Entry _ids
+            accessed_at: Access time
+
+        Returns:
+            int: Number of entries updated
+        """
+
+    @abstractmethod
+    def least_recently_used(self, limit: int) -> List[Tuple[bytes, Optional[str]]]:
+        """
+        Get the least recently used entries, never-accessed entries first.
+
+        Args:
+            limit: Maximum number of entries
+
+        Returns:
+            List[Tuple[bytes, Optional[str]]]: _id and cache key of each entry
+        """
+
+    @abstractmethod
+    def delete_ids(self, entry_ids: List[bytes]) -> int:
+        """
+        Delete entries.
+
+        Args:
+            entry_ids: Entry _ids
+
+        Returns:
+            int: Number of entries deleted
+        """
+
+    @abstractmethod
+    def delete_batch(self, field: Optional[str], before: Optional[datetime],
+                     after_id: Optional[Any], limit: int) -> Tuple[List[Any], int]:
+        """
+        Delete the next batch of entries in _id order.
+
+        Args:
+            field: Field to filter on (one of DELETE_FIELDS), LEGACY_KEY_FIELD
+                for entries written by earlier versions, or None for all entries
+            before: Delete entries whose field is earlier than this (unused
+                for LEGACY_KEY_FIELD)
+            after_id: Only consider entries after this _id
+            limit: Maximum entries per batch
+
+        Returns:
+            Tuple[List[Any], int]: _ids read for the batch and number deleted
+        """
+
+    @abstractmethod
+    def iter_ids(self, created_since: Optional[datetime] = None) -> Iterator[bytes]:
+        """
+        Stream the _ids of all entries.
+
+        Args:
+            created_since: Only entries created at or after this time
+
+        Returns:
+            Iterator[bytes]: Entry _ids
+        """
+
+    @abstractmethod
+    def iter_entries(self, min_expires_at: datetime, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the classification entries (not negative ones) that expire after a time.
+
+        Args:
+            min_expires_at: Only entries that expire after this time
+            batch_size: Entries fetched per round-trip
+
+        Returns:
+            Iterator[Dict[str, Any]]: Entries with their _id
+        """
+
+    @abstractmethod
+    def estimated_count(self) -> int:
+        """Get the approximate number of entries without a scan."""
+
+    @abstractmethod
+    def collection_stats(self) -> Dict[str, Any]:
+        """
+        Get storage statistics.
+
+        Returns:
+            Dict[str, Any]: count, size, storage_size and index_size in bytes,
+                and the creation times of the oldest and newest entries
+        """
+
+    @abstractmethod
+    def average_age_hours(self) -> float:
+        """Get the average entry age in hours (scans all entries)."""
+
+    def backfill_purge_at(self) -> int:
+        """
+        Give entries written before purge_at existed one.
+
+        Returns:
+            int: Number of entries updated
+        """
+        return 0
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the connection, if open."""
+
+
+class MongoCacheBackend(CacheBackend):
+    """Cache entries in a MongoDB collection, purged by a TTL index on purge_at."""
+
+    name = 'mongo'
+
+    def __init__(self, mongo_uri: str, db_name: str, collection_name: str,
+                 track_access: bool = False, on_connect: Optional[Callable[[], None]] = None,
+                 client_options: Optional[Dict[str, Any]] = None, stale_grace: int = 0):
+        """
+        Initialize the backend.
+
+        Args:
+            mongo_uri: MongoDB connection URI
+            db_name: Database name
+            collection_name: Collection name
+            track_access: Index last access times for LRU eviction
+            on_connect: Called once after the backend first connects
+            client_options: MongoClient keyword arguments; the client is
+                shared with other components using the same URI and options
+            stale_grace: Seconds past expiry that legacy entries without
+                purge_at are kept when backfilled
+        """
+        super().__init__(on_connect)
+        self.mongo_uri = mongo_uri
+        self.client_options = client_options or {}
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.track_access = track_access
+        self.stale_grace = stale_grace
+        self.client = None
+        self.collection = None
+
+    def connect(self) -> None:
+        """Connect to MongoDB and ensure the collection's indexes."""
+        self._get_collection()
+
+    def _get_collection(self) -> Collection:
+        """
+        Get the MongoDB collection, initializing connection if needed.
+
+        Returns:
+            Collection: MongoDB collection
+        """
+        if self.client is None:
+            self.client = acquire_client(self.mongo_uri, **self.client_options)
+            db = self.client[self.db_name]
+            self.collection = db[self.collection_name]
+
+            # Ensure TTL index exists; entries are purged only once the
+            # stale grace window after expiry has passed
+            try:
+                self.collection.create_index(
+                    "purge_at",
+                    expireAfterSeconds=0,
+                    background=True
+                )
+                self._drop_legacy_indexes()
+                # Serves the oldest/newest entry lookups in collection_stats
+                # and the Bloom filter top-up's created_at range
+                self.collection.create_index("created_at", background=True)
+                if self.track_access:
+                    self.collection.create_index("last_accessed_at", background=True)
+                logger.debug("Ensured cache collection indexes")
+            except PyMongoError as e:
+                logger.warning(f"Failed to create cache indexes: {e}")
+
+            if self.on_connect is not None:
+                self.on_connect()
+
+        return self.collection
+
+    def _drop_legacy_indexes(self) -> None:
+        """
+        Drop indexes left by earlier versions of the cache.
+
+        The TTL index on expires_at would purge entries still within the
+        grace window, and the unique index on cache_key is replaced by the
+        _id digest (entries without the field would collide on it).
+        """
+        for name, index in self.collection.index_information().items():
+            key = index.get('key')
+            if key == [('expires_at', 1)] and 'expireAfterSeconds' in index:
+                # Entries written before purge_at existed would otherwise never be purged
+                self._backfill_purge_at(self.collection)
+            elif key != [('cache_key', 1)]:
+                continue
+            self.collection.drop_index(name)
+            logger.info(f"Dropped legacy cache index {name}")
+
+    def _backfill_purge_at(self, collection: Collection) -> int:
+        """
+        Give entries written by earlier versions a purge_at.
+
+        Expiring entries without one are purged the stale grace window after
+        expires_at. Entries with an access time are kept for LRU eviction.
+
+        Args:
+            collection: Cache collection
+
+        Returns:
+            int: Number of entries updated
+        """
+        result = collection.update_many(
+            {
+                'purge_at': {'$exists': False},
+                'last_accessed_at': {'$exists': False},
+                'expires_at': {'$type': 'date'}
+            },
+            [{'$set': {'purge_at': {'$add': ['$expires_at', self.stale_grace * 1000]}}}]
+        )
+        if result.modified_count:
+            logger.info(f"Backfilled purge_at on {result.modified_count} cache entries")
+        return result.modified_count
+
+    def find(self, entry_id: bytes, min_expires_at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        query = {'_id': entry_id}
+        if min_expires_at is not None:
+            query['expires_at'] = {'$gt': min_expires_at}
+        return self._get_collection().find_one(query)
+
+    def find_many(self, entry_ids: List[bytes], min_expires_at: datetime) -> List[Dict[str, Any]]:
+        return list(self._get_collection().find({
+            '_id': {'$in': entry_ids},
+            'expires_at': {'$gt': min_expires_at}
+        }))
+
+    def replace(self, entry_id: bytes, entry: Dict[str, Any]) -> bool:
+        # Upsert to handle race conditions
+        result = self._get_collection().replace_one({'_id': entry_id}, entry, upsert=True)
+        return result.upserted_id is not None
+
+    def replace_many(self, entries: Dict[bytes, Dict[str, Any]]) -> Tuple[List[bytes], int]:
+        operations = [
+            ReplaceOne({'_id': entry_id}, entry, upsert=True)
+            for entry_id, entry in entries.items()
+        ]
+
+        try:
+            result = self._get_collection().bulk_write(operations, ordered=False)
+            return list(entries), int(result.upserted_count)
+
+        except BulkWriteError as e:
+            # Unordered writes carry on past failures; keep the ones that succeeded
+            failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+            logger.warning(f"Batch cache storage failed for {len(failed_indexes)} entries: {e}")
+            written = [entry_id for index, entry_id in enumerate(entries) if index not in failed_indexes]
+            return written, e.details.get('nUpserted', 0)
+
+    def insert_many(self, entries: List[Dict[str, Any]]) -> Tuple[List[Any], int]:
+        try:
+            return list(self._get_collection().insert_many(entries, ordered=False).inserted_ids), 0
+
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            duplicates = sum(1 for error in errors if error.get('code') == _DUPLICATE_KEY_ERROR)
+            if duplicates < len(errors):
+                logger.warning(f"Failed to insert {len(errors) - duplicates} cache entries: {e}")
+            failed_indexes = {error['index'] for error in errors}
+            inserted = [entry['_id'] for index, entry in enumerate(entries) if index not in failed_indexes]
+            return inserted, duplicates
+
+    def touch(self, entry_ids: List[bytes], accessed_at: datetime) -> int:
+        result = self._get_collection().update_many(
+            {'_id': {'$in': entry_ids}},
+            {'$set': {'last_accessed_at': accessed_at}}
+        )
+        return result.modified_count
+
+    def least_recently_used(self, limit: int) -> List[Tuple[bytes, Optional[str]]]:
+        victims = (self._get_collection().find({}, {'_id': 1, 'metadata.cache_key': 1})
+                   .sort('last_accessed_at', ASCENDING)
+                   .limit(limit))
+        return [(victim['_id'], victim.get('metadata', {}).get('cache_key')) for victim in victims]
+
+    def delete_ids(self, entry_ids: List[bytes]) -> int:
+        return self._get_collection().delete_many({'_id': {'$in': entry_ids}}).deleted_count
+
+    def delete_batch(self, field: Optional[str], before: Optional[datetime],
+                     after_id: Optional[Any], limit: int) -> Tuple[List[Any], int]:
+        collection = self._get_collection()
+        if field == LEGACY_KEY_FIELD:
+            query = {field: {'$exists': True}}
+        else:
+            query = {field: {'$lt': before}} if field is not None else {}
+
+        batch_query = dict(query)
+        if after_id is not None:
+            # $gt on _id only matches ids of the same BSON type, which would
+            # skip legacy ObjectId and string ids; $expr compares across types
+            # in the same order as the _id sort
+            batch_query['$expr'] = {'$gt': ['$_id', after_id]}
+
+        ids = [entry['_id'] for entry in collection.find(batch_query, {'_id': 1})
+               .sort('_id', ASCENDING)
+               .limit(limit)]
+        if not ids:
+            return ids, 0
+
+        # Re-apply the filter so entries rewritten since the read are kept
+        result = collection.delete_many({**query, '_id': {'$in': ids}})
+        return ids, result.deleted_count
+
+    def iter_ids(self, created_since: Optional[datetime] = None) -> Iterator[bytes]:
+        query = {'created_at': {'$gte': created_since}} if created_since is not None else {}
+        for entry in self._get_collection().find(query, {'_id': 1}).batch_size(10000):
+            yield entry['_id']
+
+    def iter_entries(self, min_expires_at: datetime, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        return iter(self._get_collection().find({
+            'expires_at': {'$gt': min_expires_at},
+            'failure': {'$exists': False}
+        }).batch_size(batch_size))
+
+    def estimated_count(self) -> int:
+        return self._get_collection().estimated_document_count()
+
+    def collection_stats(self) -> Dict[str, Any]:
+        collection = self._get_collection()
+        coll_stats = collection.database.command("collStats", self.collection_name)
+
+        # purge_at order only matches creation order while every entry has
+        # the same TTL, and LRU entries have no purge_at, so sort on created_at
+        boundaries = {}
+        for name, direction in (('oldest_entry', ASCENDING), ('newest_entry', DESCENDING)):
+            entry = next(iter(collection.find({}, {'created_at': 1, '_id': 0})
+                              .sort('created_at', direction).limit(1)), None)
+            boundaries[name] = entry.get('created_at') if entry else None
+
+        return {
+            'count': coll_stats.get('count', 0),
+            'size': coll_stats.get('size', 0),
+            'storage_size': coll_stats.get('storageSize', 0),
+            'index_size': coll_stats.get('totalIndexSize', 0),
+            **boundaries
+        }
+
+    def average_age_hours(self) -> float:
+        pipeline = [
+            {
+                '$group': {
+                    '_id': None,
+                    'avg_age_hours': {
+                        '$avg': {
+                            '$divide': [
+                                {'$subtract': ['$$NOW', '$created_at']},
+                                3600000  # Convert to hours
+                            ]
+                        }
+                    }
+                }
+            }
+        ]
+
+        stats_result = list(self._get_collection().aggregate(pipeline))
+        return stats_result[0].get('avg_age_hours', 0) if stats_result else 0
+
+    def backfill_purge_at(self) -> int:
+        return self._backfill_purge_at(self._get_collection())
+
+    def close(self) -> None:
+        if self.client:
+            release_client(self.client)
+            self.client = None
+            logger.info("Released cache MongoDB connection")
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache entries in a local SQLite database in WAL mode.
+
+    Times are stored as Unix timestamps in indexed columns, and the rest of
+    each entry as JSON. Expired entries are purged on connect and then at
+    most once a minute on writes, like MongoDB's TTL monitor. One
+    connection is shared by all threads, serialized by a lock.
+    """
+
+    name = 'sqlite'
+
+    # Seconds between purges of entries past purge_at
+    PURGE_INTERVAL = 60
+
+    # Maximum bound parameters per statement
+    _MAX_PARAMETERS = 500
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS cache_entries (
+            id BLOB PRIMARY KEY,
+            cache_key TEXT,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            purge_at REAL,
+            last_accessed_at REAL,
+            negative INTEGER NOT NULL DEFAULT 0,
+            document TEXT NOT NULL
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS cache_entries_created_at ON cache_entries (created_at)",
+        "CREATE INDEX IF NOT EXISTS cache_entries_expires_at ON cache_entries (expires_at)",
+        "CREATE INDEX IF NOT EXISTS cache_entries_purge_at ON cache_entries (purge_at)",
+        "CREATE INDEX IF NOT EXISTS cache_entries_last_accessed_at ON cache_entries (last_accessed_at)"
+    )
+
+    _COLUMNS = 'id, cache_key, created_at, expires_at, purge_at, last_accessed_at, negative, document'
+
+    def __init__(self, path: str, on_connect: Optional[Callable[[], None]] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            path: Database file (':memory:' for a private in-memory database)
+            on_connect: Called once after the backend first connects
+        """
+        super().__init__(on_connect)
+        self.path = path
+        self.connection = None
+        self._lock = threading.RLock()
+        self._next_purge = 0.0
+
+    def connect(self) -> None:
+        """Open the database and create the schema."""
+        self._get_connection()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Get the database connection, opening it if needed.
+
+        Returns:
+            sqlite3.Connection: Database connection
+        """
+        with self._lock:
+            if self.connection is not None:
+                return self.connection
+
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+            self.connection = connection
+            self._purge_expired()
+            logger.debug(f"Opened SQLite cache database {self.path}")
+
+        if self.on_connect is not None:
+            self.on_connect()
+
+        return connection
+
+    def _purge_expired(self) -> None:
+        """Delete entries past their purge time; the caller must hold the lock."""
+        deleted = self.connection.execute(
+            "DELETE FROM cache_entries WHERE purge_at <= ?", (_to_timestamp(datetime.utcnow()),)
+        ).rowcount
+        self._next_purge = time.time() + self.PURGE_INTERVAL
+        if deleted:
+            logger.debug(f"Purged {deleted} expired cache entries")
+
+    def _execute(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        """Execute one query on the shared connection and fetch its rows under the lock."""
+        connection = self._get_connection()
+        with self._lock:
+            return connection.execute(sql, parameters).fetchall()
+
+    def _write(self, statements: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        Run writes in one transaction, purging expired entries when due.
+
+        Args:
+            statements: Function issuing the writes on the connection
+
+        Returns:
+            Any: Result of the function
+        """
+        connection = self._get_connection()
+        with self._lock:
+            if time.time() >= self._next_purge:
+                self._purge_expired()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(connection)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return result
+
+    def _existing_ids(self, connection: sqlite3.Connection, entry_ids: List[bytes]) -> set:
+        """Get which of the _ids are stored; the caller must hold the lock."""
+        existing = set()
+        for chunk in _chunks(entry_ids, self._MAX_PARAMETERS):
+            existing.update(row[0] for row in connection.execute(
+                f"SELECT id FROM cache_entries WHERE id IN ({_placeholders(chunk)})", chunk
+            ))
+        return existing
+
+    def find(self, entry_id: bytes, min_expires_at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        if min_expires_at is None:
+            rows = self._execute(f"SELECT {self._COLUMNS} FROM cache_entries WHERE id = ?", (entry_id,))
+        else:
+            rows = self._execute(f"SELECT {self._COLUMNS} FROM cache_entries WHERE id = ? AND expires_at > ?",
+                                 (entry_id, _to_timestamp(min_expires_at)))
+        return _row_to_entry(rows[0]) if rows else None
+
+    def find_many(self, entry_ids: List[bytes], min_expires_at: datetime) -> List[Dict[str, Any]]:
+        entries = []
+        for chunk in _chunks(entry_ids, self._MAX_PARAMETERS):
+            rows = self._execute(
+                f"SELECT {self._COLUMNS} FROM cache_entries "
+                f"WHERE id IN ({_placeholders(chunk)}) AND expires_at > ?",
+                (*chunk, _to_timestamp(min_expires_at))
+            )
+            entries.extend(_row_to_entry(row) for row in rows)
+        return entries
+
+    def replace(self, entry_id: bytes, entry: Dict[str, Any]) -> bool:
+        def statements(connection):
+            inserted = not self._existing_ids(connection, [entry_id])
+            connection.execute(f"INSERT OR REPLACE INTO cache_entries ({self._COLUMNS}) "
+                               f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _entry_to_row(entry_id, entry))
+            return inserted
+
+        return self._write(statements)
+
+    def replace_many(self, entries: Dict[bytes, Dict[str, Any]]) -> Tuple[List[bytes], int]:
+        def statements(connection):
+            existing = self._existing_ids(connection, list(entries))
+            connection.executemany(
+                f"INSERT OR REPLACE INTO cache_entries ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [_entry_to_row(entry_id, entry) for entry_id, entry in entries.items()]
+            )
+            return list(entries), len(entries) - len(existing)
+
+        return self._write(statements)
+
+    def insert_many(self, entries: List[Dict[str, Any]]) -> Tuple[List[Any], int]:
+        def statements(connection):
+            inserted = [entry['_id'] for entry in entries if connection.execute(
+                f"INSERT OR IGNORE INTO cache_entries ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                _entry_to_row(entry['_id'], entry)
+            ).rowcount]
+            return inserted, len(entries) - len(inserted)
+
+        return self._write(statements)
+
+    def touch(self, entry_ids: List[bytes], accessed_at: datetime) -> int:
+        def statements(connection):
+            updated = 0
+            for chunk in _chunks(entry_ids, self._MAX_PARAMETERS):
+                updated += connection.execute(
+                    f"UPDATE cache_entries SET last_accessed_at = ? WHERE id IN ({_placeholders(chunk)})",
+                    (_to_timestamp(accessed_at), *chunk)
+                ).rowcount
+            return updated
+
+        return self._write(statements)
+
+    def least_recently_used(self, limit: int) -> List[Tuple[bytes, Optional[str]]]:
+        # NULLs sort first, so never-accessed entries go first
+        return [tuple(row) for row in self._execute(
+            "SELECT id, cache_key FROM cache_entries ORDER BY last_accessed_at ASC LIMIT ?", (limit,)
+        )]
+
+    def delete_ids(self, entry_ids: List[bytes]) -> int:
+        def statements(connection):
+            deleted = 0
+            for chunk in _chunks(entry_ids, self._MAX_PARAMETERS):
+                deleted += connection.execute(
+                    f"DELETE FROM cache_entries WHERE id IN ({_placeholders(chunk)})", chunk
+                ).rowcount
+            return deleted
+
+        return self._write(statements)
+
+    def delete_batch(self, field: Optional[str], before: Optional[datetime],
+                     after_id: Optional[Any], limit: int) -> Tuple[List[Any], int]:
+        if field == LEGACY_KEY_FIELD:
+            # SQLite caches were never written by the versions with string keys
+            return [], 0
+
+        conditions, parameters = [], []
+        if field is not None:
+            if field not in DELETE_FIELDS:
+                raise ValueError(f"Cannot delete cache entries by {field!r}")
+            conditions.append(f"{field} < ?")
+            parameters.append(_to_timestamp(before))
+        if after_id is not None:
+            conditions.append("id > ?")
+            parameters.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        def statements(connection):
+            ids = [row[0] for row in connection.execute(
+                f"SELECT id FROM cache_entries {where} ORDER BY id LIMIT ?", (*parameters, limit)
+            )]
+            if not ids:
+                return ids, 0
+            deleted = connection.execute(
+                f"DELETE FROM cache_entries WHERE id IN ({_placeholders(ids)})", ids
+            ).rowcount
+            return ids, deleted
+
+        return self._write(statements)
+
+    def iter_ids(self, created_since: Optional[datetime] = None) -> Iterator[bytes]:
+        if created_since is None:
+            rows = self._execute("SELECT id FROM cache_entries")
+        else:
+            rows = self._execute("SELECT id FROM cache_entries WHERE created_at >= ?",
+                                 (_to_timestamp(created_since),))
+        return (row[0] for row in rows)
+
+    def iter_entries(self, min_expires_at: datetime, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        last_id = b''
+        while True:
+            rows = self._execute(
+                f"SELECT {self._COLUMNS} FROM cache_entries "
+                f"WHERE id > ? AND expires_at > ? AND negative = 0 ORDER BY id LIMIT ?",
+                (last_id, _to_timestamp(min_expires_at), batch_size)
+            )
+            for row in rows:
+                yield _row_to_entry(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def estimated_count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM cache_entries")[0][0]
+
+    def collection_stats(self) -> Dict[str, Any]:
+        count, size, oldest, newest = self._execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(document)), 0), MIN(created_at), MAX(created_at) "
+            "FROM cache_entries"
+        )[0]
+        page_count = self._execute("PRAGMA page_count")[0][0]
+        page_size = self._execute("PRAGMA page_size")[0][0]
+
+        return {
+            'count': count,
+            'size': size,
+            'storage_size': page_count * page_size,
+            'index_size': 0,
+            'oldest_entry': _from_timestamp(oldest),
+            'newest_entry': _from_timestamp(newest)
+        }
+
+    def average_age_hours(self) -> float:
+        average_created_at = self._execute("SELECT AVG(created_at) FROM cache_entries")[0][0]
+        if average_created_at is None:
+            return 0
+        return (_to_timestamp(datetime.utcnow()) - average_created_at) / 3600
+
+    def close(self) -> None:
+        with self._lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+                logger.info(f"Closed SQLite cache database {self.path}")
+
+
+def create_cache_backend(config: Dict[str, Any], mongo_uri: str, db_name: str, collection_name: str,
+                         track_access: bool = False,
+                         on_connect: Optional[Callable[[], None]] = None) -> CacheBackend:
+    """
+    Create the cache backend selected by AI_CACHE_BACKEND.
+
+    Args:
+        config: Configuration dictionary
+        mongo_uri: MongoDB connection URI
+        db_name: Database name
+        collection_name: Collection name
+        track_access: Index last access times for LRU eviction
+        on_connect: Called once after the backend first connects
+
+    Returns:
+        CacheBackend: Cache backend
+    """
+    backend = config['AI_CACHE_BACKEND']
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(config['AI_CACHE_SQLITE_PATH'], on_connect=on_connect)
+
+    if backend != 'mongo':
+        logger.warning(f"Unknown cache backend {backend!r}, using 'mongo'")
+    return MongoCacheBackend(mongo_uri, db_name, collection_name,
+                             track_access=track_access, on_connect=on_connect,
+                             client_options=mongo_client_options(config),
+                             stale_grace=config['AI_CACHE_STALE_GRACE'])
+
+
+def _to_timestamp(value: datetime) -> float:
+    """Convert a naive UTC datetime to a Unix timestamp."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_timestamp(value: Optional[float]) -> Optional[datetime]:
+    """Convert a Unix timestamp to a naive UTC datetime."""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+def _entry_to_row(entry_id: bytes, entry: Dict[str, Any]) -> Tuple:
+    """Convert an entry to a cache_entries row."""
+    document = {key: value for key, value in entry.items()
+                if key not in ('_id', 'created_at', 'expires_at', 'purge_at', 'last_accessed_at')}
+    purge_at = entry.get('purge_at')
+    last_accessed_at = entry.get('last_accessed_at')
+    return (
+        entry_id,
+        entry.get('metadata', {}).get('cache_key'),
+        _to_timestamp(entry['created_at']),
+        _to_timestamp(entry['expires_at']),
+        _to_timestamp(purge_at) if purge_at is not None else None,
+        _to_timestamp(last_accessed_at) if last_accessed_at is not None else None,
+        int('failure' in entry),
+        json.dumps(document, default=str)
+    )
+
+
+def _row_to_entry(row: Tuple) -> Dict[str, Any]:
+    """Convert a cache_entries row to an entry."""
+    entry_id, _, created_at, expires_at, purge_at, last_accessed_at, _, document = row
+    entry = {
+        '_id': entry_id,
+        **json.loads(document),
+        'created_at': _from_timestamp(created_at),
+        'expires_at': _from_timestamp(expires_at)
+    }
+    if purge_at is not None:
+        entry['purge_at'] = _from_timestamp(purge_at)
+    if last_accessed_at is not None:
+        entry['last_accessed_at'] = _from_timestamp(last_accessed_at)
+    return entry
+
+
+def _chunks(values: List[Any], size: int) -> Iterator[List[Any]]:
+    """Split a list into chunks of at most size values."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _placeholders(values: List[Any]) -> str:
+    """Get the parameter placeholders for an IN list."""
+    return ', '.join('?' * len(values))
@@ -2,25 +2,84 @@
 Cache manager for AI classification results.
 
 This module provides caching functionality for AI classification results,
-reducing redundant API calls and improving performance.
+reducing redundant API calls and improving performance. Entries are kept in
+an in-process tier in front of a persistent backend (MongoDB, or SQLite for
+offline runs; see cache_backend).
 """
 
+import copy
+import gzip
 import hashlib
+import math
+import os
+import struct
+import threading
 import time
 import json
 from typing import Dict, Any, Optional, List, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.collection import Collection
-from pymongo.errors import PyMongoError, DuplicateKeyError
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
 
+from ai_classification.cache_backend import CACHE_BACKEND_ERRORS, LEGACY_KEY_FIELD, create_cache_backend
 from ai_classification.config import get_config
 from ai_classification.logging_config import setup_logging
+from ai_classification.memory_cache import MemoryCache
+from ai_classification.bloom_filter import BloomFilter
+from ai_classification.metrics import LatencyHistogram
 
 logger = setup_logging(__name__)
 
+# Prefix of request-derived cache keys; bump the version when the key
+# derivation changes so old entries are never matched
+CACHE_KEY_PREFIX = 'drug-classification:v2:'
+
+# Eviction policies: entries expire by age ('ttl'), or never expire and the
+# least recently used are evicted once the collection exceeds its caps ('lru')
+EVICTION_POLICIES = ('ttl', 'lru')
+
+# Expiry of entries that never expire by age
+NEVER_EXPIRES = datetime(9999, 12, 31)
+
+# Length of the binary digest of a cache key stored as the entry's _id
+CACHE_ID_BYTES = 16
+
+# Prefix of a saved Bloom filter: format marker and Unix time its keys were
+# read up to
+_BLOOM_FILE_HEADER = struct.Struct('>4sd')
+_BLOOM_FILE_MAGIC = b'DFK2'
+
+# Keys created this long before the last Bloom filter read are read again, to
+# catch entries written by other processes while it ran or with skewed clocks
+_BLOOM_REFRESH_OVERLAP = timedelta(minutes=5)
+
+# Cache snapshots: gzip-compressed JSON lines, a header line, one line per
+# entry in extended JSON, and a trailer line with the entry count and the
+# SHA-256 digest of the entry lines
+SNAPSHOT_FORMAT = 'drug-classification-cache-snapshot'
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+
+
+def cache_id(cache_key: str) -> bytes:
+    """
+    Get the _id of the cache entry for a key.
+    
+    Entries are keyed by a fixed-length binary digest of the cache key, so
+    lookups use the primary key index and no separate key index is needed.
+    The key itself is kept in the entry's metadata.
+    
+    Args:
+        cache_key: Cache key
+        
+    Returns:
+        bytes: Entry _id
+    """
+    return hashlib.blake2b(cache_key.encode('utf-8'), digest_size=CACHE_ID_BYTES).digest()
+
 
 class CacheManager:
     """Manager for AI classification result caching.
@@ -39,6 +98,9 @@ class CacheManager:
             mongo_uri: MongoDB connection URI (defaults to config)
             db_name: Database name
             collection_name: Collection name
+            
+        The persistent backend is chosen by AI_CACHE_BACKEND; the MongoDB
+        arguments are ignored by the SQLite backend.
         """
         config = get_config()
         
@@ -47,115 +109,369 @@ class CacheManager:
         self.db_name = db_name
         self.collection_name = collection_name
         self.ttl = config['AI_CLASSIFICATION_CACHE_TTL']
+        self.stale_grace = config['AI_CACHE_STALE_GRACE']
+        self.negative_ttl = config['AI_CACHE_NEGATIVE_TTL']
+        
+        self.eviction_policy = config['AI_CACHE_EVICTION_POLICY']
+        if self.eviction_policy not in EVICTION_POLICIES:
+            logger.warning(f"Unknown cache eviction policy {self.eviction_policy!r}, using 'ttl'")
+            self.eviction_policy = 'ttl'
+        self.max_entries = config['AI_CACHE_MAX_ENTRIES']
+        self.max_bytes = config['AI_CACHE_MAX_BYTES']
+        
+        # Accesses recorded for the LRU policy, written to the backend in batches
+        self.touch_batch_size = config['AI_CACHE_TOUCH_BATCH_SIZE']
+        
+        # Bulk deletes run in batches with a pause between them, so clearing a
+        # large cache does not starve live traffic or lag replication
+        self.delete_batch_size = config['AI_CACHE_DELETE_BATCH_SIZE']
+        self.delete_pause = config['AI_CACHE_DELETE_PAUSE']
+        self._pending_touches = set()
+        self._touch_lock = threading.Lock()
         
-        # Initialize MongoDB client
-        self.client = None
-        self.collection = None
+        # Filter of existing keys, loaded on connect, that lets certain
+        # misses skip the backend
+        self.bloom_enabled = config['ENABLE_CACHE_BLOOM_FILTER']
+        self.bloom_capacity = config['AI_CACHE_BLOOM_CAPACITY']
+        self.bloom_false_positive_rate = config['AI_CACHE_BLOOM_FP_RATE']
+        self.bloom_path = config['AI_CACHE_BLOOM_PATH']
+        self.bloom_filter = None
+        self._bloom_built_at = None
+        
+        # Persistent tier, connected on first use
+        self.backend = create_cache_backend(
+            config, self.mongo_uri, db_name, collection_name,
+            track_access=self.eviction_policy == 'lru',
+            on_connect=self._on_connect
+        )
+        
+        # In-process tier in front of the backend
+        self.memory_cache = MemoryCache(
+            max_entries=config['AI_CACHE_MEMORY_MAX_ENTRIES'],
+            max_bytes=config['AI_CACHE_MEMORY_MAX_BYTES'],
+            ttl=config['AI_CACHE_MEMORY_TTL']
+        )
         
         # Initialize metrics tracking
+        self._metrics_lock = threading.Lock()
         self.metrics = {
             'cache_hits': 0,
             'cache_misses': 0,
+            'memory_hits': 0,
+            'memory_misses': 0,
+            'mongo_hits': 0,
+            'mongo_misses': 0,
+            'stale_hits': 0,
+            'negative_hits': 0,
+            'negative_stores': 0,
             'cache_stores': 0,
             'cache_errors': 0,
             'total_requests': 0,
-            'avg_retrieval_time': 0.0,
-            'avg_storage_time': 0.0,
             'cache_size_bytes': 0,
-            'expired_entries_cleaned': 0
+            'expired_entries_cleaned': 0,
+            'lru_evictions': 0,
+            'bloom_rejections': 0
+        }
+        
+        # Streaming latency statistics (constant memory)
+        self.retrieval_latency = LatencyHistogram()
+        self.storage_latency = LatencyHistogram()
+        
+        # Collection-level statistics, refreshed periodically or on demand and
+        # kept current between refreshes from this process's own writes
+        self.stats_refresh_interval = config['AI_CACHE_STATS_REFRESH_INTERVAL']
+        self._collection_stats = {
+            'total_cached_entries': 0,
+            'actual_cache_size_bytes': 0,
+            'cache_storage_size_bytes': 0,
+            'cache_index_size_bytes': 0,
+            'oldest_entry': None,
+            'newest_entry': None,
+            'stats_refreshed_at': None
         }
+        self._stats_lock = threading.Lock()
+        self._stats_stop = threading.Event()
+        self._stats_thread = None
         
-        # Track retrieval times for averaging
-        self._retrieval_times = []
-        self._storage_times = []
+        if self.eviction_policy == 'lru':
+            logger.info(f"Initialized cache manager with LRU eviction (max entries: {self.max_entries or 'unlimited'}, "
+                        f"max bytes: {self.max_bytes or 'unlimited'})")
+        else:
+            logger.info(f"Initialized cache manager with TTL: {self.ttl}s, stale grace: {self.stale_grace}s")
+    
+    def _on_connect(self) -> None:
+        """Load the Bloom filter and start statistics refreshes once the backend connects."""
+        if self.bloom_enabled:
+            self.load_bloom_filter()
         
-        logger.info(f"Initialized cache manager with TTL: {self.ttl}s")
+        self._start_stats_refresher()
     
-    def _get_collection(self) -> Collection:
+    def load_bloom_filter(self) -> Optional[BloomFilter]:
         """
-        Get the MongoDB collection, initializing connection if needed.
+        Load the Bloom filter of existing cache keys.
+        
+        The filter holds entry _ids. A filter saved at AI_CACHE_BLOOM_PATH is
+        loaded and topped up with entries stored since it was saved; otherwise
+        the filter is built by streaming the _ids of the backend (projected,
+        nothing else).
+        Keys stored by other processes afterwards are added by
+        refresh_bloom_filter(), which the statistics refresher runs every
+        AI_CACHE_STATS_REFRESH_INTERVAL seconds; until then they are seen as
+        misses, which can only cause a redundant classification, never a
+        wrong result.
         
         Returns:
-            Collection: MongoDB collection
+            Optional[BloomFilter]: Loaded filter, or None if it could not be built
         """
-        if self.client is None:
-            self.client = MongoClient(self.mongo_uri)
-            db = self.client[self.db_name]
-            self.collection = db[self.collection_name]
-            
-            # Ensure TTL index exists
+        start_time = time.time()
+        bloom_filter = None
+        created_since = None
+        
+        if self.bloom_path and os.path.exists(self.bloom_path):
             try:
-                self.collection.create_index(
-                    "expires_at", 
-                    expireAfterSeconds=0,
-                    background=True
-                )
-                self.collection.create_index(
-                    "cache_key",
-                    unique=True,
-                    background=True
-                )
-                logger.debug("Ensured cache collection indexes")
-            except PyMongoError as e:
-                logger.warning(f"Failed to create cache indexes: {e}")
+                with open(self.bloom_path, 'rb') as f:
+                    data = f.read()
+                magic, built_at = _BLOOM_FILE_HEADER.unpack_from(data)
+                if magic != _BLOOM_FILE_MAGIC:
+                    raise ValueError("not a saved cache key filter")
+                bloom_filter = BloomFilter.from_bytes(data[_BLOOM_FILE_HEADER.size:])
+                self._bloom_built_at = datetime.utcfromtimestamp(built_at)
+                created_since = self._bloom_built_at
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Ignoring unreadable Bloom filter {self.bloom_path}: {e}")
+                bloom_filter = None
         
-        return self.collection
+        try:
+            if bloom_filter is None:
+                self._bloom_built_at = datetime.utcnow()
+                capacity = max(self.bloom_capacity, 2 * self.backend.estimated_count())
+                bloom_filter = BloomFilter(capacity, self.bloom_false_positive_rate)
+            
+            for entry_id in self.backend.iter_ids(created_since):
+                bloom_filter.add(entry_id)
+            
+        except CACHE_BACKEND_ERRORS as e:
+            logger.warning(f"Failed to load cache keys into Bloom filter: {e}")
+            self.bloom_filter = None
+            return None
+        
+        self.bloom_filter = bloom_filter
+        logger.info(f"Loaded Bloom filter of {len(bloom_filter)} cache keys "
+                    f"({bloom_filter.size_bytes} bytes) in {time.time() - start_time:.2f}s")
+        return bloom_filter
     
-    def generate_cache_key(self, drug_data: Dict[str, Any]) -> str:
+    def refresh_bloom_filter(self) -> int:
+        """
+        Add keys stored since the Bloom filter was last read, by any process.
+        
+        Entries are selected by created_at, which every write (store, import)
+        sets to the time of writing. Keys read again in the overlap, or
+        already added by this process, are not counted twice.
+        
+        Returns:
+            int: Number of keys read
         """
-        Generate a cache key for the given drug data.
+        bloom_filter = self.bloom_filter
+        if bloom_filter is None or self._bloom_built_at is None:
+            return 0
+        
+        read_at = datetime.utcnow()
+        try:
+            entry_ids = list(self.backend.iter_ids(self._bloom_built_at - _BLOOM_REFRESH_OVERLAP))
+        except CACHE_BACKEND_ERRORS as e:
+            logger.warning(f"Failed to refresh Bloom filter: {e}")
+            return 0
+        
+        bloom_filter.update(entry_ids)
+        self._bloom_built_at = read_at
+        logger.debug(f"Refreshed Bloom filter with {len(entry_ids)} recently stored cache keys")
+        return len(entry_ids)
+    
+    def save_bloom_filter(self, path: Optional[str] = None) -> bool:
+        """
+        Save the Bloom filter so other workers can load it without a scan.
         
         Args:
-            drug_data: Drug data dictionary
+            path: File to write (defaults to AI_CACHE_BLOOM_PATH)
             
         Returns:
-            str: Cache key
+            bool: True if saved, False if there is no filter or no path
+        """
+        path = path or self.bloom_path
+        if self.bloom_filter is None or self._bloom_built_at is None or not path:
+            return False
+        
+        built_at = self._bloom_built_at.replace(tzinfo=timezone.utc).timestamp()
+        data = _BLOOM_FILE_HEADER.pack(_BLOOM_FILE_MAGIC, built_at) + self.bloom_filter.to_bytes()
+        
+        # Write atomically so a concurrently starting worker never reads half a file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        
+        logger.info(f"Saved Bloom filter of {len(self.bloom_filter)} cache keys to {path}")
+        return True
+    
+    def _bloom_rejects(self, cache_key: str) -> bool:
+        """
+        Check whether the Bloom filter proves a key is not cached.
+        
+        Args:
+            cache_key: Cache key
+            
+        Returns:
+            bool: True if the key is certainly absent
+        """
+        bloom_filter = self.bloom_filter
+        return bloom_filter is not None and not bloom_filter.saturated and cache_id(cache_key) not in bloom_filter
+    
+    def _bloom_add(self, cache_keys: List[str]) -> None:
+        """
+        Add stored keys to the Bloom filter.
+        
+        Args:
+            cache_keys: Keys stored
         """
-        # Extract key fields for cache key
-        set_id = drug_data.get('setId', '')
-        drug_name = drug_data.get('drugName', '')
-        generic_name = drug_data.get('label', {}).get('genericName', '')
+        if self.bloom_filter is not None:
+            self.bloom_filter.update(cache_id(cache_key) for cache_key in cache_keys)
+    
+    def _start_stats_refresher(self) -> None:
+        """Start the background collection statistics refresh, if configured."""
+        if self.stats_refresh_interval <= 0 or self._stats_thread is not None:
+            return
+        
+        self._stats_stop.clear()
+        self._stats_thread = threading.Thread(
+            target=self._refresh_stats_periodically,
+            name='cache-stats-refresher',
+            daemon=True
+        )
+        self._stats_thread.start()
+    
+    def _refresh_stats_periodically(self) -> None:
+        """Refresh collection statistics and the Bloom filter until the cache manager is closed."""
+        while True:
+            self.refresh_collection_stats()
+            if self._stats_stop.wait(self.stats_refresh_interval):
+                return
+            self.refresh_bloom_filter()
+    
+    def refresh_collection_stats(self) -> Dict[str, Any]:
+        """
+        Refresh collection-level statistics from the backend.
+        
+        On MongoDB this is one collStats command and two single-document index
+        walks for the oldest and newest entries. The results are kept and
+        served by get_metrics() and get_cache_statistics() without further
+        queries.
         
-        # Create a content hash from relevant fields
-        content_hash = self._calculate_content_hash(drug_data)
+        Returns:
+            Dict[str, Any]: Refreshed collection statistics
+        """
+        try:
+            backend_stats = self.backend.collection_stats()
+            
+        except CACHE_BACKEND_ERRORS as e:
+            logger.warning(f"Failed to refresh collection stats: {e}")
+            return self._get_collection_stats()
         
-        # Combine fields into cache key
-        cache_key = f"drug-classification:{set_id}:{drug_name}:{generic_name}:{content_hash}"
+        with self._stats_lock:
+            self._collection_stats.update({
+                'total_cached_entries': backend_stats['count'],
+                'actual_cache_size_bytes': backend_stats['size'],
+                'cache_storage_size_bytes': backend_stats['storage_size'],
+                'cache_index_size_bytes': backend_stats['index_size'],
+                'oldest_entry': backend_stats['oldest_entry'],
+                'newest_entry': backend_stats['newest_entry'],
+                'stats_refreshed_at': datetime.utcnow()
+            })
+            return dict(self._collection_stats)
+    
+    def _get_collection_stats(self) -> Dict[str, Any]:
+        """Get a copy of the last known collection statistics."""
+        with self._stats_lock:
+            return dict(self._collection_stats)
+    
+    def _record_inserted(self, inserted: int, size_bytes: int, created_at: datetime) -> None:
+        """
+        Account for entries written by this process between refreshes.
         
-        return cache_key
+        Args:
+            inserted: Number of new (not replaced) entries
+            size_bytes: Approximate size of the written entries
+            created_at: Creation time of the written entries
+        """
+        with self._stats_lock:
+            stats = self._collection_stats
+            stats['total_cached_entries'] += inserted
+            stats['actual_cache_size_bytes'] += size_bytes
+            if stats['oldest_entry'] is None:
+                stats['oldest_entry'] = created_at
+            if stats['newest_entry'] is None or stats['newest_entry'] < created_at:
+                stats['newest_entry'] = created_at
     
-    def _calculate_content_hash(self, drug_data: Dict[str, Any]) -> str:
+    def _record_deleted(self, deleted: int, created_before: Optional[datetime] = None) -> None:
         """
-        Calculate a hash of the drug content for cache key.
+        Account for entries deleted by this process between refreshes.
         
         Args:
-            drug_data: Drug data dictionary
+            deleted: Number of deleted entries
+            created_before: Entries created before this time are all gone;
+                None means the whole collection was cleared
+        """
+        with self._stats_lock:
+            stats = self._collection_stats
+            stats['total_cached_entries'] = max(0, stats['total_cached_entries'] - deleted)
+            
+            if created_before is None or stats['total_cached_entries'] == 0:
+                stats.update({
+                    'total_cached_entries': 0,
+                    'actual_cache_size_bytes': 0,
+                    'oldest_entry': None,
+                    'newest_entry': None
+                })
+            elif stats['oldest_entry'] is not None and stats['oldest_entry'] < created_before:
+                stats['oldest_entry'] = created_before
+    
+    def generate_cache_key(self, user_prompt: str, model: str, temperature: float,
+                           system_prompt_digest: str) -> str:
+        """
+        Generate a cache key for the exact request that would be sent.
+        
+        The key is a digest of the user prompt together with the model,
+        temperature and system prompt, so labels with identical prompt
+        content share an entry and any change to the request invalidates it.
+        
+        Args:
+            user_prompt: User prompt containing the drug information
+            model: Model name
+            temperature: Sampling temperature
+            system_prompt_digest: SHA-256 hex digest of the system prompt
             
         Returns:
-            str: Content hash
-        """
-        # Extract label content for hashing
-        label = drug_data.get('label', {})
-        content_fields = [
-            label.get('indicationsAndUsage', ''),
-            label.get('dosageAndAdministration', ''),
-            label.get('warningsAndPrecautions', ''),
-            label.get('adverseReactions', ''),
-            label.get('clinicalPharmacology', ''),
-            label.get('mechanismOfAction', ''),
-            label.get('description', '')
-        ]
-        
-        # Join content and hash
-        content = ''.join(str(field) for field in content_fields)
-        content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-        
-        return content_hash
+            str: Cache key
+        """
+        request_identity = json.dumps({
+            'model': model,
+            'temperature': float(temperature),
+            'system_prompt_sha256': system_prompt_digest,
+            'user_prompt': user_prompt
+        }, sort_keys=True, ensure_ascii=False)
+        
+        request_hash = hashlib.sha256(request_identity.encode('utf-8')).hexdigest()
+        
+        return f"{CACHE_KEY_PREFIX}{request_hash}"
     
     def get_cached_classification(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
         Get cached classification result with metrics tracking.
         
+        Looks in the in-process tier first and falls back to the backend,
+        populating the in-process tier on a backend hit. Entries that expired
+        less than the stale grace window ago are returned flagged as stale so
+        the caller can refresh them in the background.
+        
         Args:
             cache_key: Cache key
             
@@ -163,49 +479,447 @@ class CacheManager:
             Optional[Dict[str, Any]]: Cached classification or None if not found
         """
         start_time = time.time()
-        self.metrics['total_requests'] += 1
+        self._count(total_requests=1)
+        
+        cache_entry = self.memory_cache.get(cache_key)
+        if cache_entry is not None:
+            retrieval_time = time.time() - start_time
+            self._record_retrieval_time(retrieval_time)
+            if 'failure' in cache_entry:
+                return self._build_negative_result(cache_entry, 'memory')
+            
+            self._count(memory_hits=1, cache_hits=1)
+            self._touch([cache_key])
+            logger.debug(f"Memory cache hit for key: {cache_key[:50]}...")
+            return self._build_cached_result(cache_entry, retrieval_time, 'memory')
+        
+        if self.memory_cache.enabled:
+            self._count(memory_misses=1)
         
         try:
-            collection = self._get_collection()
+            self.backend.connect()
             
-            # Find non-expired cache entry
-            cache_entry = collection.find_one({
-                'cache_key': cache_key,
-                'expires_at': {'$gt': datetime.utcnow()}
-            })
+            if self._bloom_rejects(cache_key):
+                self._count(bloom_rejections=1, cache_misses=1)
+                self._record_retrieval_time(time.time() - start_time)
+                return None
+            
+            # Find cache entry that is fresh or within the stale grace window
+            cache_entry = self.backend.find(cache_id(cache_key), self._stale_cutoff())
             
             retrieval_time = time.time() - start_time
-            self._retrieval_times.append(retrieval_time)
+            self._record_retrieval_time(retrieval_time)
             
-            # Update average retrieval time
-            if self._retrieval_times:
-                self.metrics['avg_retrieval_time'] = sum(self._retrieval_times) / len(self._retrieval_times)
+            if cache_entry and 'failure' in cache_entry:
+                negative_result = self._negative_hit(cache_key, cache_entry)
+                if negative_result is not None:
+                    return negative_result
+                cache_entry = None
             
             if cache_entry:
-                self.metrics['cache_hits'] += 1
+                self._count(mongo_hits=1, cache_hits=1)
                 logger.debug(f"Cache hit for key: {cache_key[:50]}... (retrieval: {retrieval_time:.3f}s)")
                 
-                # Calculate cache entry age
-                age_seconds = (datetime.utcnow() - cache_entry['created_at']).total_seconds()
-                
-                return {
-                    'classification': cache_entry['classification'],
-                    'metadata': cache_entry.get('metadata', {}),
-                    'cached': True,
-                    'cached_at': cache_entry['created_at'],
-                    'cache_age_seconds': age_seconds,
-                    'retrieval_time': retrieval_time
-                }
+                return self._backend_hit(cache_key, cache_entry, retrieval_time)
             
-            self.metrics['cache_misses'] += 1
+            self._count(mongo_misses=1, cache_misses=1)
             logger.debug(f"Cache miss for key: {cache_key[:50]}... (retrieval: {retrieval_time:.3f}s)")
             return None
             
-        except PyMongoError as e:
-            self.metrics['cache_errors'] += 1
+        except CACHE_BACKEND_ERRORS as e:
+            self._count(cache_errors=1)
             logger.warning(f"Cache retrieval error: {e}")
             return None
     
+    def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get cached classification results for several keys in one round-trip.
+        
+        Keys found in the in-process tier are served from it; the rest are
+        fetched from the backend in a single query.
+        
+        Args:
+            cache_keys: Cache keys to look up
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Cached classification per key found
+        """
+        start_time = time.time()
+        unique_keys = list(dict.fromkeys(cache_keys))
+        self._count(total_requests=len(unique_keys))
+        
+        results = {}
+        missing_keys = []
+        for cache_key in unique_keys:
+            cache_entry = self.memory_cache.get(cache_key)
+            if cache_entry is not None and 'failure' in cache_entry:
+                results[cache_key] = self._build_negative_result(cache_entry, 'memory')
+            elif cache_entry is not None:
+                self._count(memory_hits=1, cache_hits=1)
+                results[cache_key] = self._build_cached_result(cache_entry, time.time() - start_time, 'memory')
+            else:
+                missing_keys.append(cache_key)
+        
+        self._touch([cache_key for cache_key in results if not results[cache_key].get('negative')])
+        
+        if not missing_keys:
+            return results
+        
+        if self.memory_cache.enabled:
+            self._count(memory_misses=len(missing_keys))
+        
+        try:
+            self.backend.connect()
+            
+            candidates = [cache_key for cache_key in missing_keys if not self._bloom_rejects(cache_key)]
+            rejected = len(missing_keys) - len(candidates)
+            if rejected:
+                self._count(bloom_rejections=rejected, cache_misses=rejected)
+                missing_keys = candidates
+                if not missing_keys:
+                    self._record_retrieval_time(time.time() - start_time)
+                    return results
+            
+            # Find cache entries that are fresh or within the stale grace window
+            keys_by_id = {cache_id(cache_key): cache_key for cache_key in missing_keys}
+            cache_entries = self.backend.find_many(list(keys_by_id), self._stale_cutoff())
+            
+            negative_keys = set()
+            for cache_entry in cache_entries:
+                cache_key = keys_by_id[cache_entry['_id']]
+                if 'failure' in cache_entry:
+                    negative_result = self._negative_hit(cache_key, cache_entry)
+                    if negative_result is not None:
+                        results[cache_key] = negative_result
+                        negative_keys.add(cache_key)
+                else:
+                    results[cache_key] = self._backend_hit(cache_key, cache_entry, time.time() - start_time)
+            
+            retrieval_time = time.time() - start_time
+            self._record_retrieval_time(retrieval_time)
+            
+            # Negative hits are reported separately from hits and misses
+            missing_keys = [cache_key for cache_key in missing_keys if cache_key not in negative_keys]
+            found = sum(1 for cache_key in missing_keys if cache_key in results)
+            not_found = len(missing_keys) - found
+            self._count(mongo_hits=found, mongo_misses=not_found, cache_hits=found, cache_misses=not_found)
+            
+            logger.debug(f"Batch cache lookup: {len(results)}/{len(unique_keys)} hits "
+                        f"(retrieval: {retrieval_time:.3f}s)")
+            
+        except CACHE_BACKEND_ERRORS as e:
+            self._count(cache_errors=1)
+            logger.warning(f"Batch cache retrieval error: {e}")
+        
+        return results
+    
+    def _expiry_fields(self, now: datetime) -> Dict[str, Any]:
+        """
+        Get the expiry fields of a classification entry created now.
+        
+        Under the LRU policy entries never expire and have no purge time,
+        so the TTL index leaves them alone; they carry their last access
+        time for eviction instead.
+        
+        Args:
+            now: Creation time
+            
+        Returns:
+            Dict[str, Any]: Expiry fields of the cache document
+        """
+        if self.eviction_policy == 'lru':
+            return {'expires_at': NEVER_EXPIRES, 'last_accessed_at': now}
+        
+        expires_at = now + timedelta(seconds=self.ttl)
+        return {
+            'expires_at': expires_at,
+            'purge_at': expires_at + timedelta(seconds=self.stale_grace)
+        }
+    
+    def _stale_cutoff(self) -> datetime:
+        """
+        Get the expiry time before which entries can no longer be served.
+        
+        Returns:
+            datetime: Oldest expiry time still served as stale
+        """
+        return datetime.utcnow() - timedelta(seconds=self.stale_grace)
+    
+    def _backend_hit(self, cache_key: str, cache_entry: Dict[str, Any], 
+                     retrieval_time: float) -> Dict[str, Any]:
+        """
+        Build the result for an entry found in the backend.
+        
+        Fresh entries are kept in the in-process tier; stale ones are not, so
+        the refreshed entry is picked up as soon as it is stored.
+        
+        Args:
+            cache_key: Cache key
+            cache_entry: Cache document
+            retrieval_time: Lookup time in seconds
+            
+        Returns:
+            Dict[str, Any]: Cached classification result
+        """
+        result = self._build_cached_result(cache_entry, retrieval_time, self.backend.name)
+        self._touch([cache_key])
+        
+        if result['stale']:
+            self._count(stale_hits=1)
+            logger.debug(f"Serving stale cache entry for key: {cache_key[:50]}...")
+        else:
+            self._remember(cache_key, cache_entry)
+        
+        return result
+    
+    def _negative_hit(self, cache_key: str, cache_entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Build the result for a negative entry found in the backend.
+        
+        Negative entries are never served stale.
+        
+        Args:
+            cache_key: Cache key
+            cache_entry: Negative cache document
+            
+        Returns:
+            Optional[Dict[str, Any]]: Negative result, or None if the entry has expired
+        """
+        if cache_entry['expires_at'] <= datetime.utcnow():
+            return None
+        
+        self._remember(cache_key, cache_entry)
+        return self._build_negative_result(cache_entry, self.backend.name)
+    
+    def _build_negative_result(self, cache_entry: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        """
+        Build the result returned for a known failed request.
+        
+        Args:
+            cache_entry: Negative cache document
+            tier: Cache tier that served the entry ('memory' or the backend name)
+            
+        Returns:
+            Dict[str, Any]: Negative result with the recorded failure
+        """
+        self._count(negative_hits=1)
+        logger.debug(f"Negative cache hit: {cache_entry['failure'].get('reason')}")
+        
+        return {
+            'negative': True,
+            'failure': dict(cache_entry['failure']),
+            'cached': True,
+            'stale': False,
+            'cache_tier': tier,
+            'cached_at': cache_entry['created_at'],
+            'expires_at': cache_entry['expires_at']
+        }
+    
+    def _touch(self, cache_keys: List[str]) -> None:
+        """
+        Record that entries were used, for the LRU policy.
+        
+        Accesses are collected and written as one update per batch rather
+        than one write per hit.
+        
+        Args:
+            cache_keys: Keys of the entries used
+        """
+        if self.eviction_policy != 'lru' or not cache_keys:
+            return
+        
+        with self._touch_lock:
+            self._pending_touches.update(cache_keys)
+            if len(self._pending_touches) < self.touch_batch_size:
+                return
+        
+        self.flush_touches()
+    
+    def flush_touches(self) -> int:
+        """
+        Write recorded accesses to the backend.
+        
+        Returns:
+            int: Number of entries whose access time was updated
+        """
+        with self._touch_lock:
+            cache_keys, self._pending_touches = list(self._pending_touches), set()
+        
+        if not cache_keys:
+            return 0
+        
+        try:
+            updated = self.backend.touch([cache_id(cache_key) for cache_key in cache_keys], datetime.utcnow())
+            logger.debug(f"Recorded access to {updated} cache entries")
+            return updated
+            
+        except CACHE_BACKEND_ERRORS as e:
+            logger.warning(f"Failed to record cache entry access: {e}")
+            return 0
+    
+    def evict_lru(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                  batch_size: Optional[int] = None, pause: Optional[float] = None) -> int:
+        """
+        Evict least recently used entries until the collection is within its caps.
+        
+        Entries are deleted in batches, oldest access first, by walking the
+        last_accessed_at index. Entries without an access time (written under
+        the TTL policy) go first.
+        
+        Args:
+            max_entries: Maximum number of entries (defaults to AI_CACHE_MAX_ENTRIES, 0 for no cap)
+            max_bytes: Maximum data size in bytes (defaults to AI_CACHE_MAX_BYTES, 0 for no cap)
+            batch_size: Entries deleted per batch (defaults to AI_CACHE_DELETE_BATCH_SIZE)
+            pause: Seconds to wait between batches (defaults to AI_CACHE_DELETE_PAUSE)
+            
+        Returns:
+            int: Number of entries evicted
+        """
+        max_entries = self.max_entries if max_entries is None else max_entries
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        batch_size = batch_size or self.delete_batch_size
+        pause = self.delete_pause if pause is None else pause
+        
+        # Count recent hits before choosing what to evict
+        self.flush_touches()
+        stats = self.refresh_collection_stats()
+        entry_count = stats['total_cached_entries']
+        data_size = stats['actual_cache_size_bytes']
+        
+        excess = 0
+        if max_entries > 0 and entry_count > max_entries:
+            excess = entry_count - max_entries
+        if max_bytes > 0 and data_size > max_bytes and entry_count > 0:
+            average_size = data_size / entry_count
+            excess = max(excess, math.ceil((data_size - max_bytes) / average_size))
+        
+        if excess == 0:
+            logger.info(f"Cache within limits ({entry_count} entries, {data_size} bytes), nothing to evict")
+            return 0
+        
+        evicted = 0
+        try:
+            while evicted < excess:
+                victims = self.backend.least_recently_used(min(batch_size, excess - evicted))
+                if not victims:
+                    break
+                
+                evicted += self.backend.delete_ids([victim_id for victim_id, _ in victims])
+                for _, victim_key in victims:
+                    if victim_key:
+                        self.memory_cache.delete(victim_key)
+                
+                if evicted < excess and pause > 0:
+                    time.sleep(pause)
+            
+        except CACHE_BACKEND_ERRORS as e:
+            logger.error(f"Failed to evict cache entries: {e}")
+        
+        self._count(lru_evictions=evicted)
+        if evicted:
+            self.refresh_collection_stats()
+        
+        logger.info(f"Evicted {evicted} least recently used cache entries "
+                    f"(was {entry_count} entries, {data_size} bytes)")
+        return evicted
+    
+    def purge_legacy_entries(self, batch_size: Optional[int] = None, pause: Optional[float] = None) -> int:
+        """
+        Delete entries written by earlier versions under a string cache_key field.
+        
+        Their keys were built from the set ID rather than the request, so no
+        lookup can hit them; they only take up space (and, under the LRU
+        policy, capacity). They are deleted in throttled batches (see
+        delete_in_batches), and entries still without purge_at are then
+        given one. Safe to re-run if interrupted. Only MongoDB caches can
+        hold such entries.
+        
+        Args:
+            batch_size: Entries deleted per batch (defaults to AI_CACHE_DELETE_BATCH_SIZE)
+            pause: Seconds to wait between batches (defaults to AI_CACHE_DELETE_PAUSE)
+            
+        Returns:
+            int: Number of entries deleted
+        """
+        purged = 0
+        try:
+            purged = self.delete_in_batches(LEGACY_KEY_FIELD, None, batch_size, pause)
+            self.backend.backfill_purge_at()
+        except CACHE_BACKEND_ERRORS as e:
+            logger.error(f"Failed to purge legacy cache entries: {e}")
+        
+        if purged:
+            self.refresh_collection_stats()
+        logger.info(f"Purged {purged} legacy cache entries")
+        return purged
+    
+    def _record_retrieval_time(self, retrieval_time: float) -> None:
+        """
+        Record a cache lookup time.
+        
+        Args:
+            retrieval_time: Lookup time in seconds
+        """
+        self.retrieval_latency.record(retrieval_time)
+    
+    def _remember(self, cache_key: str, cache_entry: Dict[str, Any], 
+                  size_bytes: Optional[int] = None) -> None:
+        """
+        Keep a cache entry in the in-process tier until it expires.
+        
+        Args:
+            cache_key: Cache key
+            cache_entry: Cache document
+            size_bytes: Approximate document size, computed if not given
+        """
+        if not self.memory_cache.enabled:
+            return
+        
+        # Copy so later changes to the stored or returned dicts cannot reach the entry
+        entry = {
+            'metadata': copy.deepcopy(cache_entry.get('metadata', {})),
+            'created_at': cache_entry['created_at'],
+            'expires_at': cache_entry['expires_at']
+        }
+        if 'failure' in cache_entry:
+            entry['failure'] = dict(cache_entry['failure'])
+        else:
+            entry['classification'] = copy.deepcopy(cache_entry['classification'])
+        if size_bytes is None:
+            size_bytes = len(json.dumps(entry, default=str))
+        
+        expires_at = cache_entry['expires_at'].replace(tzinfo=timezone.utc).timestamp()
+        self.memory_cache.put(cache_key, entry, size_bytes, expires_at)
+    
+    def _build_cached_result(self, cache_entry: Dict[str, Any], retrieval_time: float, 
+                             tier: str) -> Dict[str, Any]:
+        """
+        Build the classification result returned for a cache hit.
+        
+        Args:
+            cache_entry: Cache document
+            retrieval_time: Lookup time in seconds
+            tier: Cache tier that served the entry ('memory' or the backend name)
+            
+        Returns:
+            Dict[str, Any]: Cached classification result
+        """
+        # Calculate cache entry age
+        now = datetime.utcnow()
+        age_seconds = (now - cache_entry['created_at']).total_seconds()
+        
+        # Copy so callers cannot alter entries held by the in-process tier
+        return {
+            'classification': copy.deepcopy(cache_entry['classification']),
+            'metadata': copy.deepcopy(cache_entry.get('metadata', {})),
+            'cached': True,
+            'stale': cache_entry['expires_at'] <= now,
+            'cache_tier': tier,
+            'cached_at': cache_entry['created_at'],
+            'cache_age_seconds': age_seconds,
+            'retrieval_time': retrieval_time
+        }
+    
     def store_classification(self, cache_key: str, classification: Dict[str, Any], 
                             metadata: Dict[str, Any]) -> bool:
         """
@@ -222,60 +936,183 @@ class CacheManager:
         start_time = time.time()
         
         try:
-            collection = self._get_collection()
-            
             # Calculate expiration time
             now = datetime.utcnow()
-            expires_at = now + timedelta(seconds=self.ttl)
             
             # Calculate document size for metrics
             cache_doc = {
-                'cache_key': cache_key,
                 'classification': classification,
-                'metadata': metadata,
+                'metadata': {**metadata, 'cache_key': cache_key},
                 'created_at': now,
-                'expires_at': expires_at
+                **self._expiry_fields(now)
             }
             
             # Estimate document size
             doc_size = len(json.dumps(cache_doc, default=str))
             
-            # Upsert to handle race conditions
-            result = collection.replace_one(
-                {'cache_key': cache_key},
-                cache_doc,
-                upsert=True
-            )
+            inserted = self.backend.replace(cache_id(cache_key), cache_doc)
             
             # Update metrics
             storage_time = time.time() - start_time
-            self._storage_times.append(storage_time)
-            self.metrics['cache_stores'] += 1
-            
-            # Update average storage time
-            if self._storage_times:
-                self.metrics['avg_storage_time'] = sum(self._storage_times) / len(self._storage_times)
+            self.storage_latency.record(storage_time)
+            self._count(cache_stores=1, cache_size_bytes=doc_size)
+            self._record_inserted(int(inserted), doc_size, now)
+            self._bloom_add([cache_key])
             
-            # Update cache size estimate
-            self.metrics['cache_size_bytes'] += doc_size
+            self._remember(cache_key, cache_doc, doc_size)
             
             logger.debug(f"Stored classification in cache (key: {cache_key[:50]}..., "
                         f"size: {doc_size} bytes, storage: {storage_time:.3f}s)")
             return True
             
-        except PyMongoError as e:
-            self.metrics['cache_errors'] += 1
+        except CACHE_BACKEND_ERRORS as e:
+            self._count(cache_errors=1)
             logger.warning(f"Cache storage error: {e}")
             return False
     
-    def get_metrics(self) -> Dict[str, Any]:
+    def store_failure(self, cache_key: str, reason: str, attempts: int) -> bool:
+        """
+        Store a short-lived negative entry for a request that failed.
+        
+        Until it expires (AI_CACHE_NEGATIVE_TTL), lookups of the key return a
+        negative result instead of a miss, so the request is not retried.
+        
+        Args:
+            cache_key: Cache key
+            reason: Failure reason
+            attempts: Number of attempts made
+            
+        Returns:
+            bool: True if stored successfully, False otherwise
+        """
+        if self.negative_ttl <= 0:
+            return False
+        
+        try:
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.negative_ttl)
+            cache_doc = {
+                'failure': {'reason': reason, 'attempts': attempts},
+                'metadata': {'cache_key': cache_key},
+                'created_at': now,
+                'expires_at': expires_at,
+                'purge_at': expires_at
+            }
+            
+            inserted = self.backend.replace(cache_id(cache_key), cache_doc)
+            
+            doc_size = len(json.dumps(cache_doc, default=str))
+            self._count(negative_stores=1)
+            self._record_inserted(int(inserted), doc_size, now)
+            self._bloom_add([cache_key])
+            self._remember(cache_key, cache_doc, doc_size)
+            
+            logger.debug(f"Stored negative cache entry (key: {cache_key[:50]}..., reason: {reason})")
+            return True
+            
+        except CACHE_BACKEND_ERRORS as e:
+            self._count(cache_errors=1)
+            logger.warning(f"Negative cache storage error: {e}")
+            return False
+    
+    def store_many(self, entries: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> int:
+        """
+        Store several classification results in one round-trip.
+        
+        Args:
+            entries: (cache_key, classification, metadata) tuples
+            
+        Returns:
+            int: Number of entries stored
+        """
+        if not entries:
+            return 0
+        
+        start_time = time.time()
+        now = datetime.utcnow()
+        expiry_fields = self._expiry_fields(now)
+        
+        cache_docs = {}
+        for cache_key, classification, metadata in entries:
+            cache_docs[cache_key] = {
+                'classification': classification,
+                'metadata': {**metadata, 'cache_key': cache_key},
+                'created_at': now,
+                **expiry_fields
+            }
+        
+        keys_by_id = {cache_id(cache_key): cache_key for cache_key in cache_docs}
+        
+        try:
+            stored_ids, inserted = self.backend.replace_many(
+                {entry_id: cache_docs[cache_key] for entry_id, cache_key in keys_by_id.items()}
+            )
+            stored_keys = [keys_by_id[entry_id] for entry_id in stored_ids]
+            if len(stored_keys) < len(cache_docs):
+                self._count(cache_errors=1)
+            
+        except CACHE_BACKEND_ERRORS as e:
+            self._count(cache_errors=1)
+            logger.warning(f"Batch cache storage error: {e}")
+            return 0
+        
+        stored_bytes = 0
+        for cache_key in stored_keys:
+            doc_size = len(json.dumps(cache_docs[cache_key], default=str))
+            stored_bytes += doc_size
+            self._remember(cache_key, cache_docs[cache_key], doc_size)
+        
+        self._count(cache_size_bytes=stored_bytes)
+        if stored_keys:
+            self._record_inserted(inserted, stored_bytes, now)
+            self._bloom_add(stored_keys)
+        
+        storage_time = time.time() - start_time
+        self.storage_latency.record(storage_time)
+        self._count(cache_stores=len(stored_keys))
+        
+        logger.debug(f"Stored {len(stored_keys)} classifications in cache (storage: {storage_time:.3f}s)")
+        return len(stored_keys)
+    
+    def _count(self, **increments: int) -> None:
+        """Increment metrics counters together."""
+        with self._metrics_lock:
+            for counter, amount in increments.items():
+                self.metrics[counter] += amount
+    
+    def get_metrics(self, refresh: bool = False) -> Dict[str, Any]:
         """
         Get cache metrics and statistics.
         
+        Collection-level statistics are the last refreshed values adjusted
+        for this process's own writes, so this makes no database calls
+        unless a refresh is requested.
+        
+        Args:
+            refresh: Refresh collection statistics from the backend first
+        
         Returns:
             Dict[str, Any]: Cache metrics
         """
-        metrics = self.metrics.copy()
+        with self._metrics_lock:
+            metrics = self.metrics.copy()
+        
+        # Latency statistics
+        metrics['avg_retrieval_time'] = self.retrieval_latency.mean
+        metrics['avg_storage_time'] = self.storage_latency.mean
+        metrics['retrieval_latency'] = self.retrieval_latency.snapshot()
+        metrics['storage_latency'] = self.storage_latency.snapshot()
+        
+        # In-process tier occupancy
+        metrics['memory_entries'] = len(self.memory_cache)
+        metrics['memory_size_bytes'] = self.memory_cache.size_bytes
+        metrics['memory_evictions'] = self.memory_cache.evictions
+        
+        # Bloom filter occupancy
+        if self.bloom_filter is not None:
+            metrics['bloom_keys'] = len(self.bloom_filter)
+            metrics['bloom_size_bytes'] = self.bloom_filter.size_bytes
+            metrics['bloom_saturated'] = self.bloom_filter.saturated
         
         # Calculate derived metrics
         if metrics['total_requests'] > 0:
@@ -287,83 +1124,305 @@ class CacheManager:
             metrics['cache_miss_rate'] = 0.0
             metrics['error_rate'] = 0.0
         
-        # Add collection statistics if available
-        try:
-            collection = self._get_collection()
-            stats = collection.estimated_document_count()
-            metrics['total_cached_entries'] = stats
+        # Add collection statistics
+        if refresh:
+            metrics.update(self.refresh_collection_stats())
+        else:
+            metrics.update(self._get_collection_stats())
+        
+        return metrics
+    
+    def delete_in_batches(self, field: Optional[str] = None, before: Optional[datetime] = None,
+                          batch_size: Optional[int] = None, pause: Optional[float] = None) -> int:
+        """
+        Delete entries in _id-ordered batches with a pause between them.
+        
+        Each batch reads the next _ids past the last one deleted and deletes
+        only those, so the write load is bounded and progress is logged as it
+        goes. Every batch is complete on its own; after an interruption,
+        running the same deletion again carries on with what is left.
+        
+        Args:
+            field: Delete entries whose 'created_at' or 'expires_at' is
+                before the given time (None deletes all entries)
+            before: Cutoff time for the field
+            batch_size: Entries deleted per batch (defaults to AI_CACHE_DELETE_BATCH_SIZE)
+            pause: Seconds to wait between batches (defaults to AI_CACHE_DELETE_PAUSE)
             
-            # Get actual cache size from MongoDB
-            db_stats = collection.database.command("collStats", self.collection_name)
-            metrics['actual_cache_size_bytes'] = db_stats.get('size', 0)
-            metrics['cache_storage_size_bytes'] = db_stats.get('storageSize', 0)
-            metrics['cache_index_size_bytes'] = db_stats.get('totalIndexSize', 0)
+        Returns:
+            int: Number of entries deleted
+        """
+        batch_size = batch_size or self.delete_batch_size
+        pause = self.delete_pause if pause is None else pause
+        
+        deleted = 0
+        last_id = None
+        
+        while True:
+            ids, batch_deleted = self.backend.delete_batch(field, before, last_id, batch_size)
+            if not ids:
+                break
             
-        except PyMongoError as e:
-            logger.warning(f"Failed to get collection stats: {e}")
-            metrics['total_cached_entries'] = 0
-            metrics['actual_cache_size_bytes'] = 0
+            deleted += batch_deleted
+            last_id = ids[-1]
+            logger.info(f"Deleted {deleted} cache entries so far (through _id {last_id!r})")
+            
+            if len(ids) < batch_size:
+                break
+            if pause > 0:
+                time.sleep(pause)
         
-        return metrics
+        return deleted
     
-    def clear_cache(self, older_than_hours: Optional[int] = None) -> int:
+    def clear_cache(self, older_than_hours: Optional[int] = None, batch_size: Optional[int] = None,
+                    pause: Optional[float] = None) -> int:
         """
         Clear cache entries, optionally only those older than specified hours.
         
+        Entries are deleted in throttled batches (see delete_in_batches).
+        
         Args:
             older_than_hours: Only clear entries older than this many hours
+            batch_size: Entries deleted per batch (defaults to AI_CACHE_DELETE_BATCH_SIZE)
+            pause: Seconds to wait between batches (defaults to AI_CACHE_DELETE_PAUSE)
             
         Returns:
             int: Number of entries cleared
         """
+        self.memory_cache.clear()
+        
         try:
-            collection = self._get_collection()
-            
             if older_than_hours is not None:
                 # Clear entries older than specified hours
                 cutoff_time = datetime.utcnow() - timedelta(hours=older_than_hours)
-                result = collection.delete_many({
-                    'created_at': {'$lt': cutoff_time}
-                })
-                logger.info(f"Cleared {result.deleted_count} cache entries older than {older_than_hours} hours")
+                deleted = self.delete_in_batches('created_at', cutoff_time, batch_size, pause)
+                self._record_deleted(deleted, cutoff_time)
+                logger.info(f"Cleared {deleted} cache entries older than {older_than_hours} hours")
             else:
                 # Clear all entries
-                result = collection.delete_many({})
-                logger.info(f"Cleared all {result.deleted_count} cache entries")
+                deleted = self.delete_in_batches(batch_size=batch_size, pause=pause)
+                self._record_deleted(deleted)
+                logger.info(f"Cleared all {deleted} cache entries")
             
-            return result.deleted_count
+            return deleted
             
-        except PyMongoError as e:
+        except CACHE_BACKEND_ERRORS as e:
             logger.error(f"Failed to clear cache: {e}")
             return 0
     
-    def cleanup_expired_entries(self) -> int:
+    def cleanup_expired_entries(self, batch_size: Optional[int] = None,
+                                pause: Optional[float] = None) -> int:
         """
-        Manually cleanup expired entries (MongoDB TTL should handle this automatically).
+        Manually cleanup expired entries (the backend's TTL purge should handle this automatically).
+        
+        Entries still within the stale grace window are kept. Entries are
+        deleted in throttled batches (see delete_in_batches).
+        
+        Args:
+            batch_size: Entries deleted per batch (defaults to AI_CACHE_DELETE_BATCH_SIZE)
+            pause: Seconds to wait between batches (defaults to AI_CACHE_DELETE_PAUSE)
         
         Returns:
             int: Number of expired entries cleaned up
         """
         try:
-            collection = self._get_collection()
+            # Find and delete entries past the stale grace window
+            cleaned_count = self.delete_in_batches('expires_at', self._stale_cutoff(), batch_size, pause)
             
-            # Find and delete expired entries
-            result = collection.delete_many({
-                'expires_at': {'$lt': datetime.utcnow()}
-            })
-            
-            cleaned_count = result.deleted_count
-            self.metrics['expired_entries_cleaned'] += cleaned_count
+            self._count(expired_entries_cleaned=cleaned_count)
+            self._record_deleted(cleaned_count,
+                                 datetime.utcnow() - timedelta(seconds=self.ttl + self.stale_grace))
             
             if cleaned_count > 0:
                 logger.info(f"Cleaned up {cleaned_count} expired cache entries")
             
             return cleaned_count
             
-        except PyMongoError as e:
+        except CACHE_BACKEND_ERRORS as e:
             logger.error(f"Failed to cleanup expired entries: {e}")
             return 0
     
+    def export_snapshot(self, path: str, batch_size: int = 1000) -> int:
+        """
+        Write all unexpired classification entries to a snapshot file.
+        
+        Entries are streamed into a gzip-compressed JSON lines file that ends
+        with a checksum trailer, so another environment can start from a warm
+        cache with import_snapshot(). Negative entries are left out. The file
+        is written under a temporary name and renamed when complete.
+        
+        Args:
+            path: Snapshot file to write
+            batch_size: Entries fetched per round-trip
+            
+        Returns:
+            int: Number of entries exported
+        """
+        start_time = time.time()
+        now = datetime.utcnow()
+        
+        checksum = hashlib.sha256()
+        exported = 0
+        temp_path = f"{path}.tmp"
+        
+        try:
+            with gzip.open(temp_path, 'wb', compresslevel=6) as f:
+                header = {
+                    'format': SNAPSHOT_FORMAT,
+                    'version': SNAPSHOT_VERSION,
+                    'created_at': now.isoformat(),
+                    'collection': self.collection_name
+                }
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                
+                for cache_entry in self.backend.iter_entries(now, batch_size):
+                    line = json_util.dumps(cache_entry, json_options=_SNAPSHOT_JSON_OPTIONS).encode('utf-8') + b'\n'
+                    checksum.update(line)
+                    f.write(line)
+                    exported += 1
+                
+                trailer = {'entries': exported, 'sha256': checksum.hexdigest()}
+                f.write(json.dumps(trailer).encode('utf-8') + b'\n')
+            
+            os.replace(temp_path, path)
+        
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        logger.info(f"Exported {exported} cache entries to {path} in {time.time() - start_time:.2f}s")
+        return exported
+    
+    def import_snapshot(self, path: str, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Load entries from a snapshot file written by export_snapshot().
+        
+        The checksum is verified before anything is written. Entries are
+        inserted with unordered bulk inserts as if stored now, with the
+        expiry fields of this cache's eviction policy; keys that already
+        exist keep their current entry, and entries that expired since the
+        export are skipped.
+        
+        Args:
+            path: Snapshot file to read
+            batch_size: Entries inserted per bulk insert
+            
+        Returns:
+            Dict[str, int]: Counts of entries in the snapshot, imported,
+                already present and expired
+            
+        Raises:
+            ValueError: If the file is not a valid snapshot or fails its checksum
+        """
+        start_time = time.time()
+        entries = self.verify_snapshot(path)
+        now = datetime.utcnow()
+        
+        results = {'entries': entries, 'imported': 0, 'existing': 0, 'expired': 0}
+        batch = []
+        for cache_entry in self._read_snapshot_entries(path):
+            if cache_entry.get('purge_at', cache_entry['expires_at']) <= now:
+                results['expired'] += 1
+                continue
+            
+            # created_at is the write time that other processes' Bloom
+            # filter refreshes select new entries by
+            cache_entry['created_at'] = now
+            
+            # The exporting cache may have used another eviction policy or TTL
+            cache_entry.pop('purge_at', None)
+            cache_entry.pop('last_accessed_at', None)
+            cache_entry.update(self._expiry_fields(now))
+            batch.append(cache_entry)
+            if len(batch) >= batch_size:
+                self._insert_snapshot_batch(batch, results)
+                batch = []
+        if batch:
+            self._insert_snapshot_batch(batch, results)
+        
+        self.refresh_collection_stats()
+        
+        logger.info(f"Imported {results['imported']} of {entries} cache entries from {path} "
+                    f"({results['existing']} already present, {results['expired']} expired) "
+                    f"in {time.time() - start_time:.2f}s")
+        return results
+    
+    def verify_snapshot(self, path: str) -> int:
+        """
+        Check a snapshot file's format and checksum.
+        
+        Args:
+            path: Snapshot file to check
+            
+        Returns:
+            int: Number of entries in the snapshot
+            
+        Raises:
+            ValueError: If the file is not a valid snapshot or fails its checksum
+        """
+        checksum = hashlib.sha256()
+        entries = 0
+        trailer = None
+        
+        with gzip.open(path, 'rb') as f:
+            header = json.loads(f.readline() or b'null')
+            if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+                raise ValueError(f"{path} is not a cache snapshot")
+            if header.get('version') != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported cache snapshot version: {header.get('version')}")
+            
+            for line in f:
+                if trailer is not None:
+                    checksum.update(trailer)
+                    entries += 1
+                trailer = line
+        
+        if trailer is None:
+            raise ValueError(f"Cache snapshot {path} is truncated")
+        
+        trailer = json.loads(trailer)
+        if trailer.get('entries') != entries or trailer.get('sha256') != checksum.hexdigest():
+            raise ValueError(f"Cache snapshot {path} failed its checksum")
+        
+        return entries
+    
+    def _read_snapshot_entries(self, path: str):
+        """
+        Stream the entries of a verified snapshot file.
+        
+        Args:
+            path: Snapshot file to read
+            
+        Yields:
+            Dict[str, Any]: Cache document
+        """
+        with gzip.open(path, 'rb') as f:
+            f.readline()
+            previous = None
+            for line in f:
+                # The last line is the trailer
+                if previous is not None:
+                    yield json_util.loads(previous, json_options=_SNAPSHOT_JSON_OPTIONS)
+                previous = line
+    
+    def _insert_snapshot_batch(self, batch: List[Dict[str, Any]], results: Dict[str, int]) -> None:
+        """
+        Insert a batch of snapshot entries, keeping existing ones.
+        
+        Args:
+            batch: Cache documents
+            results: Import counts to update
+        """
+        inserted, existing = self.backend.insert_many(batch)
+        if len(inserted) + existing < len(batch):
+            self._count(cache_errors=1)
+        
+        results['imported'] += len(inserted)
+        results['existing'] += existing
+        if self.bloom_filter is not None:
+            self.bloom_filter.update(entry_id for entry_id in inserted if isinstance(entry_id, bytes))
+    
     def get_cache_info(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
         Get information about a specific cache entry without retrieving the full data.
@@ -375,18 +1434,7 @@ class CacheManager:
             Optional[Dict[str, Any]]: Cache entry info or None if not found
         """
         try:
-            collection = self._get_collection()
-            
-            # Find cache entry and project only metadata
-            cache_entry = collection.find_one(
-                {'cache_key': cache_key},
-                {
-                    'created_at': 1,
-                    'expires_at': 1,
-                    'metadata': 1,
-                    '_id': 0
-                }
-            )
+            cache_entry = self.backend.find(cache_id(cache_key))
             
             if cache_entry:
                 now = datetime.utcnow()
@@ -397,6 +1445,7 @@ class CacheManager:
                 return {
                     'exists': True,
                     'expired': is_expired,
+                    'stale': is_expired and cache_entry['expires_at'] > self._stale_cutoff(),
                     'created_at': cache_entry['created_at'],
                     'expires_at': cache_entry['expires_at'],
                     'age_seconds': age_seconds,
@@ -406,24 +1455,39 @@ class CacheManager:
             
             return {'exists': False}
             
-        except PyMongoError as e:
+        except CACHE_BACKEND_ERRORS as e:
             logger.warning(f"Failed to get cache info: {e}")
             return None
     
     def warm_cache(self, drug_data_list: List[Dict[str, Any]], 
-                   classification_func) -> Dict[str, Any]:
+                   classification_func, key_func,
+                   max_workers: Optional[int] = None,
+                   store_batch_size: int = 50,
+                   progress_interval: float = 10.0) -> Dict[str, Any]:
         """
         Warm the cache by pre-computing classifications for a list of drugs.
         
+        The whole list is resolved against the cache in one round-trip, drugs
+        sharing a cache key are classified once, and the missing set is
+        classified concurrently. Results are stored here in batches, so
+        classification_func must not store them itself.
+        
         Args:
             drug_data_list: List of drug data dictionaries
-            classification_func: Function to call for classification
+            classification_func: Function returning a classification result
+                for a drug without caching it; calls should share a rate limiter
+            key_func: Function returning the cache key for a drug
+            max_workers: Concurrent classifications (defaults to config)
+            store_batch_size: Results written per bulk store
+            progress_interval: Seconds between progress log lines
             
         Returns:
             Dict[str, Any]: Warming results
         """
         results = {
             'total_drugs': len(drug_data_list),
+            'unique_keys': 0,
+            'duplicates': 0,
             'already_cached': 0,
             'newly_cached': 0,
             'failed': 0,
@@ -431,104 +1495,160 @@ class CacheManager:
         }
         
         start_time = time.time()
+        if max_workers is None:
+            max_workers = get_config()['AI_CACHE_WARM_WORKERS']
         
+        # One drug per distinct request
+        pending = {}
         for drug_data in drug_data_list:
             try:
-                cache_key = self.generate_cache_key(drug_data)
-                
-                # Check if already cached
-                if self.get_cached_classification(cache_key):
-                    results['already_cached'] += 1
-                    continue
-                
-                # Get classification and cache it
-                classification_result = classification_func(drug_data)
+                cache_key = key_func(drug_data)
+            except Exception as e:
+                logger.error(f"Cache key generation failed for drug: {e}")
+                results['failed'] += 1
+                continue
+            
+            if cache_key in pending:
+                results['duplicates'] += 1
+            else:
+                pending[cache_key] = drug_data
+        
+        results['unique_keys'] = len(pending)
+        
+        # Resolve the whole set against the cache in one round-trip
+        cached = {cache_key: result for cache_key, result in self.get_many(list(pending)).items()
+                  if not result['stale']}
+        results['known_failures'] = sum(1 for result in cached.values() if result.get('negative'))
+        results['already_cached'] = len(cached) - results['known_failures']
+        missing = [(cache_key, drug_data) for cache_key, drug_data in pending.items()
+                   if cache_key not in cached]
+        
+        logger.info(f"Cache warming: {len(missing)} of {len(pending)} distinct requests to classify "
+                   f"({results['already_cached']} cached, {results['duplicates']} duplicates)")
+        
+        if missing:
+            to_store = []
+            completed = 0
+            last_progress = time.time()
+            
+            with ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                    thread_name_prefix='cache-warm') as executor:
+                futures = {
+                    executor.submit(classification_func, drug_data): cache_key
+                    for cache_key, drug_data in missing
+                }
                 
-                if classification_result and 'classification' in classification_result:
-                    success = self.store_classification(
-                        cache_key,
-                        classification_result['classification'],
-                        classification_result.get('metadata', {})
-                    )
+                for future in as_completed(futures):
+                    completed += 1
+                    try:
+                        classification_result = future.result()
+                    except Exception as e:
+                        logger.error(f"Cache warming failed for drug: {e}")
+                        classification_result = None
                     
-                    if success:
-                        results['newly_cached'] += 1
+                    if (classification_result and 'classification' in classification_result
+                            and not classification_result.get('metadata', {}).get('error')):
+                        to_store.append((
+                            futures[future],
+                            classification_result['classification'],
+                            classification_result.get('metadata', {})
+                        ))
                     else:
                         results['failed'] += 1
-                else:
-                    results['failed'] += 1
                     
-            except Exception as e:
-                logger.error(f"Cache warming failed for drug: {e}")
-                results['failed'] += 1
+                    if len(to_store) >= store_batch_size:
+                        self._store_warmed(to_store, results)
+                        to_store = []
+                    
+                    if time.time() - last_progress >= progress_interval:
+                        last_progress = time.time()
+                        self._log_warm_progress(completed, len(missing), start_time)
+            
+            self._store_warmed(to_store, results)
         
         results['processing_time'] = time.time() - start_time
         
         logger.info(f"Cache warming completed: {results}")
         return results
     
-    def get_cache_statistics(self) -> Dict[str, Any]:
+    def _store_warmed(self, entries: List[Tuple[str, Dict[str, Any], Dict[str, Any]]], 
+                      results: Dict[str, Any]) -> None:
+        """
+        Store a batch of warmed classifications and update the warming results.
+        
+        Args:
+            entries: (cache_key, classification, metadata) tuples
+            results: Warming results to update
+        """
+        if not entries:
+            return
+        
+        stored = self.store_many(entries)
+        results['newly_cached'] += stored
+        results['failed'] += len(entries) - stored
+    
+    def _log_warm_progress(self, completed: int, total: int, start_time: float) -> None:
+        """
+        Log cache warming progress with throughput and estimated time remaining.
+        
+        Args:
+            completed: Classifications finished so far
+            total: Classifications to run
+            start_time: Time warming started
+        """
+        elapsed = time.time() - start_time
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        eta = (total - completed) / rate if rate > 0 else 0.0
+        logger.info(f"Cache warming progress: {completed}/{total} "
+                   f"({completed / total:.0%}, {rate:.1f}/s, ETA {eta:.0f}s)")
+    
+    def get_cache_statistics(self, detailed: bool = False) -> Dict[str, Any]:
         """
         Get comprehensive cache statistics.
         
+        Entry count and the oldest and newest entries come from the maintained
+        collection statistics. The average entry age needs a scan of the whole
+        collection and is only computed when detailed statistics are requested.
+        
+        Args:
+            detailed: Also aggregate the average entry age over the collection
+        
         Returns:
             Dict[str, Any]: Detailed cache statistics
         """
+        if self._get_collection_stats()['stats_refreshed_at'] is None:
+            self.refresh_collection_stats()
+        
+        metrics = self.get_metrics()
+        stats = {
+            'total_entries': metrics['total_cached_entries'],
+            'oldest_entry': metrics['oldest_entry'],
+            'newest_entry': metrics['newest_entry'],
+            'cache_metrics': metrics
+        }
+        
+        if not detailed:
+            return stats
+        
         try:
-            collection = self._get_collection()
-            
-            # Aggregate statistics
-            pipeline = [
-                {
-                    '$group': {
-                        '_id': None,
-                        'total_entries': {'$sum': 1},
-                        'avg_age_hours': {
-                            '$avg': {
-                                '$divide': [
-                                    {'$subtract': ['$$NOW', '$created_at']},
-                                    3600000  # Convert to hours
-                                ]
-                            }
-                        },
-                        'oldest_entry': {'$min': '$created_at'},
-                        'newest_entry': {'$max': '$created_at'}
-                    }
-                }
-            ]
-            
-            stats_result = list(collection.aggregate(pipeline))
-            
-            if stats_result:
-                stats = stats_result[0]
-                return {
-                    'total_entries': stats.get('total_entries', 0),
-                    'avg_age_hours': stats.get('avg_age_hours', 0),
-                    'oldest_entry': stats.get('oldest_entry'),
-                    'newest_entry': stats.get('newest_entry'),
-                    'cache_metrics': self.get_metrics()
-                }
-            else:
-                return {
-                    'total_entries': 0,
-                    'avg_age_hours': 0,
-                    'oldest_entry': None,
-                    'newest_entry': None,
-                    'cache_metrics': self.get_metrics()
-                }
+            stats['avg_age_hours'] = self.backend.average_age_hours()
+            return stats
                 
-        except PyMongoError as e:
+        except CACHE_BACKEND_ERRORS as e:
             logger.error(f"Failed to get cache statistics: {e}")
-            return {'error': str(e), 'cache_metrics': self.get_metrics()}
+            return {**stats, 'error': str(e)}
     
     def close(self):
-        """Close MongoDB connection and return final metrics."""
+        """Close the backend connection and return final metrics."""
+        self.flush_touches()
         final_metrics = self.get_metrics()
         
-        if self.client:
-            self.client.close()
-            self.client = None
-            logger.info("Closed cache manager MongoDB connection")
-            logger.info(f"Final cache metrics: {final_metrics}")
+        self._stats_stop.set()
+        if self._stats_thread is not None:
+            self._stats_thread.join(timeout=5)
+            self._stats_thread = None
+        
+        self.backend.close()
+        logger.info(f"Final cache metrics: {final_metrics}")
         
-        return final_metrics
\ No newline at end of file
+        return final_metrics
@@ -0,0 +1,243 @@
+"""
+Worker that classifies drug documents from the classification job queue.
+
+Each worker runs a number of threads that lease jobs, classify the drug
+document named by the job, and write the classification back to the document
+(the classifier stores it in the cache). Workers in any number of processes or
+containers share the queue.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.collection import Collection
+
+from ai_classification.config import get_config
+from ai_classification.drug_classifier import DrugClassifier
+from ai_classification.job_queue import ClassificationJobQueue, DEAD
+from ai_classification.logging_config import setup_logging
+
+logger = setup_logging(__name__)
+
+
+def classification_fields(classification_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the drug document fields that hold a classification.
+
+    Args:
+        classification_result: Classification result from DrugClassifier
+
+    Returns:
+        Dict[str, Any]: therapeuticClass, aiClassification and aiProcessingMetadata
+    """
+    classification = classification_result['classification']
+    metadata = classification_result.get('metadata', {})
+
+    return {
+        # Therapeutic classification as a string (primary_therapeutic_class)
+        'therapeuticClass': classification.get('primary_therapeutic_class', 'Not specified'),
+        # Full AI classification data as a separate field
+        'aiClassification': classification,
+        'aiProcessingMetadata': {
+            'processedAt': datetime.utcnow(),
+            'modelUsed': metadata.get('model', 'unknown'),
+            'confidence': classification.get('confidence_level', 'Low'),
+            'tokensUsed': metadata.get('tokens_used', 0),
+            'processingTimeMs': metadata.get('processing_time', 0) * 1000,
+            'cached': classification_result.get('cached', False)
+        }
+    }
+
+
+class ClassificationWorker:
+    """Processes classification jobs concurrently until stopped."""
+
+    def __init__(self, job_queue: ClassificationJobQueue, drug_classifier: DrugClassifier,
+                 collection: Collection, concurrency: Optional[int] = None,
+                 worker_id: Optional[str] = None):
+        """
+        Initialize the worker.
+
+        Args:
+            job_queue: Queue to lease jobs from
+            drug_classifier: Classifier used for each job
+            collection: Drug document collection
+            concurrency: Jobs processed at once (defaults to config)
+            worker_id: Identifier recorded on leased jobs (defaults to host and process)
+        """
+        config = get_config()
+
+        self.job_queue = job_queue
+        self.drug_classifier = drug_classifier
+        self.collection = collection
+        self.concurrency = max(1, concurrency or config['AI_JOB_WORKER_CONCURRENCY'])
+        self.poll_interval = config['AI_JOB_POLL_INTERVAL']
+        # Jobs refused by an open circuit wait out its reset timeout
+        self.circuit_reset_timeout = config['AI_CIRCUIT_RESET_TIMEOUT']
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        if job_queue.lease_seconds <= config['AI_CLASSIFICATION_DEADLINE']:
+            logger.warning("AI_JOB_LEASE_SECONDS does not exceed AI_CLASSIFICATION_DEADLINE; "
+                           "slow jobs may be claimed twice")
+
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._started_at = None
+        self.stats = {'leased': 0, 'completed': 0, 'retried': 0, 'deferred': 0, 'dead_lettered': 0,
+                      'lost_leases': 0}
+
+    def run(self, max_jobs: Optional[int] = None, drain: bool = False) -> Dict[str, Any]:
+        """
+        Process jobs until stopped.
+
+        Args:
+            max_jobs: Stop after leasing this many jobs
+            drain: Stop once no job is available instead of polling
+
+        Returns:
+            Dict[str, Any]: Worker statistics
+        """
+        self._stop.clear()
+        self._started_at = time.time()
+        logger.info(f"Classification worker {self.worker_id} started with {self.concurrency} threads")
+
+        threads = [
+            threading.Thread(target=self._run_thread, args=(max_jobs, drain),
+                             name=f"classification-worker-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("Stopping after in-flight jobs finish")
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+        stats = self.get_stats()
+        logger.info(f"Classification worker {self.worker_id} stopped: {stats}")
+        return stats
+
+    def stop(self) -> None:
+        """Stop leasing jobs; jobs in flight are finished."""
+        self._stop.set()
+
+    def _run_thread(self, max_jobs: Optional[int], drain: bool) -> None:
+        """Lease and process jobs on one thread."""
+        while not self._stop.is_set():
+            with self._stats_lock:
+                if max_jobs is not None and self.stats['leased'] >= max_jobs:
+                    return
+                # Count the lease before taking it so threads stop at max_jobs
+                self.stats['leased'] += 1
+
+            try:
+                job = self.job_queue.lease(self.worker_id)
+                if job is None:
+                    self.job_queue.dead_letter_expired()
+            except Exception as e:
+                logger.error(f"Failed to lease classification job: {e}")
+                job = None
+
+            if job is None:
+                with self._stats_lock:
+                    self.stats['leased'] -= 1
+                if drain:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.process_job(job)
+
+    def process_job(self, job: Dict[str, Any]) -> bool:
+        """
+        Classify the drug document of a leased job and record the outcome.
+
+        Args:
+            job: Job returned by ClassificationJobQueue.lease()
+
+        Returns:
+            bool: True if the classification was written
+        """
+        slug = job['_id']
+        try:
+            drug = self.collection.find_one({'slug': slug})
+            if drug is None:
+                self._record_failure(job, f"Drug document not found: {slug}", retry=False)
+                return False
+
+            result = self.drug_classifier.classify_drug(drug)
+            metadata = result.get('metadata', {})
+            error = metadata.get('error')
+            if metadata.get('circuit_open'):
+                # The AI service was never called, so the attempt does not count
+                self._defer(job, error)
+                return False
+            if error:
+                # A negative cache hit repeats the same failure on every attempt
+                self._record_failure(job, error, retry=not metadata.get('negative_cached'))
+                return False
+
+            self.collection.update_one({'slug': slug}, {'$set': classification_fields(result)})
+
+            if self.job_queue.complete(job):
+                self._count('completed')
+            else:
+                # Another worker reclaimed the job; its result is the same
+                self._count('lost_leases')
+            logger.info(f"Classified {slug} (attempt {job['attempts']})")
+            return True
+
+        except Exception as e:
+            self._record_failure(job, str(e))
+            return False
+
+    def _record_failure(self, job: Dict[str, Any], error: str, retry: bool = True) -> None:
+        """Retry or dead-letter a failed job and count the outcome."""
+        logger.warning(f"Classification job {job['_id']} failed (attempt {job['attempts']}): {error}")
+        try:
+            state = self.job_queue.fail(job, error, retry=retry)
+            self._count('dead_lettered' if state == DEAD else 'retried')
+        except Exception as e:
+            # The lease expires and the job is claimed again
+            logger.error(f"Failed to record failure of classification job {job['_id']}: {e}")
+
+    def _defer(self, job: Dict[str, Any], error: str) -> None:
+        """Return a job to the queue until the circuit breaker lets requests through."""
+        logger.debug(f"Deferred classification job {job['_id']} for {self.circuit_reset_timeout}s: {error}")
+        try:
+            if self.job_queue.release(job, self.circuit_reset_timeout):
+                self._count('deferred')
+            else:
+                self._count('lost_leases')
+        except Exception as e:
+            # The lease expires and the job is claimed again
+            logger.error(f"Failed to defer classification job {job['_id']}: {e}")
+
+    def _count(self, counter: str) -> None:
+        """Increment a statistics counter."""
+        with self._stats_lock:
+            self.stats[counter] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get worker statistics.
+
+        Returns:
+            Dict[str, Any]: Job counts, elapsed time and completed jobs per second
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        stats['elapsed_seconds'] = elapsed
+        stats['jobs_per_second'] = stats['completed'] / elapsed if elapsed > 0 else 0.0
+        return stats
@@ -6,7 +6,10 @@ and provides default values for the AI classification system.
 """
 
 import os
-from typing import Dict, Any, Optional
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Any, Iterator, Optional
 import logging
 
 # Default configuration values
@@ -23,17 +26,168 @@ DEFAULT_CONFIG = {
     
     # Cache configuration
     'AI_CLASSIFICATION_CACHE_TTL': 86400,  # 24 hours in seconds
+    'AI_CACHE_MEMORY_MAX_ENTRIES': 10000,  # 0 disables the in-process tier
+    'AI_CACHE_MEMORY_MAX_BYTES': 67108864,  # 64 MB
+    'AI_CACHE_MEMORY_TTL': 3600,  # seconds
+    'AI_CACHE_STALE_GRACE': 604800,  # 7 days expired entries are still served while refreshed
+    'AI_CACHE_REFRESH_WORKERS': 2,  # background refreshes of stale entries
+    'AI_CACHE_NEGATIVE_TTL': 3600,  # seconds failed requests are not retried, 0 disables
+    'AI_CACHE_STATS_REFRESH_INTERVAL': 300,  # seconds, 0 refreshes only on demand
+    'AI_CACHE_WARM_WORKERS': 4,  # concurrent classifications while warming
+    'AI_CACHE_EVICTION_POLICY': 'ttl',  # 'ttl' expires entries by age, 'lru' evicts by last access
+    'AI_CACHE_MAX_ENTRIES': 0,  # LRU cap on cached entries, 0 for no cap
+    'AI_CACHE_MAX_BYTES': 0,  # LRU cap on cached data size, 0 for no cap
+    'AI_CACHE_BACKEND': 'mongo',  # persistent cache tier: 'mongo' or 'sqlite' (embedded)
+    'AI_CACHE_SQLITE_PATH': 'ai_classification_cache.sqlite3',  # database file of the sqlite backend
+    'AI_CACHE_TOUCH_BATCH_SIZE': 500,  # accesses collected per last-access update
+    'AI_CACHE_DELETE_BATCH_SIZE': 1000,  # entries removed per delete when clearing or evicting
+    'AI_CACHE_DELETE_PAUSE': 0.1,  # seconds between delete batches
+    'ENABLE_CACHE_BLOOM_FILTER': False,  # skip the cache backend for keys known not to be cached
+    'AI_CACHE_BLOOM_CAPACITY': 1000000,  # minimum keys the filter is sized for
+    'AI_CACHE_BLOOM_FP_RATE': 0.01,  # false positive rate at capacity
+    'AI_CACHE_BLOOM_PATH': '',  # saved filter shared between workers, empty for none
+    
+    # MongoDB clients, shared by the importer and the cache
+    'MONGO_MAX_POOL_SIZE': 100,  # connections per server
+    'MONGO_COMPRESSORS': '',  # comma-separated wire compressors, e.g. 'zstd,snappy'
+    'MONGO_CONNECT_TIMEOUT_MS': 20000,
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 30000,
+    'MONGO_SOCKET_TIMEOUT_MS': 0,  # 0 for no timeout
     
     # Request configuration
     'AI_REQUEST_TIMEOUT': 30,  # seconds
     'AI_MAX_RETRIES': 3,
+    'AI_CLASSIFICATION_DEADLINE': 60,  # seconds per document including retries, 0 for none
+    'AI_CIRCUIT_FAILURE_THRESHOLD': 5,  # consecutive failed attempts before failing fast
+    'AI_CIRCUIT_RESET_TIMEOUT': 60,  # seconds before probing a failing service again
+    
+    # Rate limiting of AI requests
+    'AI_RATE_LIMIT_BACKEND': 'local',  # 'local' (per process) or 'mongo' (shared by all processes)
+    'AI_RATE_LIMIT_RPM': 60,  # requests per minute
+    'AI_RATE_LIMIT_TPM': 0,  # tokens per minute, 0 for no token limit
+    'AI_RATE_LIMIT_NAME': 'openpipe',  # processes with the same name share one budget
+    
+    # Classification job queue
+    'AI_JOB_LEASE_SECONDS': 300,  # time a worker holds a job before others may claim it
+    'AI_JOB_MAX_ATTEMPTS': 5,  # attempts before a job is dead-lettered
+    'AI_JOB_RETRY_DELAY': 30,  # seconds before the first retry, doubling per attempt
+    'AI_JOB_RETENTION': 604800,  # seconds finished jobs are kept (7 days)
+    'AI_JOB_WORKER_CONCURRENCY': 4,  # jobs each worker processes at once
+    'AI_JOB_POLL_INTERVAL': 1.0,  # seconds an idle worker waits before polling again
     
     # System prompt configuration
     'SYSTEM_PROMPT_PATH': 'drug_label_extracation_system_prompt.md',
+    
+    # Prompt construction
+    'AI_PROMPT_TOKEN_BUDGET': 3000,  # tokens available for label content
+    'ENABLE_PROMPT_COMPRESSION': True,
+    'AI_COMPRESSION_CORPUS_PATH': 'data/drugs/index.json',
+    'AI_COMPRESSED_SECTION_TOKENS': 200,  # tokens kept per compressed section
 }
 
+# Keys converted from environment strings to numbers
+INTEGER_CONFIG_KEYS = (
+    'AI_MAX_TOKENS',
+    'AI_CLASSIFICATION_CACHE_TTL',
+    'AI_CACHE_MEMORY_MAX_ENTRIES',
+    'AI_CACHE_MEMORY_MAX_BYTES',
+    'AI_CACHE_MEMORY_TTL',
+    'AI_CACHE_STALE_GRACE',
+    'AI_CACHE_REFRESH_WORKERS',
+    'AI_CACHE_NEGATIVE_TTL',
+    'AI_CACHE_STATS_REFRESH_INTERVAL',
+    'AI_CACHE_WARM_WORKERS',
+    'AI_CACHE_MAX_ENTRIES',
+    'AI_CACHE_MAX_BYTES',
+    'AI_CACHE_TOUCH_BATCH_SIZE',
+    'AI_CACHE_DELETE_BATCH_SIZE',
+    'AI_CACHE_BLOOM_CAPACITY',
+    'MONGO_MAX_POOL_SIZE',
+    'MONGO_CONNECT_TIMEOUT_MS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+    'MONGO_SOCKET_TIMEOUT_MS',
+    'AI_REQUEST_TIMEOUT',
+    'AI_MAX_RETRIES',
+    'AI_CLASSIFICATION_DEADLINE',
+    'AI_CIRCUIT_FAILURE_THRESHOLD',
+    'AI_CIRCUIT_RESET_TIMEOUT',
+    'AI_RATE_LIMIT_RPM',
+    'AI_RATE_LIMIT_TPM',
+    'AI_JOB_LEASE_SECONDS',
+    'AI_JOB_MAX_ATTEMPTS',
+    'AI_JOB_RETRY_DELAY',
+    'AI_JOB_RETENTION',
+    'AI_JOB_WORKER_CONCURRENCY',
+    'AI_PROMPT_TOKEN_BUDGET',
+    'AI_COMPRESSED_SECTION_TOKENS',
+)
+FLOAT_CONFIG_KEYS = (
+    'AI_TEMPERATURE',
+    'AI_CACHE_BLOOM_FP_RATE',
+    'AI_CACHE_DELETE_PAUSE',
+    'AI_JOB_POLL_INTERVAL',
+)
+# Keys converted from 'true'/'yes'/'1' and 'false'/'no'/'0'
+BOOLEAN_CONFIG_KEYS = (
+    'ENABLE_AI_CLASSIFICATION',
+    'ENABLE_CACHE_BLOOM_FILTER',
+    'ENABLE_PROMPT_COMPRESSION',
+)
+
 
-def get_config() -> Dict[str, Any]:
+class AIConfig(Mapping):
+    """
+    Immutable snapshot of the AI classification configuration.
+
+    Values are read by key (``config['AI_MODEL']``) or as lower-case attributes
+    (``config.ai_model``), already converted to their configured types.
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values: Dict[str, Any]):
+        """
+        Initialize the snapshot.
+
+        Args:
+            values: Configuration values by key
+        """
+        object.__setattr__(self, '_values', MappingProxyType(dict(values)))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[name.upper()]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"'{type(self).__name__}' object is immutable")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self._values)!r})"
+
+    @property
+    def ai_enabled(self) -> bool:
+        """Whether AI classification is enabled."""
+        return self._values['ENABLE_AI_CLASSIFICATION']
+
+
+_config: Optional[AIConfig] = None
+_config_lock = threading.Lock()
+
+
+def load_config() -> Dict[str, Any]:
     """
     Load configuration from environment variables with fallback to defaults.
     
@@ -46,22 +200,25 @@ def get_config() -> Dict[str, Any]:
     for key in config:
         env_value = os.environ.get(key)
         if env_value is not None:
-            # Convert boolean strings
-            if env_value.lower() in ('true', 'yes', '1'):
-                config[key] = True
-            elif env_value.lower() in ('false', 'no', '0'):
-                config[key] = False
             # Convert numeric values
-            elif key in ('AI_MAX_TOKENS', 'AI_CLASSIFICATION_CACHE_TTL', 'AI_REQUEST_TIMEOUT', 'AI_MAX_RETRIES'):
+            if key in INTEGER_CONFIG_KEYS:
                 try:
                     config[key] = int(env_value)
                 except ValueError:
                     logging.warning(f"Invalid integer value for {key}: {env_value}, using default: {config[key]}")
-            elif key == 'AI_TEMPERATURE':
+            elif key in FLOAT_CONFIG_KEYS:
                 try:
                     config[key] = float(env_value)
                 except ValueError:
                     logging.warning(f"Invalid float value for {key}: {env_value}, using default: {config[key]}")
+            # Convert boolean strings
+            elif key in BOOLEAN_CONFIG_KEYS:
+                if env_value.lower() in ('true', 'yes', '1'):
+                    config[key] = True
+                elif env_value.lower() in ('false', 'no', '0'):
+                    config[key] = False
+                else:
+                    logging.warning(f"Invalid boolean value for {key}: {env_value}, using default: {config[key]}")
             else:
                 config[key] = env_value
     
@@ -76,6 +233,44 @@ def get_config() -> Dict[str, Any]:
     return config
 
 
+def get_config() -> AIConfig:
+    """
+    Get the configuration, loading it from the environment on first use.
+
+    The environment is read once per process; call reload_config() after
+    changing it.
+
+    Returns:
+        AIConfig: Configuration
+    """
+    config = _config
+    if config is None:
+        with _config_lock:
+            config = _config if _config is not None else _reload_locked()
+    return config
+
+
+def reload_config() -> AIConfig:
+    """
+    Re-read the configuration from the environment.
+
+    Components keep the values they were constructed with; only later
+    get_config() calls see the new configuration.
+
+    Returns:
+        AIConfig: Configuration
+    """
+    with _config_lock:
+        return _reload_locked()
+
+
+def _reload_locked() -> AIConfig:
+    """Load and publish a new configuration; the caller holds _config_lock."""
+    global _config
+    _config = AIConfig(load_config())
+    return _config
+
+
 def is_ai_enabled() -> bool:
     """
     Check if AI classification is enabled.
@@ -83,4 +278,4 @@ def is_ai_enabled() -> bool:
     Returns:
         bool: True if AI classification is enabled, False otherwise
     """
-    return get_config()['ENABLE_AI_CLASSIFICATION']
\ No newline at end of file
+    return get_config().ai_enabled
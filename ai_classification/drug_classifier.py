@@ -5,14 +5,22 @@ This module coordinates the AI classification process, including
 prompt building, API calls, response validation, and caching.
 """
 
+import asyncio
+import copy
+import threading
 import time
-from typing import Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
 
 from ai_classification.config import get_config, is_ai_enabled
-from ai_classification.openai_client import OpenPipeClient, OPENPIPE_AVAILABLE
+from ai_classification.openai_client import (
+    OpenPipeClient, CircuitOpenError, openpipe_available, ClassificationFailedError
+)
 from ai_classification.prompt_manager import PromptManager
 from ai_classification.response_validator import ResponseValidator
 from ai_classification.cache_manager import CacheManager
+from ai_classification.single_flight import SingleFlight
 from ai_classification.logging_config import setup_logging
 
 logger = setup_logging(__name__)
@@ -21,94 +29,484 @@ logger = setup_logging(__name__)
 class DrugClassifier:
     """Classifier for drug therapeutic classification."""
     
-    def __init__(self):
-        """Initialize the drug classifier."""
+    def __init__(self, mongo_uri: Optional[str] = None):
+        """
+        Initialize the drug classifier.
+        
+        Args:
+            mongo_uri: MongoDB connection URI of the cache and the shared rate limiter (defaults to config)
+        """
         self.config = get_config()
         self.prompt_manager = PromptManager()
         self.response_validator = ResponseValidator()
-        self.cache_manager = CacheManager()
+        self.cache_manager = CacheManager(mongo_uri=mongo_uri)
+        
+        # Concurrent misses for the same request share one API call
+        self.in_flight = SingleFlight()
+        
+        # Background refresh of stale cache entries, created on first use
+        self._refresh_executor = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
         
         # Initialize OpenPipe client if available and enabled
         self.openai_client = None
-        if is_ai_enabled() and OPENPIPE_AVAILABLE:
+        if is_ai_enabled() and openpipe_available():
             try:
-                self.openai_client = OpenPipeClient()
+                self.openai_client = OpenPipeClient(mongo_uri=mongo_uri)
             except ImportError as e:
                 logger.warning(f"Failed to initialize OpenPipe client: {e}")
         
         logger.info("Initialized drug classifier")
     
-    def classify_drug(self, drug_data: Dict[str, Any]) -> Dict[str, Any]:
+    def classify_drug(self, drug_data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Classify drug therapeutic class.
         
         Args:
             drug_data: Drug data dictionary
+            deadline: Time (as returned by time.time()) by which to give up;
+                defaults to AI_CLASSIFICATION_DEADLINE seconds from now
             
         Returns:
             Dict[str, Any]: Classification result with metadata
         """
-        # Check if AI classification is enabled
-        if not is_ai_enabled():
-            logger.info("AI classification is disabled")
-            return self._get_empty_result()
-        
-        # Check if OpenPipe client is available
-        if not self.openai_client:
-            logger.warning("OpenPipe client not available")
+        if not self._classification_available():
             return self._get_empty_result()
         
         start_time = time.time()
         
         try:
-            # Generate cache key
-            cache_key = self.cache_manager.generate_cache_key(drug_data)
+            # Build prompts
+            system_prompt = self.prompt_manager.get_system_prompt()
+            user_prompt = self.prompt_manager.build_classification_prompt(drug_data)
+            
+            # Generate cache key from the exact request
+            cache_key = self._generate_prompt_cache_key(user_prompt)
             
             # Check cache
             cached_result = self.cache_manager.get_cached_classification(cache_key)
             if cached_result:
-                logger.info(f"Using cached classification for {drug_data.get('drugName', 'Unknown')}")
-                return cached_result
+                return self._use_cached_result(drug_data, cached_result, system_prompt,
+                                               user_prompt, cache_key, start_time)
+            
+            # Coalesced callers share one result; each gets its own copy
+            return copy.deepcopy(self.in_flight.do(cache_key, partial(
+                self._classify_uncached, drug_data, system_prompt, user_prompt, cache_key, start_time,
+                deadline=deadline
+            )))
+            
+        except Exception as e:
+            return self._get_failed_result(e, start_time)
+    
+    async def classify_drug_async(self, drug_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Classify drug therapeutic class from asyncio code.
+        
+        Blocking work runs in the event loop's default executor. Concurrent
+        tasks and threads classifying the same request share one API call.
+        
+        Args:
+            drug_data: Drug data dictionary
             
+        Returns:
+            Dict[str, Any]: Classification result with metadata
+        """
+        if not self._classification_available():
+            return self._get_empty_result()
+        
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        
+        try:
             # Build prompts
             system_prompt = self.prompt_manager.get_system_prompt()
-            user_prompt = self.prompt_manager.build_classification_prompt(drug_data)
+            user_prompt = await loop.run_in_executor(
+                None, self.prompt_manager.build_classification_prompt, drug_data
+            )
             
-            # Get classification from OpenPipe AI
-            classification, metadata = self.openai_client.get_classification(system_prompt, user_prompt)
+            # Generate cache key from the exact request
+            cache_key = self._generate_prompt_cache_key(user_prompt)
             
-            # Validate response
-            validated_classification = self.response_validator.validate_classification_response(classification)
-            validated_metadata = self.response_validator.validate_metadata(metadata)
+            # Check cache
+            cached_result = await loop.run_in_executor(
+                None, self.cache_manager.get_cached_classification, cache_key
+            )
+            if cached_result:
+                return self._use_cached_result(drug_data, cached_result, system_prompt,
+                                               user_prompt, cache_key, start_time)
             
-            # Add processing time if not in metadata
-            if 'processing_time' not in validated_metadata:
-                validated_metadata['processing_time'] = time.time() - start_time
+            result = await self.in_flight.do_async(cache_key, partial(
+                self._classify_uncached, drug_data, system_prompt, user_prompt, cache_key, start_time
+            ))
+            return copy.deepcopy(result)
             
-            # Store in cache
-            self.cache_manager.store_classification(cache_key, validated_classification, validated_metadata)
+        except Exception as e:
+            return self._get_failed_result(e, start_time)
+    
+    def classify_drugs(self, drug_data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Classify a batch of drugs, resolving the whole batch against the cache first.
+        
+        Args:
+            drug_data_list: List of drug data dictionaries
             
-            # Prepare result
-            result = {
-                'classification': validated_classification,
-                'metadata': validated_metadata,
-                'cached': False
-            }
+        Returns:
+            List[Dict[str, Any]]: Classification result per drug, in input order
+        """
+        if not self._classification_available():
+            return [self._get_empty_result() for _ in drug_data_list]
+        
+        # Build every request up front so the cache is checked in one round-trip
+        requests = []
+        for drug_data in drug_data_list:
+            try:
+                user_prompt = self.prompt_manager.build_classification_prompt(drug_data)
+                requests.append((user_prompt, self._generate_prompt_cache_key(user_prompt)))
+            except Exception as e:
+                requests.append(e)
+        
+        resolved = self.cache_manager.get_many([
+            request[1] for request in requests if not isinstance(request, Exception)
+        ])
+        logger.info(f"Batch of {len(drug_data_list)} drugs: {len(resolved)} classifications cached")
+        
+        results = []
+        for drug_data, request in zip(drug_data_list, requests):
+            start_time = time.time()
+            
+            if isinstance(request, Exception):
+                results.append(self._get_failed_result(request, start_time))
+                continue
             
-            logger.info(f"Successfully classified {drug_data.get('drugName', 'Unknown')} "
-                       f"as {validated_classification.get('primary_therapeutic_class', 'Unknown')}")
+            user_prompt, cache_key = request
+            if cache_key in resolved:
+                # Drugs sharing a request each get their own copy of the result
+                results.append(self._use_cached_result(drug_data, copy.deepcopy(resolved[cache_key]),
+                                                       self.prompt_manager.get_system_prompt(),
+                                                       user_prompt, cache_key, start_time))
+                continue
             
-            return result
+            try:
+                system_prompt = self.prompt_manager.get_system_prompt()
+                result = copy.deepcopy(self.in_flight.do(cache_key, partial(
+                    self._classify_uncached, drug_data, system_prompt, user_prompt, cache_key, start_time
+                )))
+                
+                # Drugs later in the batch with the same request reuse this result
+                resolved[cache_key] = result
+                results.append(result)
+                
+            except Exception as e:
+                results.append(self._get_failed_result(e, start_time))
+        
+        return results
+    
+    def _use_cached_result(self, drug_data: Dict[str, Any], cached_result: Dict[str, Any],
+                           system_prompt: str, user_prompt: str, cache_key: str,
+                           start_time: float) -> Dict[str, Any]:
+        """
+        Get the classification result for a cache hit.
+        
+        Known failures become failed results without calling the AI service,
+        and stale classifications are refreshed in the background.
+        
+        Args:
+            drug_data: Drug data dictionary
+            cached_result: Result returned by the cache manager
+            system_prompt: System prompt
+            user_prompt: User prompt built from the drug data
+            cache_key: Cache key for the request
+            start_time: Time the classification started
+            
+        Returns:
+            Dict[str, Any]: Classification result with metadata
+        """
+        if cached_result.get('negative'):
+            failure = cached_result['failure']
+            logger.info(f"Skipping {drug_data.get('drugName', 'Unknown')}: classification failed "
+                       f"recently ({failure.get('reason')}), retrying after {cached_result['expires_at']}")
             
+            failed_result = self._get_empty_result()
+            failed_result['metadata'].update({
+                'processing_time': time.time() - start_time,
+                'attempts': failure.get('attempts', 0),
+                'error': failure.get('reason'),
+                'negative_cached': True
+            })
+            return failed_result
+        
+        logger.info(f"Using cached classification for {drug_data.get('drugName', 'Unknown')}")
+        if cached_result.get('stale'):
+            self._schedule_refresh(drug_data, system_prompt, user_prompt, cache_key)
+        return cached_result
+    
+    def warm_cache(self, drug_data_list: List[Dict[str, Any]],
+                   max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Pre-compute and cache classifications for a list of drugs.
+        
+        Missing classifications are requested concurrently through the shared
+        client rate limiter and stored once, in batches, by the cache manager.
+        
+        Args:
+            drug_data_list: List of drug data dictionaries
+            max_workers: Concurrent classifications (defaults to config)
+            
+        Returns:
+            Dict[str, Any]: Warming results
+        """
+        if not self._classification_available():
+            return {'total_drugs': len(drug_data_list), 'error': 'AI classification not available'}
+        
+        return self.cache_manager.warm_cache(
+            drug_data_list,
+            self._classify_for_cache,
+            self.generate_cache_key,
+            max_workers=max_workers
+        )
+    
+    def _classify_for_cache(self, drug_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Classify a drug with the AI service without storing the result.
+        
+        Args:
+            drug_data: Drug data dictionary
+            
+        Returns:
+            Dict[str, Any]: Classification result with metadata
+        """
+        start_time = time.time()
+        system_prompt = self.prompt_manager.get_system_prompt()
+        user_prompt = self.prompt_manager.build_classification_prompt(drug_data)
+        
+        return self._classify_uncached(drug_data, system_prompt, user_prompt, None, start_time, store=False)
+    
+    def _schedule_refresh(self, drug_data: Dict[str, Any], system_prompt: str,
+                          user_prompt: str, cache_key: str) -> None:
+        """
+        Queue a background reclassification of a stale cache entry.
+        
+        Each key is refreshed at most once at a time; the stale result keeps
+        being served until the refreshed one is stored.
+        
+        Args:
+            drug_data: Drug data dictionary
+            system_prompt: System prompt
+            user_prompt: User prompt built from the drug data
+            cache_key: Cache key of the stale entry
+        """
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=self.config['AI_CACHE_REFRESH_WORKERS'],
+                    thread_name_prefix='cache-refresh'
+                )
+            executor = self._refresh_executor
+            
+            # Submit under the lock so wait_for_refreshes() cannot shut the
+            # executor down in between; a failed refresh must not fail the hit
+            self._refreshing.add(cache_key)
+            try:
+                executor.submit(self._refresh, drug_data, system_prompt, user_prompt, cache_key)
+            except RuntimeError as e:
+                self._refreshing.discard(cache_key)
+                logger.warning(f"Failed to queue refresh of stale classification: {e}")
+                return
+        
+        logger.debug(f"Queued refresh of stale classification for {drug_data.get('drugName', 'Unknown')}")
+    
+    def _refresh(self, drug_data: Dict[str, Any], system_prompt: str,
+                 user_prompt: str, cache_key: str) -> None:
+        """
+        Reclassify a drug and replace its stale cache entry.
+        
+        Args:
+            drug_data: Drug data dictionary
+            system_prompt: System prompt
+            user_prompt: User prompt built from the drug data
+            cache_key: Cache key of the stale entry
+        """
+        try:
+            self.in_flight.do(cache_key, partial(
+                self._classify_uncached, drug_data, system_prompt, user_prompt, cache_key, time.time(),
+                cache_failures=False
+            ))
         except Exception as e:
-            logger.error(f"Classification failed: {e}")
+            logger.warning(f"Background refresh failed for {drug_data.get('drugName', 'Unknown')}: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(cache_key)
+    
+    def wait_for_refreshes(self) -> None:
+        """Wait for queued background refreshes to finish."""
+        with self._refresh_lock:
+            executor, self._refresh_executor = self._refresh_executor, None
+        
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def close(self) -> None:
+        """Finish background refreshes and release the cache and rate limiter connections."""
+        self.wait_for_refreshes()
+        self.cache_manager.close()
+        if self.openai_client:
+            self.openai_client.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get classifier statistics.
+        
+        Returns:
+            Dict[str, Any]: Request coalescing, cache and client statistics
+        """
+        stats = {
+            'coalesced_requests': self.in_flight.coalesced,
+            'in_flight_requests': self.in_flight.in_flight,
+            'cache': self.cache_manager.get_metrics()
+        }
+        if self.openai_client:
+            stats['client'] = self.openai_client.get_stats()
+        
+        return stats
+    
+    def _classification_available(self) -> bool:
+        """
+        Check that AI classification is enabled and a client is available.
+        
+        Returns:
+            bool: True if classification requests can be made
+        """
+        # Check if AI classification is enabled
+        if not is_ai_enabled():
+            logger.info("AI classification is disabled")
+            return False
+        
+        # Check if OpenPipe client is available
+        if not self.openai_client:
+            logger.warning("OpenPipe client not available")
+            return False
+        
+        return True
+    
+    def _classify_uncached(self, drug_data: Dict[str, Any], system_prompt: str, user_prompt: str,
+                           cache_key: Optional[str], start_time: float,
+                           store: bool = True, deadline: Optional[float] = None,
+                           cache_failures: bool = True) -> Dict[str, Any]:
+        """
+        Classify a drug with the AI service and cache the result.
+        
+        Args:
+            drug_data: Drug data dictionary
+            system_prompt: System prompt
+            user_prompt: User prompt built from the drug data
+            cache_key: Cache key for the request
+            start_time: Time the classification started
+            store: Store the result in the cache
+            deadline: Time by which to give up; defaults to the configured
+                budget counted from start_time
+            cache_failures: Store a negative entry if the request fails in a
+                way that would repeat
             
-            # Return empty result on failure
-            empty_result = self._get_empty_result()
-            empty_result['metadata']['processing_time'] = time.time() - start_time
-            empty_result['metadata']['error'] = str(e)
+        Returns:
+            Dict[str, Any]: Classification result with metadata
+        """
+        if deadline is None and self.config['AI_CLASSIFICATION_DEADLINE'] > 0:
+            deadline = start_time + self.config['AI_CLASSIFICATION_DEADLINE']
+        
+        # Get classification from OpenPipe AI
+        try:
+            classification, metadata = self.openai_client.get_classification(
+                system_prompt, user_prompt, deadline=deadline
+            )
+        except ClassificationFailedError as e:
+            # Do not retry this request on every run until the entry expires
+            if e.cacheable and store and cache_failures:
+                self.cache_manager.store_failure(cache_key, str(e), e.attempts)
+            raise
+        
+        # Validate response
+        validated_classification = self.response_validator.validate_classification_response(classification)
+        validated_metadata = self.response_validator.validate_metadata(metadata)
+        
+        # Add processing time if not in metadata
+        if 'processing_time' not in validated_metadata:
+            validated_metadata['processing_time'] = time.time() - start_time
+        
+        # Store in cache
+        if store:
+            self.cache_manager.store_classification(cache_key, validated_classification, validated_metadata)
+        
+        # Prepare result
+        result = {
+            'classification': validated_classification,
+            'metadata': validated_metadata,
+            'cached': False
+        }
+        
+        logger.info(f"Successfully classified {drug_data.get('drugName', 'Unknown')} "
+                   f"as {validated_classification.get('primary_therapeutic_class', 'Unknown')}")
+        
+        return result
+    
+    def generate_cache_key(self, drug_data: Dict[str, Any]) -> str:
+        """
+        Generate the cache key for a drug's classification request.
+        
+        Args:
+            drug_data: Drug data dictionary
+            
+        Returns:
+            str: Cache key
+        """
+        user_prompt = self.prompt_manager.build_classification_prompt(drug_data)
+        return self._generate_prompt_cache_key(user_prompt)
+    
+    def _generate_prompt_cache_key(self, user_prompt: str) -> str:
+        """
+        Generate the cache key for a user prompt sent with the current model settings.
+        
+        Args:
+            user_prompt: User prompt
+            
+        Returns:
+            str: Cache key
+        """
+        return self.cache_manager.generate_cache_key(
+            user_prompt,
+            self.config['AI_MODEL'],
+            self.config['AI_TEMPERATURE'],
+            self.prompt_manager.system_prompt_digest
+        )
+    
+    def _get_failed_result(self, error: Exception, start_time: float) -> Dict[str, Any]:
+        """
+        Get the empty classification result returned after a failure.
+        
+        Args:
+            error: Exception that caused the failure
+            start_time: Time the classification started
             
-            return empty_result
+        Returns:
+            Dict[str, Any]: Empty classification result with error metadata
+        """
+        if isinstance(error, CircuitOpenError):
+            # Expected for every document during an outage
+            logger.debug(f"Classification skipped: {error}")
+        else:
+            logger.error(f"Classification failed: {error}")
+        
+        # Return empty result on failure
+        empty_result = self._get_empty_result()
+        empty_result['metadata']['processing_time'] = time.time() - start_time
+        empty_result['metadata']['error'] = str(error)
+        if isinstance(error, CircuitOpenError):
+            empty_result['metadata']['circuit_open'] = True
+        
+        return empty_result
     
     def _get_empty_result(self) -> Dict[str, Any]:
         """
@@ -0,0 +1,313 @@
+"""
+MongoDB-backed queue of classification jobs.
+
+The importer enqueues one job per drug document that needs classification, and
+any number of worker processes claim jobs with atomic leases. A job whose
+lease expires (its worker died or stalled) is claimed again; failed jobs are
+retried with exponential backoff and dead-lettered after a maximum number of
+attempts.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from ai_classification.config import get_config
+from ai_classification.logging_config import setup_logging
+from ai_classification.mongo_clients import acquire_client, mongo_client_options, release_client
+
+logger = setup_logging(__name__)
+
+# Job states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+JOB_STATES = (PENDING, LEASED, DONE, DEAD)
+
+_DUPLICATE_KEY_ERROR = 11000
+
+
+class ClassificationJobQueue:
+    """Queue of drug classification jobs keyed by drug slug."""
+
+    def __init__(self, mongo_uri: Optional[str] = None, db_name: str = 'drug_facts',
+                 collection_name: str = 'classification_jobs'):
+        """
+        Initialize the job queue.
+
+        Args:
+            mongo_uri: MongoDB connection URI (defaults to config)
+            db_name: Database name
+            collection_name: Job collection name
+        """
+        config = get_config()
+
+        self.mongo_uri = mongo_uri or config.get('MONGODB_URI', 'mongodb://localhost:27017/')
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.client_options = mongo_client_options(config)
+
+        # A job is claimed again once its lease runs out
+        self.lease_seconds = config['AI_JOB_LEASE_SECONDS']
+        self.max_attempts = max(1, config['AI_JOB_MAX_ATTEMPTS'])
+        self.retry_delay = config['AI_JOB_RETRY_DELAY']
+        self.retention = config['AI_JOB_RETENTION']
+
+        self.client = None
+        self.collection = None
+
+    def _get_collection(self) -> Collection:
+        """
+        Get the MongoDB collection, initializing connection if needed.
+
+        Returns:
+            Collection: MongoDB collection
+        """
+        if self.client is None:
+            self.client = acquire_client(self.mongo_uri, **self.client_options)
+            self.collection = self.client[self.db_name][self.collection_name]
+
+            try:
+                self.collection.create_index([('status', ASCENDING), ('available_at', ASCENDING)])
+                self.collection.create_index([('status', ASCENDING), ('lease_expires_at', ASCENDING)])
+                # Only finished jobs have completed_at; dead jobs are kept
+                self.collection.create_index('completed_at', expireAfterSeconds=self.retention)
+                logger.debug("Ensured classification job indexes")
+            except PyMongoError as e:
+                logger.warning(f"Failed to create classification job indexes: {e}")
+
+        return self.collection
+
+    def enqueue(self, slugs: Iterable[str]) -> int:
+        """
+        Queue classification jobs, resetting finished or dead jobs for the same slugs.
+
+        Jobs currently leased are left to their worker and flagged to run
+        again once it completes them, so the newer document is classified.
+
+        Args:
+            slugs: Slugs of the drug documents to classify
+
+        Returns:
+            int: Number of jobs queued
+        """
+        now = datetime.utcnow()
+        operations = []
+        for slug in dict.fromkeys(slugs):
+            operations.append(UpdateOne(
+                {'_id': slug, 'status': {'$ne': LEASED}},
+                {
+                    '$set': {'status': PENDING, 'attempts': 0, 'enqueued_at': now,
+                             'available_at': now, 'last_error': None},
+                    '$unset': {'lease_expires_at': '', 'worker_id': '', 'completed_at': '', 'dead_at': '',
+                               'requeue': ''}
+                },
+                upsert=True
+            ))
+            operations.append(UpdateOne({'_id': slug, 'status': LEASED}, {'$set': {'requeue': True}}))
+        if not operations:
+            return 0
+
+        try:
+            result = self._get_collection().bulk_write(operations, ordered=False)
+            queued = result.upserted_count + result.modified_count
+
+        except BulkWriteError as e:
+            # A leased job fails the filter and its upsert collides on _id
+            errors = e.details.get('writeErrors', [])
+            leased = sum(1 for error in errors if error.get('code') == _DUPLICATE_KEY_ERROR)
+            if leased < len(errors):
+                logger.warning(f"Failed to queue {len(errors) - leased} classification jobs: {e}")
+            queued = e.details.get('nUpserted', 0) + e.details.get('nModified', 0)
+
+        logger.info(f"Queued {queued} classification jobs")
+        return queued
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the next available job.
+
+        Pending jobs are claimed oldest first; once none are due, jobs whose
+        lease expired are claimed again.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            Optional[Dict[str, Any]]: Leased job, or None if no job is available
+        """
+        collection = self._get_collection()
+        now = datetime.utcnow()
+        update = {
+            '$set': {'status': LEASED, 'worker_id': worker_id, 'leased_at': now,
+                     'lease_expires_at': now + timedelta(seconds=self.lease_seconds)},
+            '$inc': {'attempts': 1}
+        }
+
+        job = collection.find_one_and_update(
+            {'status': PENDING, 'available_at': {'$lte': now}},
+            update,
+            sort=[('available_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            job = collection.find_one_and_update(
+                {'status': LEASED, 'lease_expires_at': {'$lte': now}, 'attempts': {'$lt': self.max_attempts}},
+                update,
+                return_document=ReturnDocument.AFTER
+            )
+            if job is not None:
+                logger.warning(f"Reclaimed classification job {job['_id']} after its lease expired")
+        return job
+
+    def complete(self, job: Dict[str, Any]) -> bool:
+        """
+        Mark a leased job as done, or queue it again if it was re-enqueued while leased.
+
+        Args:
+            job: Job returned by lease()
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        collection = self._get_collection()
+        now = datetime.utcnow()
+        query = {'_id': job['_id'], 'status': LEASED, 'worker_id': job['worker_id']}
+
+        result = collection.update_one(
+            {**query, 'requeue': {'$ne': True}},
+            {'$set': {'status': DONE, 'completed_at': now},
+             '$unset': {'lease_expires_at': ''}}
+        )
+        if result.modified_count:
+            return True
+
+        result = collection.update_one(
+            {**query, 'requeue': True},
+            {'$set': {'status': PENDING, 'attempts': 0, 'enqueued_at': now, 'available_at': now,
+                      'last_error': None},
+             '$unset': {'lease_expires_at': '', 'worker_id': '', 'requeue': ''}}
+        )
+        if result.modified_count:
+            logger.info(f"Queued classification job {job['_id']} again after it was re-enqueued while leased")
+        return result.modified_count > 0
+
+    def release(self, job: Dict[str, Any], delay: float) -> bool:
+        """
+        Return a leased job to the queue without counting the attempt.
+
+        Args:
+            job: Job returned by lease()
+            delay: Seconds before the job can be leased again
+
+        Returns:
+            bool: False if the lease was lost to another worker
+        """
+        result = self._get_collection().update_one(
+            {'_id': job['_id'], 'status': LEASED, 'worker_id': job['worker_id']},
+            {'$set': {'status': PENDING, 'available_at': datetime.utcnow() + timedelta(seconds=delay)},
+             '$inc': {'attempts': -1},
+             '$unset': {'lease_expires_at': ''}}
+        )
+        return result.modified_count > 0
+
+    def fail(self, job: Dict[str, Any], error: str, retry: bool = True) -> str:
+        """
+        Record a failed attempt, retrying the job later or dead-lettering it.
+
+        Retries wait AI_JOB_RETRY_DELAY seconds, doubling with each attempt.
+
+        Args:
+            job: Job returned by lease()
+            error: Failure reason
+            retry: Whether the failure may succeed on a later attempt
+
+        Returns:
+            str: New job state (pending or dead)
+        """
+        now = datetime.utcnow()
+        if retry and job['attempts'] < self.max_attempts:
+            status = PENDING
+            update = {'$set': {'status': PENDING, 'last_error': error,
+                               'available_at': now + timedelta(seconds=self.retry_delay * 2 ** (job['attempts'] - 1))},
+                      '$unset': {'lease_expires_at': ''}}
+        else:
+            status = DEAD
+            update = {'$set': {'status': DEAD, 'last_error': error, 'dead_at': now},
+                      '$unset': {'lease_expires_at': ''}}
+            logger.error(f"Dead-lettered classification job {job['_id']} after "
+                         f"{job['attempts']} attempts: {error}")
+
+        self._get_collection().update_one(
+            {'_id': job['_id'], 'status': LEASED, 'worker_id': job['worker_id']}, update
+        )
+        return status
+
+    def dead_letter_expired(self) -> int:
+        """
+        Dead-letter jobs whose last allowed lease expired.
+
+        Returns:
+            int: Number of jobs dead-lettered
+        """
+        now = datetime.utcnow()
+        result = self._get_collection().update_many(
+            {'status': LEASED, 'lease_expires_at': {'$lte': now}, 'attempts': {'$gte': self.max_attempts}},
+            {'$set': {'status': DEAD, 'dead_at': now, 'last_error': 'Lease expired on the last attempt'},
+             '$unset': {'lease_expires_at': ''}}
+        )
+        if result.modified_count:
+            logger.error(f"Dead-lettered {result.modified_count} classification jobs with expired leases")
+        return result.modified_count
+
+    def requeue_dead(self) -> int:
+        """
+        Queue dead-lettered jobs again with a fresh attempt count.
+
+        Returns:
+            int: Number of jobs queued
+        """
+        result = self._get_collection().update_many(
+            {'status': DEAD},
+            {'$set': {'status': PENDING, 'attempts': 0, 'available_at': datetime.utcnow()},
+             '$unset': {'dead_at': ''}}
+        )
+        logger.info(f"Requeued {result.modified_count} dead classification jobs")
+        return result.modified_count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue statistics.
+
+        Returns:
+            Dict[str, Any]: Jobs per state, jobs completed in the last minute
+                and the age of the oldest due pending job in seconds
+        """
+        collection = self._get_collection()
+        now = datetime.utcnow()
+
+        stats = {state: 0 for state in JOB_STATES}
+        for group in collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            if group['_id'] in stats:
+                stats[group['_id']] = group['count']
+
+        stats['completed_last_minute'] = collection.count_documents(
+            {'completed_at': {'$gte': now - timedelta(minutes=1)}}
+        )
+
+        oldest = collection.find_one({'status': PENDING, 'available_at': {'$lte': now}},
+                                     {'enqueued_at': 1}, sort=[('available_at', ASCENDING)])
+        stats['oldest_pending_age'] = (now - oldest['enqueued_at']).total_seconds() if oldest else 0.0
+
+        return stats
+
+    def close(self) -> None:
+        """Release the MongoDB client."""
+        if self.client:
+            release_client(self.client)
+            self.client = None
+            self.collection = None
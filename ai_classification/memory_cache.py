@@ -0,0 +1,116 @@
+"""
+In-process LRU cache for AI classification results.
+
+This module provides a bounded, thread-safe least-recently-used cache with
+per-entry expiry that sits in front of the MongoDB classification cache, so
+repeated lookups within one process avoid a network round-trip.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class MemoryCache:
+    """Thread-safe LRU cache bounded by entry count and approximate size."""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: int = 3600):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_entries: Maximum number of entries (0 disables the cache)
+            max_bytes: Maximum total approximate size of entries in bytes
+            ttl: Maximum time an entry is kept in memory, in seconds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache holds any entries at all."""
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[Dict[str, Any]]: Cached value or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry['expires'] <= time.time():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return entry['value']
+
+    def put(self, key: str, value: Dict[str, Any], size_bytes: int,
+            expires_at: Optional[float] = None) -> None:
+        """
+        Store a value, evicting least recently used entries if over capacity.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            size_bytes: Approximate size of the value
+            expires_at: Unix time after which the value must not be served
+        """
+        if not self.enabled or size_bytes > self.max_bytes:
+            return
+
+        expires = time.time() + self.ttl
+        if expires_at is not None:
+            expires = min(expires, expires_at)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {'value': value, 'size': size_bytes, 'expires': expires}
+            self.size_bytes += size_bytes
+
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """
+        Remove a value if present.
+
+        Args:
+            key: Cache key
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry; the caller must hold the lock."""
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry['size']
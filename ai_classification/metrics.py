@@ -0,0 +1,111 @@
+"""
+Streaming metrics for AI classification components.
+
+This module provides a constant-memory latency histogram with relative-error
+quantiles in the style of DDSketch, so long-lived workers can report
+p50/p95/p99 latencies without keeping every sample.
+"""
+
+import math
+import threading
+from typing import Dict
+
+
+class LatencyHistogram:
+    """Thread-safe streaming histogram of durations with bounded relative error."""
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6):
+        """
+        Initialize the histogram.
+
+        Args:
+            relative_accuracy: Maximum relative error of reported quantiles
+            min_value: Smallest distinguishable duration in seconds; smaller
+                durations are counted in the lowest bucket
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._count = 0
+        self._total = 0.0
+        self._min = math.inf
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        """
+        Record a duration.
+
+        Args:
+            value: Duration in seconds
+        """
+        index = math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self._count += 1
+            self._total += value
+            if value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+
+    @property
+    def count(self) -> int:
+        """Number of recorded durations."""
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        """Mean of recorded durations, or 0.0 if none."""
+        with self._lock:
+            return self._total / self._count if self._count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the recorded durations.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            float: Estimated duration, or 0.0 if none were recorded
+        """
+        with self._lock:
+            return self._quantile(q)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get a consistent summary of the recorded durations.
+
+        Returns:
+            Dict[str, float]: Count, mean, min, max and p50/p95/p99
+        """
+        with self._lock:
+            return {
+                'count': self._count,
+                'mean': self._total / self._count if self._count else 0.0,
+                'min': self._min if self._count else 0.0,
+                'max': self._max,
+                'p50': self._quantile(0.50),
+                'p95': self._quantile(0.95),
+                'p99': self._quantile(0.99)
+            }
+
+    def _quantile(self, q: float) -> float:
+        """Estimate a quantile; the caller must hold the lock."""
+        if not self._count:
+            return 0.0
+
+        rank = q * (self._count - 1)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket in relative terms
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self._min), self._max)
+
+        return self._max
@@ -0,0 +1,165 @@
+"""
+Process-wide registry of shared MongoDB clients.
+
+Components connecting with the same URI and client options share one
+MongoClient, and with it one connection pool, one set of monitor threads and
+one round of TLS handshakes. Clients are reference counted and closed when the
+last component releases them.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Mapping
+
+from ai_classification.logging_config import setup_logging
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+
+logger = setup_logging(__name__)
+
+# Wire compressors MongoDB negotiates; zstd needs the zstandard package and
+# snappy the python-snappy package, otherwise pymongo skips them with a warning
+MONGO_COMPRESSORS = ('zstd', 'snappy', 'zlib')
+
+# Command line options and the configuration keys they set
+_CLI_OPTIONS = (
+    ('--mongo-pool-size', 'MONGO_MAX_POOL_SIZE', int, 'Maximum MongoDB connections per server'),
+    ('--mongo-compressors', 'MONGO_COMPRESSORS', str,
+     f"Comma-separated wire compressors in order of preference ({', '.join(MONGO_COMPRESSORS)})"),
+    ('--mongo-connect-timeout-ms', 'MONGO_CONNECT_TIMEOUT_MS', int, 'MongoDB connection timeout'),
+    ('--mongo-server-selection-timeout-ms', 'MONGO_SERVER_SELECTION_TIMEOUT_MS', int,
+     'Time to wait for a suitable MongoDB server'),
+    ('--mongo-socket-timeout-ms', 'MONGO_SOCKET_TIMEOUT_MS', int, 'MongoDB socket read timeout, 0 for none'),
+)
+
+_clients: Dict[Hashable, 'MongoClient'] = {}
+_refcounts: Dict[Hashable, int] = {}
+_lock = threading.Lock()
+
+
+def mongo_client_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Build MongoClient keyword arguments from the configuration.
+
+    Args:
+        config: Configuration
+
+    Returns:
+        Dict[str, Any]: MongoClient keyword arguments
+    """
+    options = {
+        'maxPoolSize': int(config['MONGO_MAX_POOL_SIZE']),
+        'connectTimeoutMS': int(config['MONGO_CONNECT_TIMEOUT_MS']),
+        'serverSelectionTimeoutMS': int(config['MONGO_SERVER_SELECTION_TIMEOUT_MS']),
+    }
+    if config['MONGO_SOCKET_TIMEOUT_MS']:
+        options['socketTimeoutMS'] = int(config['MONGO_SOCKET_TIMEOUT_MS'])
+
+    compressors = [name.strip() for name in str(config['MONGO_COMPRESSORS'] or '').split(',') if name.strip()]
+    unknown = [name for name in compressors if name not in MONGO_COMPRESSORS]
+    if unknown:
+        logger.warning(f"Ignoring unknown MongoDB compressors: {', '.join(unknown)}")
+    compressors = [name for name in compressors if name in MONGO_COMPRESSORS]
+    if compressors:
+        options['compressors'] = compressors
+
+    return options
+
+
+def _client_key(mongo_uri: str, options: Dict[str, Any]) -> Hashable:
+    """Registry key of a URI and client options."""
+    return mongo_uri, tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value) for name, value in options.items()
+    ))
+
+
+def acquire_client(mongo_uri: str, **options: Any) -> 'MongoClient':
+    """
+    Get the shared client for a URI and options, creating it on first use.
+
+    Every call must be paired with a release_client() call.
+
+    Args:
+        mongo_uri: MongoDB connection URI
+        **options: MongoClient keyword arguments
+
+    Returns:
+        MongoClient: Shared client
+    """
+    key = _client_key(mongo_uri, options)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            from pymongo import MongoClient
+
+            client = MongoClient(mongo_uri, **options)
+            _clients[key] = client
+            _refcounts[key] = 0
+            logger.info(f"Created shared MongoDB client ({len(_clients)} open)")
+        _refcounts[key] += 1
+        return client
+
+
+def release_client(client: 'MongoClient') -> None:
+    """
+    Release a client from acquire_client(), closing it after its last user.
+
+    Args:
+        client: Shared client
+    """
+    with _lock:
+        for key, shared_client in _clients.items():
+            if shared_client is client:
+                break
+        else:
+            logger.warning("Released a MongoDB client that is not shared; closing it")
+            client.close()
+            return
+
+        _refcounts[key] -= 1
+        if _refcounts[key] > 0:
+            return
+        del _clients[key]
+        del _refcounts[key]
+
+    client.close()
+    logger.info(f"Closed shared MongoDB client ({len(_clients)} open)")
+
+
+def shared_client_count() -> int:
+    """
+    Get the number of open shared clients.
+
+    Returns:
+        int: Open shared clients
+    """
+    with _lock:
+        return len(_clients)
+
+
+def add_mongo_client_arguments(parser) -> None:
+    """
+    Add MongoDB client options to a command line parser.
+
+    Args:
+        parser: argparse parser
+    """
+    for flag, key, value_type, help_text in _CLI_OPTIONS:
+        parser.add_argument(flag, type=value_type, default=None, metavar='N' if value_type is int else 'NAMES',
+                            help=f"{help_text} (default: {key})")
+
+
+def apply_mongo_client_arguments(args) -> None:
+    """
+    Set the configuration environment from parsed MongoDB client options.
+
+    Call reload_config() afterwards for the options to take effect.
+
+    Args:
+        args: Parsed arguments from a parser set up by add_mongo_client_arguments()
+    """
+    for flag, key, _, _ in _CLI_OPTIONS:
+        value = getattr(args, flag.lstrip('-').replace('-', '_'))
+        if value is not None:
+            os.environ[key] = str(value)
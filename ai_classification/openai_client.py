@@ -17,20 +17,63 @@ from ai_classification.logging_config import setup_logging
 
 logger = setup_logging(__name__)
 
-try:
-    import openpipe
-    from openpipe import OpenAI
-    OPENPIPE_AVAILABLE = True
-    logger.info("OpenPipe SDK available")
-except ImportError:
-    try:
-        import openai
-        from openai import OpenAI
-        OPENPIPE_AVAILABLE = False
-        logger.warning("OpenPipe module not available, falling back to OpenAI client. Install with 'pip install openpipe'")
-    except ImportError:
-        OPENPIPE_AVAILABLE = False
-        logger.error("Neither OpenPipe nor OpenAI modules available. Install with 'pip install openpipe openai'")
+
+class _SDK:
+    """The OpenPipe or OpenAI SDK, imported on first use.
+    
+    Importing it costs more than the rest of the package, and CLI runs with
+    AI disabled never need it.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.OpenAI = None
+        self.openpipe_available = False
+
+
+_sdk = _SDK()
+
+
+def _load_sdk() -> Tuple[Optional[Any], bool]:
+    """
+    Import the OpenPipe SDK, falling back to the OpenAI SDK, once per process.
+    
+    Returns:
+        Tuple[Optional[Any], bool]: The SDK's OpenAI client class (None if
+            neither SDK is installed) and whether it is the OpenPipe SDK
+    """
+    if not _sdk.loaded:
+        with _sdk.lock:
+            if not _sdk.loaded:
+                try:
+                    from openpipe import OpenAI
+                    available = True
+                    logger.info("OpenPipe SDK available")
+                except ImportError:
+                    available = False
+                    try:
+                        from openai import OpenAI
+                        logger.warning("OpenPipe module not available, falling back to OpenAI client. Install with 'pip install openpipe'")
+                    except ImportError:
+                        OpenAI = None
+                        logger.error("Neither OpenPipe nor OpenAI modules available. Install with 'pip install openpipe openai'")
+                
+                _sdk.OpenAI = OpenAI
+                _sdk.openpipe_available = available
+                _sdk.loaded = True
+    
+    return _sdk.OpenAI, _sdk.openpipe_available
+
+
+def openpipe_available() -> bool:
+    """
+    Check if the OpenPipe SDK is installed, importing it on first call.
+    
+    Returns:
+        bool: True if the OpenPipe SDK is available
+    """
+    return _load_sdk()[1]
 
 
 class RateLimiter:
@@ -49,8 +92,17 @@ class RateLimiter:
         self.requests = deque()
         self.lock = threading.Lock()
     
-    def wait_if_needed(self):
-        """Wait if rate limit would be exceeded."""
+    def wait_if_needed(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Wait if rate limit would be exceeded.
+        
+        Args:
+            max_wait: Longest acceptable wait in seconds; None waits as long as needed
+            
+        Returns:
+            bool: True if the request may proceed, False if it would have had
+                to wait longer than max_wait (nothing is recorded then)
+        """
         with self.lock:
             now = datetime.now()
             
@@ -64,6 +116,11 @@ class RateLimiter:
                 oldest_request = self.requests[0]
                 wait_time = self.time_window - (now - oldest_request).total_seconds()
                 
+                if max_wait is not None and wait_time > max_wait:
+                    logger.info(f"Rate limit wait of {wait_time:.2f}s exceeds the remaining "
+                                f"{max_wait:.2f}s budget, not waiting")
+                    return False
+                
                 if wait_time > 0:
                     logger.info(f"Rate limit reached, waiting {wait_time:.2f} seconds")
                     time.sleep(wait_time)
@@ -73,14 +130,214 @@ class RateLimiter:
             
             # Record this request
             self.requests.append(now)
+            return True
+    
+    def record_usage(self, tokens_used: int) -> None:
+        """
+        Record a request's token usage; tokens are not limited per process.
+        
+        Args:
+            tokens_used: Tokens the request used
+        """
+    
+    def close(self) -> None:
+        """Release resources; requests are tracked in memory, so there are none."""
+
+
+def create_rate_limiter(config: Dict[str, Any], mongo_uri: Optional[str] = None):
+    """
+    Create the rate limiter selected by AI_RATE_LIMIT_BACKEND.
+    
+    The 'local' backend limits requests per process; the 'mongo' backend keeps
+    request and token buckets in MongoDB, shared by every process using the
+    same AI_RATE_LIMIT_NAME.
+    
+    Args:
+        config: Configuration
+        mongo_uri: MongoDB connection URI of the 'mongo' backend (defaults to config)
+        
+    Returns:
+        RateLimiter or SharedRateLimiter: Rate limiter
+    """
+    backend = config.get('AI_RATE_LIMIT_BACKEND', 'local')
+    requests_per_minute = config.get('AI_RATE_LIMIT_RPM', 60)
+    
+    if backend == 'local':
+        return RateLimiter(max_requests=requests_per_minute, time_window=60)
+    if backend != 'mongo':
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    
+    from ai_classification.mongo_clients import mongo_client_options
+    from ai_classification.shared_rate_limiter import MongoTokenBucketStore, SharedRateLimiter
+    
+    store = MongoTokenBucketStore(
+        mongo_uri or config.get('MONGODB_URI', 'mongodb://localhost:27017/'),
+        client_options=mongo_client_options(config)
+    )
+    return SharedRateLimiter(
+        store,
+        name=config.get('AI_RATE_LIMIT_NAME', 'openpipe'),
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=config.get('AI_RATE_LIMIT_TPM', 0),
+        # Prompt and completion at most; corrected by the actual usage
+        tokens_per_request=config.get('AI_PROMPT_TOKEN_BUDGET', 3000) + config.get('AI_MAX_TOKENS', 2000)
+    )
+
+
+class CircuitOpenError(Exception):
+    """Raised when requests are refused because the circuit breaker is open."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a classification cannot finish within its deadline."""
+
+
+class InvalidResponseError(ValueError):
+    """Raised when the AI service's response cannot be parsed."""
+
+
+class ClassificationFailedError(ValueError):
+    """Raised when a classification request fails after all retries.
+    
+    Attributes:
+        attempts: Number of attempts made
+        cacheable: Whether the failure is likely to repeat for the same request
+            (e.g. unparseable responses or rejected content), as opposed to a
+            transient service problem
+    """
+    
+    def __init__(self, message: str, attempts: int, cacheable: bool):
+        super().__init__(message)
+        self.attempts = attempts
+        self.cacheable = cacheable
+
+
+# Error types that will repeat for the same request; any other failure (an
+# outage, a bad API key or model name, an unknown error) is not cached
+DETERMINISTIC_ERROR_NAMES = ('InvalidResponseError', 'BadRequestError', 'ContentFilterFinishReasonError')
+
+
+class CircuitBreaker:
+    """Circuit breaker that stops requests to a failing service.
+    
+    Opens after a number of consecutive failures and refuses requests until
+    the reset timeout has passed, then lets a single probe request through
+    (half-open). A successful probe closes the circuit; a failed one opens
+    it again. A probe that has not reported back within the reset timeout is
+    presumed lost and another one is let through.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        """
+        Initialize circuit breaker.
+        
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.times_opened = 0
+        self.rejected_requests = 0
+        self.lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be made now.
+        
+        Returns:
+            bool: True if the request may proceed
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            
+            now = time.time()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                # Let one probe through; everyone else keeps failing fast
+                self.state = self.HALF_OPEN
+                self.probe_started_at = now
+                logger.info("Circuit breaker half-open, probing AI service")
+                return True
+            
+            if self.state == self.HALF_OPEN and now - self.probe_started_at >= self.reset_timeout:
+                self.probe_started_at = now
+                logger.warning("Circuit breaker probe did not report back, probing AI service again")
+                return True
+            
+            self.rejected_requests += 1
+            return False
+    
+    def release_probe(self):
+        """Record a request that ended without reaching the service.
+        
+        If it was the half-open probe, the next request probes instead.
+        """
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.probe_started_at = 0.0
+    
+    def record_success(self):
+        """Record a successful request, closing the circuit."""
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info("AI service recovered, circuit breaker closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+    
+    def record_failure(self):
+        """Record a failed request, opening the circuit if needed."""
+        with self.lock:
+            self.consecutive_failures += 1
+            
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.times_opened += 1
+                logger.warning(f"Circuit breaker opened after {self.consecutive_failures} consecutive "
+                               f"failures, failing fast for {self.reset_timeout}s")
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently being refused."""
+        return self.state == self.OPEN
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker statistics.
+        
+        Returns:
+            Dict[str, Any]: Circuit breaker state and counters
+        """
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+            'rejected_requests': self.rejected_requests
+        }
 
 
 class OpenPipeClient:
     """Client for interacting with OpenPipe AI API."""
     
-    def __init__(self):
-        """Initialize the OpenPipe AI client with configuration."""
-        if not OPENPIPE_AVAILABLE:
+    def __init__(self, mongo_uri: Optional[str] = None):
+        """
+        Initialize the OpenPipe AI client with configuration.
+        
+        Args:
+            mongo_uri: MongoDB connection URI of a shared rate limiter (defaults to config)
+        """
+        OpenAI, openpipe = _load_sdk()
+        if OpenAI is None:
             raise ImportError("OpenPipe or OpenAI module is required but not available. Install with 'pip install openpipe openai'")
             
         config = get_config()
@@ -95,7 +352,13 @@ class OpenPipeClient:
         self.max_retries = config['AI_MAX_RETRIES']
         
         # Rate limiting (60 requests per minute by default)
-        self.rate_limiter = RateLimiter(max_requests=60, time_window=60)
+        self.rate_limiter = create_rate_limiter(config, mongo_uri)
+        
+        # Fail fast while the AI service is down
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=config.get('AI_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=config.get('AI_CIRCUIT_RESET_TIMEOUT', 60)
+        )
         
         # Request statistics
         self.total_requests = 0
@@ -103,7 +366,7 @@ class OpenPipeClient:
         self.total_cost = 0.0  # Placeholder for cost tracking
         
         # Initialize client with OpenPipe configuration
-        if OPENPIPE_AVAILABLE:
+        if openpipe:
             # Use OpenPipe SDK
             self.client = OpenAI(
                 api_key=self.api_key,
@@ -137,23 +400,39 @@ class OpenPipeClient:
             'total_requests': self.total_requests,
             'total_tokens': self.total_tokens,
             'total_cost': self.total_cost,
-            'model': self.model
+            'model': self.model,
+            'circuit_breaker': self.circuit_breaker.get_stats()
         }
     
-    def get_classification(self, system_prompt: str, user_prompt: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    def close(self) -> None:
+        """Release the rate limiter's connection, if it has one."""
+        self.rate_limiter.close()
+    
+    def get_classification(self, system_prompt: str, user_prompt: str,
+                           deadline: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Get therapeutic classification from OpenPipe AI.
         
+        With a deadline, request timeouts, backoff sleeps and rate limit waits
+        are clipped to the time remaining, and no attempt is started once the
+        deadline has passed.
+        
         Args:
             system_prompt: System prompt for the AI
             user_prompt: User prompt containing drug information
+            deadline: Time (as returned by time.time()) by which to give up
             
         Returns:
             Tuple[Dict[str, Any], Dict[str, Any]]: Classification result and metadata
             
         Raises:
-            ValueError: If the API request fails after retries
+            ClassificationFailedError: If the API request fails after retries
+            CircuitOpenError: If the AI service is failing and requests are refused
+            DeadlineExceededError: If the deadline passes before a response is received
         """
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError("AI service unavailable, circuit breaker is open")
+        
         metadata = {
             'model': self.model,
             'tokens_used': 0,
@@ -165,89 +444,205 @@ class OpenPipeClient:
         start_time = time.time()
         last_error = None
         
-        # Implement retry logic with exponential backoff
-        for attempt in range(1, self.max_retries + 1):
-            metadata['attempts'] = attempt
-            
-            try:
-                # Apply rate limiting
-                rate_limit_start = time.time()
-                self.rate_limiter.wait_if_needed()
-                rate_limit_time = time.time() - rate_limit_start
-                
-                if rate_limit_time > 0.1:  # Log if we waited more than 100ms
-                    metadata['rate_limited'] = True
-                    logger.debug(f"Rate limited for {rate_limit_time:.2f}s")
-                
-                logger.info(f"Sending classification request to OpenPipe AI (attempt {attempt}/{self.max_retries})")
-                
-                # Make API request
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    response_format={"type": "json_object"}
-                )
+        # Set once an attempt's outcome is recorded on the circuit breaker
+        outcome_recorded = False
+        
+        # Set while the rate limiter holds an attempt's estimated tokens
+        usage_pending = False
+        
+        try:
+            # Implement retry logic with exponential backoff
+            for attempt in range(1, self.max_retries + 1):
+                remaining = self._remaining(deadline)
+                if remaining is not None and remaining <= 0:
+                    break
                 
-                # Extract response content
-                content = response.choices[0].message.content
+                metadata['attempts'] = attempt
                 
-                # Parse JSON response
                 try:
-                    classification = json.loads(content)
+                    # Apply rate limiting
+                    rate_limit_start = time.time()
+                    if not self.rate_limiter.wait_if_needed(max_wait=remaining):
+                        last_error = DeadlineExceededError("Rate limit wait exceeds the remaining deadline")
+                        break
+                    usage_pending = True
+                    rate_limit_time = time.time() - rate_limit_start
                     
-                    # Update metadata
-                    tokens_used = getattr(response.usage, 'total_tokens', 0) if response.usage else 0
-                    metadata['tokens_used'] = tokens_used
-                    metadata['processing_time'] = time.time() - start_time
+                    if rate_limit_time > 0.1:  # Log if we waited more than 100ms
+                        metadata['rate_limited'] = True
+                        logger.debug(f"Rate limited for {rate_limit_time:.2f}s")
                     
-                    # Update client statistics
-                    self.total_requests += 1
-                    self.total_tokens += tokens_used
+                    logger.info(f"Sending classification request to OpenPipe AI (attempt {attempt}/{self.max_retries})")
                     
-                    logger.info(f"Classification successful in {metadata['processing_time']:.2f}s "
-                                f"using {tokens_used} tokens")
+                    # Make API request, clipping its timeout to the deadline
+                    request_options = {}
+                    remaining = self._remaining(deadline)
+                    if remaining is not None:
+                        if remaining <= 0:
+                            last_error = DeadlineExceededError("Deadline passed while rate limited")
+                            break
+                        request_options['timeout'] = min(self.timeout, remaining)
                     
-                    return classification, metadata
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature,
+                        response_format={"type": "json_object"},
+                        **request_options
+                    )
                     
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse AI response as JSON: {e}")
-                    logger.debug(f"Raw response content: {content[:500]}...")
-                    last_error = ValueError(f"Invalid JSON response: {e}")
+                    # Correct the rate limiter's estimate, even if the response is unusable
+                    tokens_used = getattr(response.usage, 'total_tokens', 0) if response.usage else 0
+                    self.rate_limiter.record_usage(tokens_used)
+                    usage_pending = False
                     
-            except Exception as e:
-                # Handle both OpenPipe and OpenAI API errors
-                error_type = str(type(e).__name__)
-                if any(error_name in error_type for error_name in ['APIError', 'RateLimitError', 'APIConnectionError', 'Timeout']):
-                    logger.warning(f"API error (attempt {attempt}/{self.max_retries}): {e}")
-                    last_error = e
+                    # Extract response content
+                    choice = response.choices[0]
+                    content = choice.message.content
                     
-                    # Special handling for rate limit errors
-                    if 'RateLimitError' in error_type:
-                        metadata['rate_limited'] = True
-                        # Wait longer for rate limit errors
-                        backoff_time = min(60, 2 ** attempt)  # Cap at 60 seconds
-                        logger.info(f"Rate limited, waiting {backoff_time} seconds...")
-                        time.sleep(backoff_time)
-                        continue
-                else:
-                    logger.error(f"Unexpected error in OpenPipe AI request: {e}")
-                    last_error = e
-            
-            # Exponential backoff before retry (except for rate limit errors handled above)
-            if attempt < self.max_retries and not ('RateLimitError' in str(type(last_error))):
-                backoff_time = min(30, 2 ** (attempt - 1))  # 1, 2, 4, 8, 16, 30, 30...
-                logger.info(f"Retrying in {backoff_time} seconds...")
-                time.sleep(backoff_time)
-        
-        # All retries failed
-        metadata['processing_time'] = time.time() - start_time
-        self.total_requests += 1  # Count failed requests too
-        
-        logger.error(f"Classification failed after {self.max_retries} attempts in {metadata['processing_time']:.2f}s")
-        
-        raise ValueError(f"Failed to get classification after {self.max_retries} attempts: {last_error}")
\ No newline at end of file
+                    if content is None or getattr(choice, 'finish_reason', None) == 'content_filter':
+                        # The service answered and will refuse the same request again
+                        self.circuit_breaker.record_success()
+                        outcome_recorded = True
+                        logger.error(f"AI response blocked (finish reason {getattr(choice, 'finish_reason', None)!r})")
+                        last_error = InvalidResponseError("Response blocked by the content filter")
+                        break
+                    
+                    # Parse JSON response
+                    try:
+                        classification = json.loads(content)
+                        
+                        # Update metadata
+                        metadata['tokens_used'] = tokens_used
+                        metadata['processing_time'] = time.time() - start_time
+                        
+                        # Update client statistics
+                        self.total_requests += 1
+                        self.total_tokens += tokens_used
+                        self.circuit_breaker.record_success()
+                        outcome_recorded = True
+                        
+                        logger.info(f"Classification successful in {metadata['processing_time']:.2f}s "
+                                    f"using {tokens_used} tokens")
+                        
+                        return classification, metadata
+                        
+                    except json.JSONDecodeError as e:
+                        # The service answered, so this does not count against the circuit
+                        self.circuit_breaker.record_success()
+                        outcome_recorded = True
+                        logger.error(f"Failed to parse AI response as JSON: {e}")
+                        logger.debug(f"Raw response content: {content[:500]}...")
+                        last_error = InvalidResponseError(f"Invalid JSON response: {e}")
+                        
+                except Exception as e:
+                    # No usage is reported for a failed call; refund the estimate
+                    if usage_pending:
+                        self.rate_limiter.record_usage(0)
+                        usage_pending = False
+                    
+                    # Handle both OpenPipe and OpenAI API errors
+                    error_type = str(type(e).__name__)
+                    if any(error_name in error_type for error_name in DETERMINISTIC_ERROR_NAMES):
+                        # The request itself was rejected (e.g. over the context
+                        # limit); it fails the same way on retry and says nothing
+                        # about the service's health
+                        logger.error(f"AI request rejected: {e}")
+                        last_error = e
+                        self.circuit_breaker.record_success()
+                        outcome_recorded = True
+                        break
+                    if any(error_name in error_type for error_name in ['APIError', 'RateLimitError', 'APIConnectionError', 'Timeout']):
+                        logger.warning(f"API error (attempt {attempt}/{self.max_retries}): {e}")
+                        last_error = e
+                        
+                        # Special handling for rate limit errors
+                        if 'RateLimitError' in error_type:
+                            metadata['rate_limited'] = True
+                            # The service is up, just busy
+                            self.circuit_breaker.record_success()
+                            outcome_recorded = True
+                            # Wait longer for rate limit errors
+                            backoff_time = self._clip_to_deadline(min(60, 2 ** attempt), deadline)  # Cap at 60 seconds
+                            logger.info(f"Rate limited, waiting {backoff_time} seconds...")
+                            time.sleep(backoff_time)
+                            continue
+                    else:
+                        logger.error(f"Unexpected error in OpenPipe AI request: {e}")
+                        last_error = e
+                    
+                    # Stop retrying once the service is considered down
+                    self.circuit_breaker.record_failure()
+                    outcome_recorded = True
+                    if self.circuit_breaker.is_open:
+                        break
+                
+                # Exponential backoff before retry (except for rate limit errors handled above)
+                if attempt < self.max_retries and not ('RateLimitError' in str(type(last_error))):
+                    backoff_time = self._clip_to_deadline(min(30, 2 ** (attempt - 1)), deadline)  # 1, 2, 4, 8, 16, 30, 30...
+                    logger.info(f"Retrying in {backoff_time} seconds...")
+                    time.sleep(backoff_time)
+            
+            # All retries failed
+            metadata['processing_time'] = time.time() - start_time
+            self.total_requests += 1  # Count failed requests too
+            
+            if self.circuit_breaker.is_open:
+                logger.error(f"Classification failed after {metadata['attempts']} attempts; circuit breaker is open")
+                raise CircuitOpenError(f"AI service unavailable after {metadata['attempts']} attempts: {last_error}")
+            
+            if deadline is not None and (isinstance(last_error, DeadlineExceededError) or time.time() >= deadline):
+                logger.error(f"Classification deadline exceeded after {metadata['attempts']} attempts "
+                             f"in {metadata['processing_time']:.2f}s")
+                raise DeadlineExceededError(f"Classification deadline exceeded after {metadata['attempts']} "
+                                            f"attempts: {last_error}")
+            
+            logger.error(f"Classification failed after {metadata['attempts']} attempts in {metadata['processing_time']:.2f}s")
+            
+            error_type = type(last_error).__name__
+            raise ClassificationFailedError(
+                f"Failed to get classification after {metadata['attempts']} attempts: {last_error}",
+                attempts=metadata['attempts'],
+                cacheable=any(error_name in error_type for error_name in DETERMINISTIC_ERROR_NAMES)
+            )
+        finally:
+            # Every exit must report back, or a half-open probe would hold
+            # the circuit half-open
+            if not outcome_recorded:
+                self.circuit_breaker.release_probe()
+            # An attempt abandoned after the rate limit wait never used its tokens
+            if usage_pending:
+                self.rate_limiter.record_usage(0)
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """
+        Get the time left before a deadline.
+        
+        Args:
+            deadline: Time (as returned by time.time()) or None
+            
+        Returns:
+            Optional[float]: Seconds remaining (may be negative), or None without a deadline
+        """
+        return None if deadline is None else deadline - time.time()
+    
+    def _clip_to_deadline(self, seconds: float, deadline: Optional[float]) -> float:
+        """
+        Clip a sleep to the time left before a deadline.
+        
+        Args:
+            seconds: Desired sleep in seconds
+            deadline: Time (as returned by time.time()) or None
+            
+        Returns:
+            float: Sleep in seconds
+        """
+        remaining = self._remaining(deadline)
+        if remaining is None:
+            return seconds
+        return max(0.0, min(seconds, remaining))
@@ -5,14 +5,115 @@ This module handles loading system prompts and building user prompts
 for AI classification requests.
 """
 
+import hashlib
+import html
 import os
-from typing import Dict, Any, Optional
+import re
+from typing import Dict, Any, Optional, List
 
 from ai_classification.config import get_config
 from ai_classification.logging_config import setup_logging
+from ai_classification.section_compressor import SectionCompressor, COMPRESSIBLE_SECTION_FIELDS, split_sentences
+from ai_classification.token_counter import TokenCounter
 
 logger = setup_logging(__name__)
 
+# Label sections used for classification in priority order, with the relative
+# share of the token budget each receives when the label does not fit
+LABEL_SECTIONS = [
+    ('Indications and Usage', 'indicationsAndUsage', 4),
+    ('Mechanism of Action', 'mechanismOfAction', 4),
+    ('Clinical Pharmacology', 'clinicalPharmacology', 2),
+    ('Description', 'description', 2),
+    ('Dosage and Administration', 'dosageAndAdministration', 1),
+    ('Warnings and Precautions', 'warningsAndPrecautions', 1),
+    ('Adverse Reactions', 'adverseReactions', 1)
+]
+
+TRUNCATION_MARKER = "... [content truncated]"
+
+# Relative corpus paths are resolved from the project root, not the working directory
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# HTML tokenizer: script/style blocks and comments are dropped whole, other
+# tags are matched by name whatever their attributes
+_HTML_TOKEN_PATTERN = re.compile(
+    r'<(?:script|style)\b.*?</(?:script|style)\s*>'
+    r'|<!--.*?-->'
+    r'|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>'
+    r'|<[!?][^>]*>',
+    re.IGNORECASE | re.DOTALL
+)
+_EXCESS_NEWLINES_PATTERN = re.compile(r'\n{3,}')
+
+# Markdown emitted for opening and closing HTML tags; other tags are removed
+_TAG_TEXT = {
+    ('', 'h1'): '\n\n# ',
+    ('', 'h2'): '\n\n## ',
+    ('', 'h3'): '\n\n### ',
+    ('', 'h4'): '\n\n#### ',
+    ('', 'h5'): '\n\n##### ',
+    ('', 'h6'): '\n\n###### ',
+    ('', 'li'): '- ',
+    ('', 'br'): '\n',
+    ('', 'strong'): '**',
+    ('', 'b'): '**',
+    ('', 'em'): '*',
+    ('', 'i'): '*',
+    ('', 'table'): '\n',
+    ('', 'tr'): '|',
+    ('', 'td'): ' ',
+    ('', 'th'): ' ',
+    ('/', 'h1'): '\n\n',
+    ('/', 'h2'): '\n\n',
+    ('/', 'h3'): '\n\n',
+    ('/', 'h4'): '\n\n',
+    ('/', 'h5'): '\n\n',
+    ('/', 'h6'): '\n\n',
+    ('/', 'p'): '\n\n',
+    ('/', 'ul'): '\n',
+    ('/', 'ol'): '\n',
+    ('/', 'dl'): '\n',
+    ('/', 'li'): '\n',
+    ('/', 'dt'): '\n',
+    ('/', 'dd'): '\n',
+    ('/', 'strong'): '**',
+    ('/', 'b'): '**',
+    ('/', 'em'): '*',
+    ('/', 'i'): '*',
+    ('/', 'div'): '\n',
+    ('/', 'section'): '\n',
+    ('/', 'caption'): '\n',
+    ('/', 'td'): ' |',
+    ('/', 'th'): ' |',
+    ('/', 'tr'): '\n',
+    ('/', 'table'): '\n',
+}
+
+# Labels repeat the same few tag strings thousands of times
+_TAG_TEXT_CACHE_SIZE = 4096
+
+
+class _TagTextCache(dict):
+    """Markdown text per distinct tag string, computed on first use."""
+    
+    def __missing__(self, tag: str) -> str:
+        match = _HTML_TOKEN_PATTERN.fullmatch(tag)
+        tag_name = match.group(2) if match else None
+        text = '' if tag_name is None else _TAG_TEXT.get((match.group(1), tag_name.lower()), '')
+        
+        if len(self) < _TAG_TEXT_CACHE_SIZE:
+            self[tag] = text
+        return text
+
+
+_tag_text_cache = _TagTextCache()
+
+
+def _replace_tag(match: re.Match) -> str:
+    """Replacement callback for _HTML_TOKEN_PATTERN."""
+    return _tag_text_cache[match.group()]
+
 
 class PromptManager:
     """Manager for AI classification prompts."""
@@ -22,6 +123,20 @@ class PromptManager:
         config = get_config()
         self.system_prompt_path = config['SYSTEM_PROMPT_PATH']
         self.system_prompt = None
+        self.system_prompt_digest = None
+        
+        # Token budget for label content
+        self.token_budget = config['AI_PROMPT_TOKEN_BUDGET']
+        self.token_counter = TokenCounter(config['AI_MODEL'])
+        self._truncation_marker_tokens = self.token_counter.count(TRUNCATION_MARKER)
+        
+        # Extractive compression of low-signal sections
+        self.compressed_section_tokens = config['AI_COMPRESSED_SECTION_TOKENS']
+        self.compressor = None
+        if config['ENABLE_PROMPT_COMPRESSION']:
+            self.compressor = SectionCompressor.from_corpus_file(
+                os.path.join(_PROJECT_ROOT, config['AI_COMPRESSION_CORPUS_PATH']), self._clean_html
+            )
         
         # Load system prompt
         self._load_system_prompt()
@@ -37,6 +152,8 @@ class PromptManager:
             with open(self.system_prompt_path, 'r', encoding='utf-8') as f:
                 self.system_prompt = f.read()
             
+            self.system_prompt_digest = hashlib.sha256(self.system_prompt.encode('utf-8')).hexdigest()
+            
             logger.info(f"Loaded system prompt from {self.system_prompt_path}")
             
         except FileNotFoundError:
@@ -75,7 +192,6 @@ class PromptManager:
         # Extract drug information
         drug_name = drug_data.get('drugName', 'Unknown')
         generic_name = drug_data.get('label', {}).get('genericName', 'Unknown')
-        set_id = drug_data.get('setId', 'Unknown')
         
         # Extract label content
         label_content = self.extract_label_content(drug_data)
@@ -86,7 +202,6 @@ class PromptManager:
 
 **Drug Name:** {drug_name}
 **Generic Name:** {generic_name}
-**Set ID:** {set_id}
 
 **Label Content:**
 {label_content}
@@ -98,7 +213,7 @@ Please analyze this drug information and provide the therapeutic classification
     
     def extract_label_content(self, drug_data: Dict[str, Any]) -> str:
         """
-        Extract relevant content from drug label.
+        Extract relevant content from drug label within the token budget.
         
         Args:
             drug_data: Drug data dictionary
@@ -109,35 +224,162 @@ Please analyze this drug information and provide the therapeutic classification
         # Extract label sections
         label = drug_data.get('label', {})
         
-        # Priority sections for classification
-        sections = {
-            'Indications and Usage': label.get('indicationsAndUsage', ''),
-            'Mechanism of Action': label.get('mechanismOfAction', ''),
-            'Clinical Pharmacology': label.get('clinicalPharmacology', ''),
-            'Description': label.get('description', ''),
-            'Dosage and Administration': label.get('dosageAndAdministration', ''),
-            'Warnings and Precautions': label.get('warningsAndPrecautions', ''),
-            'Adverse Reactions': label.get('adverseReactions', '')
-        }
+        # Clean non-empty sections and measure them, including their heading
+        # and the blank line that separates them from the next section
+        sections = []
+        included_sentences = set()
+        for section_name, field_name, weight in LABEL_SECTIONS:
+            section_content = label.get(field_name, '')
+            if not section_content:
+                continue
+            
+            # Clean up HTML tags for better processing
+            cleaned_content = self._clean_html(section_content)
+            if not cleaned_content:
+                continue
+            
+            # Keep only the most class-relevant sentences of long, low-signal
+            # sections, skipping any already quoted by an earlier section
+            if field_name in COMPRESSIBLE_SECTION_FIELDS:
+                cleaned_content = self._compress_section(cleaned_content, included_sentences)
+                if not cleaned_content:
+                    continue
+            elif self.compressor is not None:
+                included_sentences.update(split_sentences(cleaned_content))
+            
+            heading = f"### {section_name}\n"
+            overhead = self.token_counter.count(heading) + 1
+            sections.append({
+                'heading': heading,
+                'content': cleaned_content,
+                'tokens': self.token_counter.count(cleaned_content),
+                'overhead': overhead,
+                'weight': weight
+            })
+        
+        # Headings are always kept; the rest of the budget goes to content
+        content_budget = self.token_budget - sum(section['overhead'] for section in sections)
+        allocations = self._allocate_token_budget(
+            [section['tokens'] for section in sections],
+            [section['weight'] for section in sections],
+            content_budget
+        )
         
         # Build content string
         content = []
-        for section_name, section_content in sections.items():
-            if section_content:
-                # Clean up HTML tags for better processing
-                cleaned_content = self._clean_html(section_content)
-                
-                # Truncate long sections
-                if len(cleaned_content) > 2000:
-                    cleaned_content = cleaned_content[:2000] + "... [content truncated]"
-                
-                content.append(f"### {section_name}\n{cleaned_content}")
+        for section, allocation in zip(sections, allocations):
+            section_content = section['content']
+            
+            # Truncate sections that exceed their share of the budget
+            if section['tokens'] > allocation:
+                body_tokens = allocation - self._truncation_marker_tokens
+                if body_tokens <= 0:
+                    continue
+                section_content, _ = self.token_counter.truncate(section_content, body_tokens)
+                section_content += TRUNCATION_MARKER
+            
+            content.append(f"{section['heading']}{section_content}")
         
         return "\n\n".join(content)
     
+    def _compress_section(self, content: str, exclude: set) -> str:
+        """
+        Compress a section to its most relevant sentences if it is long.
+        
+        Args:
+            content: Cleaned section content
+            exclude: Sentences already included in the prompt
+            
+        Returns:
+            str: Compressed content, the original if compression is off or the
+                section is short, or the truncated new sentences if no sentence
+                qualifies (empty if there are none)
+        """
+        if self.compressor is None:
+            return content
+        
+        if self.token_counter.count(content) <= self.compressed_section_tokens:
+            return content
+        
+        compressed = self.compressor.compress(
+            content, self.compressed_section_tokens, self.token_counter.count, exclude
+        )
+        if compressed:
+            return compressed
+        
+        # Nothing relevant to keep; stay within the section's budget anyway,
+        # without repeating sentences already in the prompt or in the section
+        content = ' '.join(dict.fromkeys(
+            sentence for sentence in split_sentences(content) if sentence not in exclude
+        ))
+        if not content:
+            return ''
+        
+        truncated, _ = self.token_counter.truncate(
+            content, max(0, self.compressed_section_tokens - self._truncation_marker_tokens)
+        )
+        return truncated + TRUNCATION_MARKER
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens a text will use in a prompt.
+        
+        Args:
+            text: Text to count
+            
+        Returns:
+            int: Number of tokens
+        """
+        return self.token_counter.count(text)
+    
+    def _allocate_token_budget(self, section_tokens: List[int], weights: List[int], 
+                               budget: int) -> List[int]:
+        """
+        Split a token budget across sections by priority weight.
+        
+        Sections smaller than their weighted share keep their full size and
+        the unused remainder is redistributed among the sections still
+        competing for budget, until every remaining section is capped.
+        
+        Args:
+            section_tokens: Token count of each section
+            weights: Priority weight of each section
+            budget: Total tokens available
+            
+        Returns:
+            List[int]: Tokens allocated to each section
+        """
+        allocations = [0] * len(section_tokens)
+        pending = [i for i, tokens in enumerate(section_tokens) if tokens > 0]
+        remaining = max(0, budget)
+        
+        while pending and remaining > 0:
+            total_weight = sum(weights[i] for i in pending)
+            shares = {i: remaining * weights[i] // total_weight for i in pending}
+            
+            fitting = [i for i in pending if section_tokens[i] <= shares[i]]
+            if not fitting:
+                # Every remaining section is capped; rounding leftovers go to
+                # the highest-priority section
+                for i in pending:
+                    allocations[i] = shares[i]
+                allocations[pending[0]] += remaining - sum(shares.values())
+                break
+            
+            for i in fitting:
+                allocations[i] = section_tokens[i]
+                remaining -= section_tokens[i]
+                pending.remove(i)
+        
+        return allocations
+    
     def _clean_html(self, html_content: str) -> str:
         """
-        Clean HTML content for better processing.
+        Convert HTML content to markdown-style text in a single pass.
+        
+        Tags are matched with one precompiled pattern regardless of their
+        attributes and replaced by their markdown equivalent; entities are
+        decoded afterwards so that escaped angle brackets stay text.
         
         Args:
             html_content: HTML content
@@ -145,48 +387,13 @@ Please analyze this drug information and provide the therapeutic classification
         Returns:
             str: Cleaned content
         """
-        # Simple HTML cleaning - replace common tags with markdown
-        # For a production system, consider using a proper HTML parser
-        replacements = [
-            ('<h1>', '# '),
-            ('</h1>', '\n\n'),
-            ('<h2>', '## '),
-            ('</h2>', '\n\n'),
-            ('<h3>', '### '),
-            ('</h3>', '\n\n'),
-            ('<p>', ''),
-            ('</p>', '\n\n'),
-            ('<ul>', ''),
-            ('</ul>', '\n'),
-            ('<ol>', ''),
-            ('</ol>', '\n'),
-            ('<li>', '- '),
-            ('</li>', '\n'),
-            ('<br>', '\n'),
-            ('<br/>', '\n'),
-            ('<strong>', '**'),
-            ('</strong>', '**'),
-            ('<b>', '**'),
-            ('</b>', '**'),
-            ('<em>', '*'),
-            ('</em>', '*'),
-            ('<i>', '*'),
-            ('</i>', '*'),
-            ('<div>', ''),
-            ('</div>', '\n'),
-            ('<span>', ''),
-            ('</span>', '')
-        ]
-        
-        result = html_content
-        for old, new in replacements:
-            result = result.replace(old, new)
-        
-        # Remove any remaining HTML tags
-        import re
-        result = re.sub(r'<[^>]*>', '', result)
+        result = _HTML_TOKEN_PATTERN.sub(_replace_tag, html_content)
+        
+        if '&' in result:
+            result = html.unescape(result)
         
         # Fix multiple newlines
-        result = re.sub(r'\n{3,}', '\n\n', result)
+        if '\n\n\n' in result:
+            result = _EXCESS_NEWLINES_PATTERN.sub('\n\n', result)
         
-        return result.strip()
\ No newline at end of file
+        return result.strip()
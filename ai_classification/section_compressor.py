@@ -0,0 +1,243 @@
+"""
+Extractive compression of drug label sections.
+
+This module shortens long, low-signal label sections (adverse reactions,
+clinical pharmacology, ...) before prompting by keeping only the sentences
+that carry the most classification-relevant terms. Term weights are learned
+offline from the local label corpus: terms that are frequent in the
+Indications, Mechanism of Action and Description sections relative to the
+rest of the label score highest.
+"""
+
+import json
+import re
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set
+
+from ai_classification.logging_config import setup_logging
+
+logger = setup_logging(__name__)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Sections whose vocabulary describes what a drug is and what it treats
+KEY_SECTION_FIELDS = ('indicationsAndUsage', 'mechanismOfAction', 'description')
+
+# Sections that are compressed before prompting
+COMPRESSIBLE_SECTION_FIELDS = (
+    'clinicalPharmacology',
+    'dosageAndAdministration',
+    'warningsAndPrecautions',
+    'adverseReactions',
+)
+
+_TERM_PATTERN = re.compile(r"[a-z][a-z\-]{2,}")
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?%?")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\[])|\n+")
+
+# Smoothing for the key-section log-odds of each term
+_SMOOTHING = 0.5
+
+# Corpora already analysed in this process, keyed by path
+_weights_cache: Dict[str, Dict[str, float]] = {}
+
+
+class SectionCompressor:
+    """Sentence-ranking compressor for drug label sections."""
+
+    def __init__(self, term_weights: Dict[str, float]):
+        """
+        Initialize the compressor.
+
+        Args:
+            term_weights: Relevance weight per term
+        """
+        import numpy as np
+
+        self.vocabulary = {term: index for index, term in enumerate(term_weights)}
+        self.weights = np.fromiter(term_weights.values(), dtype=np.float64, count=len(term_weights))
+
+    @classmethod
+    def from_corpus_file(cls, corpus_path: str, clean_func: Callable[[str], str],
+                         max_documents: int = 1000) -> Optional['SectionCompressor']:
+        """
+        Build a compressor from a JSON file of drug labels.
+
+        Args:
+            corpus_path: Path to a JSON list of drug documents
+            clean_func: Function converting section HTML to text
+            max_documents: Maximum number of documents to analyse
+
+        Returns:
+            Optional[SectionCompressor]: Compressor, or None if the corpus is unusable
+        """
+        if corpus_path not in _weights_cache:
+            try:
+                with open(corpus_path, 'r', encoding='utf-8') as f:
+                    documents = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to load compression corpus {corpus_path}: {e}")
+                return None
+
+            if not isinstance(documents, list):
+                documents = [documents]
+
+            _weights_cache[corpus_path] = compute_term_weights(documents[:max_documents], clean_func)
+            logger.info(f"Computed {len(_weights_cache[corpus_path])} term weights from {corpus_path}")
+
+        term_weights = _weights_cache[corpus_path]
+        if not term_weights:
+            return None
+
+        return cls(term_weights)
+
+    def compress(self, text: str, max_tokens: int, count_tokens: Callable[[str], int],
+                 exclude: Optional[Set[str]] = None) -> str:
+        """
+        Keep the most relevant sentences of a text within a token limit.
+
+        Sentences are ranked by the summed weight of their distinct terms,
+        normalised by length and discounted by how much of the sentence is
+        numbers, then kept in their original order.
+
+        Args:
+            text: Section text
+            max_tokens: Maximum tokens to keep
+            count_tokens: Function counting the tokens of a text
+            exclude: Sentences already present elsewhere in the prompt
+
+        Returns:
+            str: Compressed text
+        """
+        import numpy as np
+
+        sentences = split_sentences(text)
+        if exclude:
+            sentences = [sentence for sentence in sentences if sentence not in exclude]
+        if not sentences:
+            return ''
+
+        scores = self.score_sentences(sentences)
+
+        selected = []
+        used = 0
+        for index in np.argsort(-scores, kind='stable'):
+            if scores[index] <= 0:
+                break
+            tokens = count_tokens(sentences[index]) + 1
+            if used + tokens > max_tokens:
+                continue
+            selected.append(index)
+            used += tokens
+
+        return ' '.join(sentences[index] for index in sorted(selected))
+
+    def score_sentences(self, sentences: List[str]) -> 'np.ndarray':
+        """
+        Score sentences by classification relevance.
+
+        Args:
+            sentences: Sentences to score
+
+        Returns:
+            np.ndarray: Score per sentence
+        """
+        import numpy as np
+
+        sentence_ids = []
+        term_ids = []
+        lengths = np.zeros(len(sentences), dtype=np.float64)
+        numbers = np.zeros(len(sentences), dtype=np.float64)
+
+        for sentence_id, sentence in enumerate(sentences):
+            terms = _TERM_PATTERN.findall(sentence.lower())
+            lengths[sentence_id] = len(terms)
+            numbers[sentence_id] = len(_NUMBER_PATTERN.findall(sentence))
+
+            known = {self.vocabulary[term] for term in terms if term in self.vocabulary}
+            sentence_ids.extend([sentence_id] * len(known))
+            term_ids.extend(known)
+
+        relevance = np.bincount(
+            np.asarray(sentence_ids, dtype=np.intp),
+            weights=self.weights[np.asarray(term_ids, dtype=np.intp)],
+            minlength=len(sentences)
+        )
+
+        numeric_share = numbers / np.maximum(lengths + numbers, 1.0)
+        return relevance / np.sqrt(np.maximum(lengths, 1.0)) * (1.0 - numeric_share)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences and list items.
+
+    Args:
+        text: Cleaned section text
+
+    Returns:
+        List[str]: Non-empty sentences
+    """
+    sentences = (sentence.strip() for sentence in _SENTENCE_PATTERN.split(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+def compute_term_weights(documents: Iterable[Dict[str, Any]],
+                         clean_func: Callable[[str], str]) -> Dict[str, float]:
+    """
+    Compute classification relevance weights for terms in a label corpus.
+
+    A term's weight is its smoothed log-odds of appearing in the key sections
+    rather than the other sections of a label, scaled by its inverse document
+    frequency so that boilerplate shared by every label counts for little.
+
+    Args:
+        documents: Drug documents with a 'label' dictionary
+        clean_func: Function converting section HTML to text
+
+    Returns:
+        Dict[str, float]: Positive weight per relevant term
+    """
+    import numpy as np
+
+    vocabulary: Dict[str, int] = {}
+    key_ids: List[int] = []
+    other_ids: List[int] = []
+    document_ids: List[int] = []
+    document_count = 0
+
+    for document in documents:
+        label = document.get('label', {}) if isinstance(document, dict) else {}
+        if not label:
+            continue
+
+        seen = set()
+        for field, value in label.items():
+            if not isinstance(value, str) or not value:
+                continue
+
+            target = key_ids if field in KEY_SECTION_FIELDS else other_ids
+            for term in _TERM_PATTERN.findall(clean_func(value).lower()):
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                target.append(term_id)
+                seen.add(term_id)
+
+        document_ids.extend(seen)
+        document_count += 1
+
+    if not vocabulary or not key_ids:
+        return {}
+
+    size = len(vocabulary)
+    key_counts = np.bincount(np.asarray(key_ids, dtype=np.intp), minlength=size).astype(np.float64)
+    other_counts = np.bincount(np.asarray(other_ids, dtype=np.intp), minlength=size).astype(np.float64)
+    document_frequency = np.bincount(np.asarray(document_ids, dtype=np.intp), minlength=size)
+
+    key_rate = (key_counts + _SMOOTHING) / (key_counts.sum() + _SMOOTHING * size)
+    other_rate = (other_counts + _SMOOTHING) / (other_counts.sum() + _SMOOTHING * size)
+    idf = np.log((1.0 + document_count) / (1.0 + document_frequency)) + 1.0
+
+    weights = np.maximum(np.log(key_rate / other_rate), 0.0) * idf
+
+    terms = list(vocabulary)
+    return {terms[i]: float(weights[i]) for i in np.flatnonzero(weights > 0)}
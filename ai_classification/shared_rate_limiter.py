@@ -0,0 +1,258 @@
+"""
+Rate limiting shared between processes.
+
+This module provides a token-bucket rate limiter whose buckets live in a shared
+store, so every seeder and worker process draws requests and tokens from the
+same per-minute budget. The MongoDB store refills and takes from a bucket in a
+single atomic update using the server's clock; the in-memory store gives the
+same behavior within one process, for tests and single-process runs.
+"""
+
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+from ai_classification.logging_config import setup_logging
+from ai_classification.mongo_clients import acquire_client, release_client
+
+logger = setup_logging(__name__)
+
+# Longest random delay added to a wait, so waiting processes do not retry in lockstep
+MAX_JITTER = 0.05
+
+
+class TokenBucketStore(ABC):
+    """Store of token buckets shared by rate limiters."""
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_rate: float, amount: float) -> float:
+        """
+        Refill a bucket for the time passed and take tokens from it if enough are left.
+
+        A bucket starts full. Nothing is taken when the bucket holds too few tokens.
+
+        Args:
+            key: Bucket name
+            capacity: Maximum tokens the bucket holds
+            refill_rate: Tokens added per second
+            amount: Tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until enough are available
+        """
+
+    @abstractmethod
+    def adjust(self, key: str, capacity: float, amount: float) -> None:
+        """
+        Return tokens to a bucket (or take more, if negative) without waiting.
+
+        Args:
+            key: Bucket name
+            capacity: Maximum tokens the bucket holds
+            amount: Tokens to add
+        """
+
+    def close(self) -> None:
+        """Release the store's resources."""
+
+
+class InMemoryTokenBucketStore(TokenBucketStore):
+    """Token buckets held in this process."""
+
+    def __init__(self):
+        """Initialize with no buckets."""
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_rate: float, amount: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            if tokens >= amount:
+                self._buckets[key] = (tokens - amount, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (amount - tokens) / refill_rate
+
+    def adjust(self, key: str, capacity: float, amount: float) -> None:
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + amount), updated_at)
+
+
+class MongoTokenBucketStore(TokenBucketStore):
+    """Token buckets stored as MongoDB documents, one per bucket."""
+
+    def __init__(self, mongo_uri: str, db_name: str = 'drug_facts', collection_name: str = 'ai_rate_limits',
+                 client_options: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the store.
+
+        Args:
+            mongo_uri: MongoDB connection URI
+            db_name: Database name
+            collection_name: Collection name
+            client_options: MongoClient keyword arguments
+        """
+        self.mongo_uri = mongo_uri
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.client_options = client_options or {}
+        self.client = None
+        self.collection = None
+        self._lock = threading.Lock()
+
+    def _get_collection(self):
+        """Get the MongoDB collection, initializing connection if needed."""
+        with self._lock:
+            if self.client is None:
+                self.client = acquire_client(self.mongo_uri, **self.client_options)
+                self.collection = self.client[self.db_name][self.collection_name]
+            return self.collection
+
+    def take(self, key: str, capacity: float, refill_rate: float, amount: float) -> float:
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        # Refill by the time since the last update, on the server's clock so
+        # hosts with skewed clocks agree, then take if enough tokens are left
+        elapsed = {'$divide': [{'$subtract': ['$$NOW', {'$ifNull': ['$updated_at', '$$NOW']}]}, 1000]}
+        pipeline = [
+            {'$set': {'refilled': {'$min': [capacity, {'$add': [
+                {'$ifNull': ['$tokens', capacity]}, {'$multiply': [{'$max': [0, elapsed]}, refill_rate]}
+            ]}]}}},
+            {'$set': {'granted': {'$gte': ['$refilled', amount]}}},
+            {'$set': {
+                'tokens': {'$cond': ['$granted', {'$subtract': ['$refilled', amount]}, '$refilled']},
+                'updated_at': '$$NOW'
+            }},
+            {'$unset': 'refilled'},
+        ]
+        try:
+            bucket = self._get_collection().find_one_and_update(
+                {'_id': key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another process created the bucket between our match and insert;
+            # it exists now, so the retry updates it
+            bucket = self._get_collection().find_one_and_update(
+                {'_id': key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        if bucket['granted']:
+            return 0.0
+        return (amount - bucket['tokens']) / refill_rate
+
+    def adjust(self, key: str, capacity: float, amount: float) -> None:
+        self._get_collection().update_one(
+            {'_id': key},
+            [{'$set': {'tokens': {'$min': [capacity, {'$add': ['$tokens', amount]}]}}}]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self.client:
+                release_client(self.client)
+                self.client = None
+                self.collection = None
+
+
+class SharedRateLimiter:
+    """Requests-per-minute and tokens-per-minute limits drawn from a shared store.
+
+    Each request takes one request token and, with a token limit, an estimate of
+    the tokens it will use; record_usage() corrects the estimate once the actual
+    usage is known.
+    """
+
+    def __init__(self, store: TokenBucketStore, name: str = 'openpipe', requests_per_minute: int = 60,
+                 tokens_per_minute: int = 0, tokens_per_request: int = 0):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            store: Bucket store shared by all limiters drawing from the budget
+            name: Budget name; limiters with the same name share buckets
+            requests_per_minute: Requests allowed per minute
+            tokens_per_minute: Tokens allowed per minute, 0 for no token limit
+            tokens_per_request: Tokens taken up front for each request
+        """
+        self.store = store
+        self.name = name
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = tokens_per_minute
+        # A request larger than the bucket could never be granted
+        self.tokens_per_request = min(tokens_per_request, tokens_per_minute)
+        self.waits = 0
+        self.store_errors = 0
+
+    def wait_if_needed(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Wait until the shared budget allows a request.
+
+        The limiter fails open: if the store cannot be reached, the request
+        proceeds and the service's own rate limit responses apply.
+
+        Args:
+            max_wait: Longest acceptable wait in seconds; None waits as long as needed
+
+        Returns:
+            bool: True if the request may proceed, False if it would have had
+                to wait longer than max_wait (nothing is taken then)
+        """
+        give_up_at = None if max_wait is None else time.time() + max_wait
+
+        if not self._take(f"{self.name}:requests", self.requests_per_minute, 1, give_up_at):
+            return False
+        if self.tokens_per_minute and self.tokens_per_request:
+            if not self._take(f"{self.name}:tokens", self.tokens_per_minute, self.tokens_per_request, give_up_at):
+                self._adjust(f"{self.name}:requests", self.requests_per_minute, 1)
+                return False
+        return True
+
+    def record_usage(self, tokens_used: int) -> None:
+        """
+        Correct the token bucket for a request's actual token usage.
+
+        Args:
+            tokens_used: Tokens the request used
+        """
+        if self.tokens_per_minute and self.tokens_per_request:
+            self._adjust(f"{self.name}:tokens", self.tokens_per_minute, self.tokens_per_request - tokens_used)
+
+    def _take(self, key: str, per_minute: int, amount: float, give_up_at: Optional[float]) -> bool:
+        """Take from a bucket, waiting for it to refill; False if the wait would pass give_up_at."""
+        while True:
+            try:
+                wait = self.store.take(key, per_minute, per_minute / 60, amount)
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Shared rate limit store unavailable, not limiting: {e}")
+                return True
+
+            if wait <= 0:
+                return True
+
+            if give_up_at is not None and time.time() + wait > give_up_at:
+                logger.info(f"Shared rate limit wait of {wait:.2f}s for {key} exceeds the remaining budget, "
+                            f"not waiting")
+                return False
+
+            self.waits += 1
+            logger.info(f"Shared rate limit reached for {key}, waiting {wait:.2f} seconds")
+            time.sleep(wait + random.uniform(0, MAX_JITTER))
+
+    def _adjust(self, key: str, per_minute: int, amount: float) -> None:
+        """Return tokens to a bucket, ignoring store errors."""
+        try:
+            self.store.adjust(key, per_minute, amount)
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Failed to adjust shared rate limit {key}: {e}")
+
+    def close(self) -> None:
+        """Release the store."""
+        self.store.close()
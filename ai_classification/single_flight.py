@@ -0,0 +1,111 @@
+"""
+Request coalescing for AI classification.
+
+This module provides single-flight execution: concurrent calls for the same
+key share one execution of the underlying function, so documents that map
+to the same classification request make one API call between them. Threads
+and asyncio tasks share the same in-flight calls.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self.coalesced = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of keys currently executing."""
+        return len(self._calls)
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run a function once for all concurrent callers with the same key.
+
+        The first caller runs the function in its own thread; the others block
+        until it finishes and receive the same result or exception.
+
+        Args:
+            key: Key identifying the work
+            func: Function performing the work
+
+        Returns:
+            Any: Result of the function
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, func)
+
+        return future.result()
+
+    async def do_async(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run a blocking function once for all concurrent callers with the same key.
+
+        The first caller runs the function in the event loop's default
+        executor; the others await it without holding a thread.
+
+        Args:
+            key: Key identifying the work
+            func: Blocking function performing the work
+
+        Returns:
+            Any: Result of the function
+        """
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(None, self._run, key, future, func)
+
+        return await asyncio.wrap_future(future)
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Join the call in flight for a key, or start a new one.
+
+        Args:
+            key: Key identifying the work
+
+        Returns:
+            Tuple[Future, bool]: Future of the call and whether the caller must run it
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _run(self, key: str, future: Future, func: Callable[[], Any]) -> None:
+        """
+        Run the work for a key and publish its outcome to every waiter.
+
+        Args:
+            key: Key identifying the work
+            future: Future shared by the callers
+            func: Function performing the work
+        """
+        try:
+            result = func()
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        else:
+            outcome = (future.set_result, result)
+
+        # Later callers start a new call once this one has finished
+        with self._lock:
+            del self._calls[key]
+
+        setter, value = outcome
+        setter(value)
@@ -0,0 +1,132 @@
+"""
+Token counting for AI classification prompts.
+
+This module counts prompt tokens with the tiktoken tokenizer when it is
+installed and its encoding files are available locally, and falls back to a
+calibrated estimator otherwise, so prompt sizes can be budgeted without
+network access.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from ai_classification.logging_config import setup_logging
+
+logger = setup_logging(__name__)
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Encoding used when tiktoken does not know the configured model
+DEFAULT_ENCODING = 'o200k_base'
+
+# Estimator calibration: BPE tokenizers keep common English words whole and
+# split long clinical terms roughly every six letters; digits are grouped in
+# runs of up to three and each punctuation mark is a token of its own.
+_ESTIMATOR_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_LETTERS_PER_TOKEN = 6
+
+# Encodings that failed to load, so we only try (and log) once per process
+_failed_encodings = set()
+
+
+class TokenCounter:
+    """Counts and truncates text by tokens for a given model."""
+
+    def __init__(self, model: Optional[str] = None):
+        """
+        Initialize the token counter.
+
+        Args:
+            model: Model name used to select the tokenizer encoding
+        """
+        self.model = model
+        self.encoding = self._load_encoding(model)
+        self.method = 'tiktoken' if self.encoding is not None else 'estimate'
+
+        logger.debug(f"Initialized token counter for model {model} using {self.method}")
+
+    def _load_encoding(self, model: Optional[str]):
+        """
+        Load the tiktoken encoding for the model if possible.
+
+        Args:
+            model: Model name
+
+        Returns:
+            The tiktoken encoding, or None to use the estimator
+        """
+        if not TIKTOKEN_AVAILABLE:
+            return None
+
+        try:
+            encoding_name = tiktoken.encoding_name_for_model(model) if model else DEFAULT_ENCODING
+        except KeyError:
+            encoding_name = DEFAULT_ENCODING
+
+        if encoding_name in _failed_encodings:
+            return None
+
+        try:
+            return tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            # Encoding files are downloaded on first use; offline hosts fall back
+            _failed_encodings.add(encoding_name)
+            logger.warning(f"Failed to load tiktoken encoding {encoding_name}, using token estimator: {e}")
+            return None
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            int: Number of tokens
+        """
+        if not text:
+            return 0
+
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+
+        return sum(self._estimate_piece(piece) for piece in _ESTIMATOR_PATTERN.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> Tuple[str, bool]:
+        """
+        Truncate a text to at most the given number of tokens.
+
+        Args:
+            text: Text to truncate
+            max_tokens: Maximum number of tokens to keep
+
+        Returns:
+            Tuple[str, bool]: Truncated text and whether anything was removed
+        """
+        if max_tokens <= 0:
+            return '', bool(text)
+
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text, False
+            return self.encoding.decode(tokens[:max_tokens]), True
+
+        used = 0
+        for match in _ESTIMATOR_PATTERN.finditer(text):
+            used += self._estimate_piece(match.group())
+            if used > max_tokens:
+                return text[:match.start()].rstrip(), True
+
+        return text, False
+
+    @staticmethod
+    def _estimate_piece(piece: str) -> int:
+        """Estimate the tokens in a single word, number or symbol."""
+        if piece[0].isalpha():
+            return 1 + (len(piece) - 1) // _LETTERS_PER_TOKEN
+        return 1
@@ -6,11 +6,13 @@ therapeutic classification capabilities.
 """
 
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 
 from hardened_mongo_import import DrugLabelImporter
 from ai_classification.drug_classifier import DrugClassifier
-from ai_classification.config import is_ai_enabled
+from ai_classification.classification_worker import classification_fields
+from ai_classification.job_queue import ClassificationJobQueue
+from ai_classification.config import get_config
+from ai_classification.mongo_clients import acquire_client, mongo_client_options, release_client
 from ai_classification.logging_config import setup_logging
 
 logger = setup_logging(__name__)
@@ -20,7 +22,8 @@ class EnhancedDrugLabelImporter(DrugLabelImporter):
     """Enhanced Drug Label Importer with AI classification."""
     
     def __init__(self, mongo_uri: str = 'mongodb://localhost:27017/',
-                 db_name: str = 'drug_facts', collection_name: str = 'drugs'):
+                 db_name: str = 'drug_facts', collection_name: str = 'drugs',
+                 classification_batch_size: int = 50, enqueue_classification: bool = False):
         """
         Initialize the enhanced drug label importer.
         
@@ -28,20 +31,30 @@ class EnhancedDrugLabelImporter(DrugLabelImporter):
             mongo_uri: MongoDB connection string
             db_name: Database name
             collection_name: Collection name
+            classification_batch_size: Documents classified per cache round-trip
+            enqueue_classification: Queue classification jobs for workers
+                instead of classifying inline
         """
-        # Initialize base class
-        super().__init__(mongo_uri, db_name, collection_name)
+        self.config = get_config()
+        
+        # Initialize base class on a client shared with the classification cache
+        client = acquire_client(mongo_uri, **mongo_client_options(self.config))
+        super().__init__(mongo_uri, db_name, collection_name, client=client)
         
         # Set up module logger as self.logger to ensure parent class methods work
         self.logger = logger
         
         # Initialize drug classifier
-        self.drug_classifier = DrugClassifier()
+        self.drug_classifier = DrugClassifier(mongo_uri=mongo_uri)
+        self.classification_batch_size = max(1, classification_batch_size)
+        self.job_queue = ClassificationJobQueue(mongo_uri, db_name) if enqueue_classification else None
         
         logger.info("Initialized enhanced drug label importer")
         
         # Log AI classification status
-        if is_ai_enabled():
+        if self.job_queue is not None:
+            logger.info("AI classification is queued for workers")
+        elif self.config.ai_enabled:
             logger.info("AI classification is enabled")
         else:
             logger.info("AI classification is disabled")
@@ -64,49 +77,87 @@ class EnhancedDrugLabelImporter(DrugLabelImporter):
             'failed': 0,
             'validation_errors': [],
             'ai_enhanced': 0,
-            'ai_failed': 0
+            'ai_failed': 0,
+            'ai_queued': 0
         }
         
         logger.info(f"Processing {len(documents)} documents with AI enhancement...")
         
-        for i, document in enumerate(documents):
-            try:
-                # Apply AI classification if enabled
-                if is_ai_enabled():
-                    try:
-                        # Get AI classification
-                        classification_result = self.drug_classifier.classify_drug(document)
-                        
-                        # Enhance document with classification
-                        document = self._enhance_document_with_classification(document, classification_result)
-                        
-                        stats['ai_enhanced'] += 1
-                        logger.info(f"Enhanced document {i+1} with AI classification")
-                        
-                    except Exception as e:
-                        stats['ai_failed'] += 1
-                        logger.error(f"AI classification failed for document {i+1}: {e}")
-                        # Continue with base document
-                
-                # Process document with base implementation
-                result = self._process_single_document(document, i)
-                
-                # Update stats
-                if result == 'inserted':
-                    stats['inserted'] += 1
-                elif result == 'updated':
-                    stats['updated'] += 1
-                elif result == 'skipped':
-                    stats['skipped'] += 1
-                elif result == 'failed':
-                    stats['failed'] += 1
-                elif result.startswith('validation_error:'):
+        # Queued documents are written without classification and classified by workers
+        ai_enabled = self.config.ai_enabled and self.job_queue is None
+        batch_size = self.classification_batch_size
+        
+        for batch_start in range(0, len(documents), batch_size):
+            batch = documents[batch_start:batch_start + batch_size]
+            
+            # Resolve classifications for the whole batch before writing it, so
+            # the cache is checked in one round-trip
+            classification_results = [None] * len(batch)
+            if ai_enabled:
+                try:
+                    classification_results = self.drug_classifier.classify_drugs(batch)
+                except Exception as e:
+                    logger.error(f"AI classification failed for documents "
+                                 f"{batch_start+1}-{batch_start+len(batch)}: {e}")
+            
+            changed_slugs = []
+            for offset, document in enumerate(batch):
+                i = batch_start + offset
+                try:
+                    # Apply AI classification if enabled
+                    if ai_enabled:
+                        classification_result = classification_results[offset]
+                        if classification_result is None:
+                            stats['ai_failed'] += 1
+                        elif classification_result.get('metadata', {}).get('error'):
+                            # Write the base document now; the classification
+                            # can be backfilled once the AI service recovers
+                            stats['ai_failed'] += 1
+                        else:
+                            try:
+                                # Enhance document with classification
+                                document = self._enhance_document_with_classification(document, classification_result)
+                                
+                                stats['ai_enhanced'] += 1
+                                logger.info(f"Enhanced document {i+1} with AI classification")
+                                
+                            except Exception as e:
+                                stats['ai_failed'] += 1
+                                logger.error(f"AI classification failed for document {i+1}: {e}")
+                                # Continue with base document
+                    
+                    # Process document with base implementation
+                    result = self._process_single_document(document, i)
+                    
+                    # Update stats
+                    if result == 'inserted':
+                        stats['inserted'] += 1
+                        changed_slugs.append(document['slug'])
+                    elif result == 'updated':
+                        stats['updated'] += 1
+                        changed_slugs.append(document['slug'])
+                    elif result == 'skipped':
+                        stats['skipped'] += 1
+                    elif result == 'failed':
+                        stats['failed'] += 1
+                    elif result.startswith('validation_error:'):
+                        stats['failed'] += 1
+                        stats['validation_errors'].append(result[17:])  # Remove 'validation_error: ' prefix
+                    
+                except Exception as e:
+                    logger.error(f"Error processing document {i+1}: {e}")
                     stats['failed'] += 1
-                    stats['validation_errors'].append(result[17:])  # Remove 'validation_error: ' prefix
-                
-            except Exception as e:
-                logger.error(f"Error processing document {i+1}: {e}")
-                stats['failed'] += 1
+            
+            if self.job_queue is not None and changed_slugs:
+                try:
+                    stats['ai_queued'] += self.job_queue.enqueue(changed_slugs)
+                except Exception as e:
+                    logger.error(f"Failed to queue classification jobs for documents "
+                                 f"{batch_start+1}-{batch_start+len(batch)}: {e}")
+        
+        # Let stale classifications served above finish refreshing
+        if ai_enabled:
+            self.drug_classifier.wait_for_refreshes()
         
         # Log summary
         logger.info("Processing completed!")
@@ -116,6 +167,7 @@ class EnhancedDrugLabelImporter(DrugLabelImporter):
         logger.info(f"Failed: {stats['failed']}")
         logger.info(f"AI enhanced: {stats['ai_enhanced']}")
         logger.info(f"AI failed: {stats['ai_failed']}")
+        logger.info(f"AI queued: {stats['ai_queued']}")
         
         if stats['validation_errors']:
             logger.error("Validation errors:")
@@ -206,26 +258,15 @@ class EnhancedDrugLabelImporter(DrugLabelImporter):
         Returns:
             Dict[str, Any]: Enhanced document
         """
-        # Create a copy of the document
         enhanced_doc = document.copy()
+        enhanced_doc.update(classification_fields(classification_result))
         
-        # Extract classification data
-        classification = classification_result['classification']
-        
-        # Add therapeutic classification as a string (primary_therapeutic_class)
-        enhanced_doc['therapeuticClass'] = classification.get('primary_therapeutic_class', 'Not specified')
-        
-        # Add full AI classification data as a separate field
-        enhanced_doc['aiClassification'] = classification
-        
-        # Add AI processing metadata
-        enhanced_doc['aiProcessingMetadata'] = {
-            'processedAt': datetime.utcnow(),
-            'modelUsed': classification_result.get('metadata', {}).get('model', 'unknown'),
-            'confidence': classification.get('confidence_level', 'Low'),
-            'tokensUsed': classification_result.get('metadata', {}).get('tokens_used', 0),
-            'processingTimeMs': classification_result.get('metadata', {}).get('processing_time', 0) * 1000,
-            'cached': classification_result.get('cached', False)
-        }
-        
-        return enhanced_doc
\ No newline at end of file
+        return enhanced_doc
+    
+    def close(self):
+        """Close the classifier and job queue and release the shared MongoDB client."""
+        self.drug_classifier.close()
+        if self.job_queue is not None:
+            self.job_queue.close()
+        release_client(self.client)
+        self.logger.info("MongoDB connection released")
@@ -1,21 +1,17 @@
 import json
-import yaml
 import hashlib
 import argparse
 import os
 import re
-import requests
 from typing import Dict, List, Any, Optional, Tuple
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError, BulkWriteError
-from jsonschema import validate, ValidationError
 import logging
 from datetime import datetime
 from urllib.parse import quote
 
 class DrugLabelImporter:
     def __init__(self, mongo_uri: str = 'mongodb://localhost:27017/', 
-                 db_name: str = 'drug_facts', collection_name: str = 'drugs'):
+                 db_name: str = 'drug_facts', collection_name: str = 'drugs',
+                 client=None):
         """
         Initialize the drug label importer with MongoDB connection and schema validation.
         
@@ -23,11 +19,17 @@ class DrugLabelImporter:
             mongo_uri: MongoDB connection string
             db_name: Database name
             collection_name: Collection name
+            client: Existing MongoClient to use instead of creating one
         """
-        self.client = MongoClient(mongo_uri)
+        if client is None:
+            from pymongo import MongoClient
+            client = MongoClient(mongo_uri)
+        
+        self.client = client
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
         self.schema = None
+        self._validator = None
         self.logger = self.setup_logging()
         
         # Cache for SPL link IDs to avoid repeated API calls
@@ -63,9 +65,12 @@ class DrugLabelImporter:
         Returns:
             bool: True if schema loaded successfully, False otherwise
         """
+        import yaml
+        
         try:
             with open(schema_file, 'r') as f:
                 self.schema = yaml.safe_load(f)
+            self._validator = None
             self.logger.info(f"Schema loaded successfully from {schema_file}")
             return True
         except FileNotFoundError:
@@ -88,15 +93,29 @@ class DrugLabelImporter:
         if not self.schema:
             return False, "No schema loaded"
         
-        try:
+        from jsonschema.exceptions import best_match
+        
+        error = best_match(self._get_validator().iter_errors(document))
+        if error is not None:
+            return False, f"Validation error: {error.message}"
+        return True, None
+    
+    def _get_validator(self):
+        """
+        Build the validator for the loaded schema once and reuse it.
+        
+        Returns:
+            jsonschema validator for a single document
+        """
+        if self._validator is None:
+            from jsonschema.validators import validator_for
+            
             # Validate against the items schema (single document)
-            if 'items' in self.schema:
-                validate(instance=document, schema=self.schema['items'])
-            else:
-                validate(instance=document, schema=self.schema)
-            return True, None
-        except ValidationError as e:
-            return False, f"Validation error: {e.message}"
+            schema = self.schema['items'] if 'items' in self.schema else self.schema
+            validator_class = validator_for(schema)
+            validator_class.check_schema(schema)
+            self._validator = validator_class(schema)
+        return self._validator
     
     def calculate_document_hash(self, document: Dict[str, Any]) -> str:
         """
@@ -174,6 +193,8 @@ class DrugLabelImporter:
         if drug_name in self.spl_link_cache:
             return self.spl_link_cache[drug_name]
         
+        import requests
+        
         try:
             url = "https://api.fda.gov/drug/labelsearch.json"
             encoded_drug_name = quote(drug_name)
@@ -297,6 +318,8 @@ class DrugLabelImporter:
         Returns:
             Dict with counts of inserted, updated, skipped, and failed documents
         """
+        from pymongo.errors import DuplicateKeyError
+        
         stats = {
             'inserted': 0,
             'updated': 0,
@@ -0,0 +1,246 @@
+"""
+Maintain the AI classification cache.
+
+This script runs maintenance jobs against the AI classification cache
+collection, such as evicting least recently used entries once the cache
+exceeds its size caps. It is meant to be run periodically (e.g. from cron).
+"""
+
+import sys
+import os
+import argparse
+
+from ai_classification.cache_manager import CacheManager
+from ai_classification.config import reload_config
+from ai_classification.mongo_clients import add_mongo_client_arguments, apply_mongo_client_arguments
+
+
+def print_stats(cache_manager: CacheManager, detailed: bool) -> None:
+    """
+    Print cache statistics.
+
+    Args:
+        cache_manager: Cache manager
+        detailed: Also compute the average entry age (scans the collection)
+    """
+    cache_manager.refresh_collection_stats()
+    stats = cache_manager.get_cache_statistics(detailed=detailed)
+    metrics = stats['cache_metrics']
+
+    print(f"Eviction policy: {cache_manager.eviction_policy}")
+    print(f"Total entries: {stats['total_entries']}")
+    print(f"Data size: {metrics['actual_cache_size_bytes']} bytes")
+    print(f"Storage size: {metrics['cache_storage_size_bytes']} bytes")
+    print(f"Index size: {metrics['cache_index_size_bytes']} bytes")
+    print(f"Oldest entry: {stats['oldest_entry']}")
+    print(f"Newest entry: {stats['newest_entry']}")
+    if detailed:
+        print(f"Average age (hours): {stats.get('avg_age_hours', 0):.2f}")
+
+
+def main():
+    """Main function to run cache maintenance."""
+    parser = argparse.ArgumentParser(
+        description='Maintain the AI classification cache',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s stats                              # Show collection statistics
+  %(prog)s evict                              # Evict down to AI_CACHE_MAX_ENTRIES / AI_CACHE_MAX_BYTES
+  %(prog)s evict --max-entries 100000         # Evict least recently used beyond 100k entries
+  %(prog)s cleanup                            # Delete entries past their expiry and grace window
+  %(prog)s clear --older-than-hours 720       # Delete entries created over 30 days ago
+  %(prog)s clear --batch-size 500 --pause 0.5 # Delete everything, gently
+  %(prog)s bloom --output cache_keys.bloom    # Save a Bloom filter of cache keys for workers
+  %(prog)s migrate                            # Delete legacy entries keyed by set ID (never hit)
+  %(prog)s export --output cache.jsonl.gz     # Snapshot unexpired entries
+  %(prog)s import --input cache.jsonl.gz      # Load a snapshot, keeping existing entries
+        """
+    )
+
+    parser.add_argument(
+        'command',
+        choices=['stats', 'evict', 'cleanup', 'clear', 'bloom', 'migrate', 'export', 'import'],
+        help='Maintenance job to run'
+    )
+
+    # MongoDB arguments
+    parser.add_argument(
+        '--mongo-uri',
+        default=None,
+        help='MongoDB connection URI (default: MONGODB_URI or mongodb://localhost:27017/)'
+    )
+
+    parser.add_argument(
+        '--db-name',
+        default='drug_facts',
+        help='Database name (default: drug_facts)'
+    )
+
+    parser.add_argument(
+        '--collection-name',
+        default='ai_classification_cache',
+        help='Cache collection name (default: ai_classification_cache)'
+    )
+
+    # MongoDB client options
+    add_mongo_client_arguments(parser)
+
+    # Eviction options
+    parser.add_argument(
+        '--max-entries',
+        type=int,
+        default=None,
+        help='Maximum cached entries to keep (default: AI_CACHE_MAX_ENTRIES, 0 for no cap)'
+    )
+
+    parser.add_argument(
+        '--max-bytes',
+        type=int,
+        default=None,
+        help='Maximum cached data size in bytes (default: AI_CACHE_MAX_BYTES, 0 for no cap)'
+    )
+
+    # Batching options
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=None,
+        help='Entries deleted per batch (default: AI_CACHE_DELETE_BATCH_SIZE)'
+    )
+
+    parser.add_argument(
+        '--pause',
+        type=float,
+        default=None,
+        help='Seconds to wait between delete batches (default: AI_CACHE_DELETE_PAUSE)'
+    )
+
+    # Clear options
+    parser.add_argument(
+        '--older-than-hours',
+        type=int,
+        default=None,
+        help='Only clear entries created more than this many hours ago (default: all)'
+    )
+
+    # File options
+    parser.add_argument(
+        '--output',
+        default=None,
+        help='File to write the Bloom filter (default: AI_CACHE_BLOOM_PATH) or snapshot to'
+    )
+
+    parser.add_argument(
+        '--input',
+        default=None,
+        help='Snapshot file to import'
+    )
+
+    # Options
+    parser.add_argument(
+        '--detailed',
+        action='store_true',
+        help='Include statistics that require scanning the whole collection'
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+
+    args = parser.parse_args()
+
+    # A saved filter would only be loaded back; build it from the collection
+    if args.command == 'bloom':
+        output = args.output or os.getenv('AI_CACHE_BLOOM_PATH')
+        if not output:
+            parser.error('bloom requires --output or AI_CACHE_BLOOM_PATH')
+        os.environ['ENABLE_CACHE_BLOOM_FILTER'] = 'true'
+        os.environ['AI_CACHE_BLOOM_PATH'] = ''
+    elif args.command == 'export' and not args.output:
+        parser.error('export requires --output')
+    elif args.command == 'import' and not args.input:
+        parser.error('import requires --input')
+
+    # Maintenance jobs only need a single stats refresh, not a background one
+    os.environ.setdefault('AI_CACHE_STATS_REFRESH_INTERVAL', '0')
+
+    # Set logging level
+    if args.verbose:
+        os.environ['AI_LOG_LEVEL'] = 'DEBUG'
+
+    apply_mongo_client_arguments(args)
+
+    # Configuration is read once; pick up the options set above
+    reload_config()
+
+    cache_manager = CacheManager(
+        mongo_uri=args.mongo_uri,
+        db_name=args.db_name,
+        collection_name=args.collection_name
+    )
+
+    try:
+        if args.command == 'stats':
+            print_stats(cache_manager, args.detailed)
+
+        elif args.command == 'evict':
+            evicted = cache_manager.evict_lru(
+                max_entries=args.max_entries,
+                max_bytes=args.max_bytes,
+                batch_size=args.batch_size,
+                pause=args.pause
+            )
+            print(f"Evicted {evicted} least recently used entries")
+
+        elif args.command == 'cleanup':
+            cleaned = cache_manager.cleanup_expired_entries(batch_size=args.batch_size, pause=args.pause)
+            print(f"Deleted {cleaned} expired entries")
+
+        elif args.command == 'clear':
+            cleared = cache_manager.clear_cache(
+                older_than_hours=args.older_than_hours,
+                batch_size=args.batch_size,
+                pause=args.pause
+            )
+            print(f"Deleted {cleared} entries")
+
+        elif args.command == 'migrate':
+            purged = cache_manager.purge_legacy_entries(batch_size=args.batch_size, pause=args.pause)
+            print(f"Deleted {purged} entries stored under legacy cache keys")
+
+        elif args.command == 'export':
+            exported = cache_manager.export_snapshot(args.output, batch_size=args.batch_size or 1000)
+            print(f"Exported {exported} entries to {args.output}")
+
+        elif args.command == 'import':
+            results = cache_manager.import_snapshot(args.input, batch_size=args.batch_size or 1000)
+            print(f"Imported {results['imported']} of {results['entries']} entries "
+                  f"({results['existing']} already present, {results['expired']} expired)")
+
+        elif args.command == 'bloom':
+            cache_manager.backend.connect()
+            if not cache_manager.save_bloom_filter(output):
+                print("Failed to build Bloom filter")
+                return 1
+            bloom_filter = cache_manager.bloom_filter
+            print(f"Saved Bloom filter of {len(bloom_filter)} keys "
+                  f"({bloom_filter.size_bytes} bytes) to {output}")
+
+        return 0
+
+    except Exception as e:
+        print(f"Cache maintenance failed: {e}")
+        if args.verbose:
+            import traceback
+            traceback.print_exc()
+        return 1
+
+    finally:
+        cache_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Run a classification worker.
+
+This script classifies drug documents queued by
+`run_enhanced_import.py --enqueue-classification`. Any number of workers can
+run at once, in one or several containers; each leases jobs from the
+classification_jobs collection, writes the classification to the drug
+document and stores it in the AI classification cache.
+"""
+
+import sys
+import os
+import argparse
+import signal
+
+from ai_classification.config import reload_config
+from ai_classification.mongo_clients import (
+    acquire_client, add_mongo_client_arguments, apply_mongo_client_arguments, mongo_client_options, release_client
+)
+
+
+def print_queue_stats(stats: dict) -> None:
+    """
+    Print classification queue statistics.
+
+    Args:
+        stats: Statistics from ClassificationJobQueue.get_stats()
+    """
+    print(f"Pending jobs: {stats['pending']}")
+    print(f"Leased jobs: {stats['leased']}")
+    print(f"Done jobs: {stats['done']}")
+    print(f"Dead-lettered jobs: {stats['dead']}")
+    print(f"Completed in the last minute: {stats['completed_last_minute']}")
+    print(f"Oldest pending job age (seconds): {stats['oldest_pending_age']:.0f}")
+
+
+def main():
+    """Main function to run a classification worker."""
+    parser = argparse.ArgumentParser(
+        description='Classify drug documents from the classification job queue',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                    # Process jobs until interrupted
+  %(prog)s --concurrency 8                    # Process 8 jobs at once
+  %(prog)s --drain                            # Exit once the queue is empty
+  %(prog)s --stats                            # Show queue statistics
+  %(prog)s --requeue-dead                     # Retry dead-lettered jobs
+        """
+    )
+
+    # MongoDB arguments
+    parser.add_argument(
+        '--mongo-uri',
+        default='mongodb://localhost:27017/',
+        help='MongoDB connection URI (default: mongodb://localhost:27017/)'
+    )
+
+    parser.add_argument(
+        '--db-name',
+        default='drug_facts',
+        help='Database name (default: drug_facts)'
+    )
+
+    parser.add_argument(
+        '--collection-name',
+        default='drugs',
+        help='Drug collection name (default: drugs)'
+    )
+
+    parser.add_argument(
+        '--jobs-collection-name',
+        default='classification_jobs',
+        help='Job collection name (default: classification_jobs)'
+    )
+
+    # MongoDB client options
+    add_mongo_client_arguments(parser)
+
+    # Worker options
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='Jobs processed at once (default: AI_JOB_WORKER_CONCURRENCY)'
+    )
+
+    parser.add_argument(
+        '--max-jobs',
+        type=int,
+        default=None,
+        help='Exit after this many jobs (default: no limit)'
+    )
+
+    parser.add_argument(
+        '--drain',
+        action='store_true',
+        help='Exit once no job is available instead of waiting for more'
+    )
+
+    # Queue maintenance
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Print queue statistics and exit'
+    )
+
+    parser.add_argument(
+        '--requeue-dead',
+        action='store_true',
+        help='Queue dead-lettered jobs again and exit'
+    )
+
+    # Options
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Enable verbose logging'
+    )
+
+    args = parser.parse_args()
+
+    # Set logging level
+    if args.verbose:
+        os.environ['AI_LOG_LEVEL'] = 'DEBUG'
+
+    apply_mongo_client_arguments(args)
+
+    # Configuration is read once; pick up the options set above
+    config = reload_config()
+
+    from ai_classification.job_queue import ClassificationJobQueue
+
+    job_queue = ClassificationJobQueue(args.mongo_uri, args.db_name, args.jobs_collection_name)
+
+    try:
+        if args.stats:
+            print_queue_stats(job_queue.get_stats())
+            return 0
+
+        if args.requeue_dead:
+            print(f"Requeued {job_queue.requeue_dead()} dead-lettered jobs")
+            return 0
+
+        if not config.ai_enabled:
+            print("AI classification is disabled; set OPENPIPE_API_KEY and ENABLE_AI_CLASSIFICATION")
+            return 1
+
+        from ai_classification.classification_worker import ClassificationWorker
+        from ai_classification.drug_classifier import DrugClassifier
+
+        drug_classifier = DrugClassifier(mongo_uri=args.mongo_uri)
+        if drug_classifier.openai_client is None:
+            print("AI client is not available; install the OpenPipe SDK")
+            drug_classifier.close()
+            return 1
+
+        # The drug collection shares the job queue's and the cache's client
+        client = acquire_client(args.mongo_uri, **mongo_client_options(config))
+        worker = ClassificationWorker(
+            job_queue,
+            drug_classifier,
+            client[args.db_name][args.collection_name],
+            concurrency=args.concurrency
+        )
+
+        # Containers are stopped with SIGTERM; finish in-flight jobs first
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+        try:
+            stats = worker.run(max_jobs=args.max_jobs, drain=args.drain)
+        finally:
+            drug_classifier.close()
+            release_client(client)
+
+        print(f"Completed {stats['completed']} jobs ({stats['jobs_per_second']:.2f}/s), "
+              f"{stats['retried']} retried, {stats['dead_lettered']} dead-lettered")
+        print_queue_stats(job_queue.get_stats())
+        return 0
+
+    except Exception as e:
+        print(f"Classification worker failed: {e}")
+        if args.verbose:
+            import traceback
+            traceback.print_exc()
+        return 1
+
+    finally:
+        job_queue.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,8 @@ import json
 import argparse
 from typing import Dict, Any
 
-from enhanced_drug_importer import EnhancedDrugLabelImporter
+from ai_classification.config import reload_config
+from ai_classification.mongo_clients import add_mongo_client_arguments, apply_mongo_client_arguments
 
 
 def main():
@@ -25,6 +26,8 @@ Examples:
   %(prog)s -j data/drugs/mounjaro-d2d7da5.json -s drug_label_schema.yaml
   %(prog)s --mongo-uri mongodb://remote:27017/ --db-name production_drugs
   %(prog)s --disable-ai                       # Run without AI classification
+  %(prog)s --enqueue-classification           # Leave classification to worker processes
+  %(prog)s --mongo-pool-size 20 --mongo-compressors zstd,snappy
         """
     )
     
@@ -60,6 +63,9 @@ Examples:
         help='Collection name (default: drugs)'
     )
     
+    # MongoDB client options
+    add_mongo_client_arguments(parser)
+    
     # AI options
     parser.add_argument(
         '--disable-ai',
@@ -67,6 +73,19 @@ Examples:
         help='Disable AI classification'
     )
     
+    parser.add_argument(
+        '--classification-batch-size',
+        type=int,
+        default=50,
+        help='Documents whose classifications are resolved per cache round-trip (default: 50)'
+    )
+    
+    parser.add_argument(
+        '--enqueue-classification',
+        action='store_true',
+        help='Queue classification jobs for run_classification_worker.py instead of classifying inline'
+    )
+    
     # Options
     parser.add_argument(
         '-v', '--verbose',
@@ -92,6 +111,11 @@ Examples:
     if args.verbose:
         os.environ['AI_LOG_LEVEL'] = 'DEBUG'
     
+    apply_mongo_client_arguments(args)
+    
+    # Configuration is read once; pick up the options set above
+    reload_config()
+    
     # Handle dry run
     if args.dry_run:
         print("DRY RUN MODE - No database changes will be made")
@@ -111,6 +135,9 @@ Examples:
         print("Files exist and would be processed.")
         return 0
     
+    # Imported here so dry runs do not load the database and AI clients
+    from enhanced_drug_importer import EnhancedDrugLabelImporter
+    
     try:
         print(f"Importing drug labels from: {args.json_file}")
         print(f"Using schema: {args.schema_file}")
@@ -122,7 +149,9 @@ Examples:
         importer = EnhancedDrugLabelImporter(
             mongo_uri=args.mongo_uri,
             db_name=args.db_name,
-            collection_name=args.collection_name
+            collection_name=args.collection_name,
+            classification_batch_size=args.classification_batch_size,
+            enqueue_classification=args.enqueue_classification
         )
         
         # Load schema
@@ -161,6 +190,8 @@ Examples:
         print(f"Documents failed: {stats['failed']}")
         print(f"Documents AI enhanced: {stats.get('ai_enhanced', 0)}")
         print(f"Documents AI failed: {stats.get('ai_failed', 0)}")
+        if args.enqueue_classification:
+            print(f"Classification jobs queued: {stats.get('ai_queued', 0)}")
         
         if stats.get('validation_errors'):
             print(f"\nValidation errors ({len(stats['validation_errors'])}):")
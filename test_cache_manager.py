@@ -28,6 +28,16 @@ def create_sample_drug():
     }
 
 
+def create_cache_key(cache_manager, drug):
+    """Create a cache key for a sample drug."""
+    return cache_manager.generate_cache_key(
+        f"Drug Name: {drug['drugName']}\n{drug['label']}",
+        'gpt-4o-mini',
+        0.1,
+        'test-system-prompt-digest'
+    )
+
+
 def create_sample_classification():
     """Create a sample classification result."""
     return {
@@ -67,7 +77,7 @@ def test_basic_cache_operations():
     metadata = create_sample_metadata()
     
     # Generate cache key
-    cache_key = cache_manager.generate_cache_key(drug)
+    cache_key = create_cache_key(cache_manager, drug)
     print(f"Generated cache key: {cache_key[:50]}...")
     
     # Check if entry exists (should be miss)
@@ -129,7 +139,8 @@ def test_cache_warming():
     # Warm cache
     print(f"Warming cache with {len(drugs)} drugs...")
     start_time = time.time()
-    results = cache_manager.warm_cache(drugs, mock_classify)
+    results = cache_manager.warm_cache(drugs, mock_classify,
+                                       lambda drug: create_cache_key(cache_manager, drug))
     total_time = time.time() - start_time
     
     print(f"Cache warming completed in {total_time:.2f}s")
@@ -138,7 +149,7 @@ def test_cache_warming():
     print(f"Failed: {results['failed']}")
     
     # Get cache statistics
-    stats = cache_manager.get_cache_statistics()
+    stats = cache_manager.get_cache_statistics(detailed=True)
     print("\nCache Statistics:")
     print(f"Total entries: {stats.get('total_entries', 0)}")
     print(f"Average age (hours): {stats.get('avg_age_hours', 0):.2f}")
@@ -157,7 +168,7 @@ def test_cache_management():
     # Create and store some sample entries
     for i in range(5):
         drug = {**create_sample_drug(), 'drugName': f'Drug {i}', 'setId': f'test-{i}'}
-        cache_key = cache_manager.generate_cache_key(drug)
+        cache_key = create_cache_key(cache_manager, drug)
         cache_manager.store_classification(
             cache_key, 
             create_sample_classification(), 
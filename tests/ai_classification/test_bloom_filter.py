@@ -0,0 +1,77 @@
+"""
+Tests for the Bloom filter of cache keys.
+"""
+
+import unittest
+
+from ai_classification.bloom_filter import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+    """Test cases for BloomFilter class."""
+
+    def test_no_false_negatives(self):
+        """Test that every added key is reported present."""
+        bloom_filter = BloomFilter(1000)
+        keys = [f"key-{i}" for i in range(1000)]
+        bloom_filter.update(keys)
+
+        self.assertTrue(all(key in bloom_filter for key in keys))
+        # Keys whose bits were all set already are not counted
+        self.assertAlmostEqual(len(bloom_filter), 1000, delta=10)
+        self.assertFalse(bloom_filter.saturated)
+
+    def test_re_adding_keys_is_not_counted(self):
+        """Test that adding the same keys again does not grow the count."""
+        bloom_filter = BloomFilter(100)
+        keys = [f"key-{i}" for i in range(60)]
+        bloom_filter.update(keys)
+        count = len(bloom_filter)
+
+        for _ in range(5):
+            bloom_filter.update(keys)
+
+        self.assertEqual(len(bloom_filter), count)
+        self.assertFalse(bloom_filter.add('key-0'))
+        self.assertFalse(bloom_filter.saturated)
+
+    def test_false_positive_rate_near_target(self):
+        """Test that absent keys are rarely reported present at capacity."""
+        bloom_filter = BloomFilter(5000, false_positive_rate=0.01)
+        bloom_filter.update(f"key-{i}" for i in range(5000))
+
+        false_positives = sum(1 for i in range(20000) if f"other-{i}" in bloom_filter)
+
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_saturated_beyond_capacity(self):
+        """Test that the filter reports being over capacity."""
+        bloom_filter = BloomFilter(10)
+        bloom_filter.update(f"key-{i}" for i in range(11))
+
+        self.assertTrue(bloom_filter.saturated)
+
+    def test_serialization_round_trip(self):
+        """Test that a deserialized filter answers like the original."""
+        bloom_filter = BloomFilter(100, false_positive_rate=0.001)
+        bloom_filter.update(['a', 'b', 'c'])
+
+        restored = BloomFilter.from_bytes(bloom_filter.to_bytes())
+
+        self.assertEqual(restored.num_bits, bloom_filter.num_bits)
+        self.assertEqual(restored.num_hashes, bloom_filter.num_hashes)
+        self.assertEqual(len(restored), 3)
+        self.assertEqual(restored.false_positive_rate, 0.001)
+        self.assertTrue(all(key in restored for key in ['a', 'b', 'c']))
+        self.assertEqual(restored.to_bytes(), bloom_filter.to_bytes())
+
+    def test_invalid_data_rejected(self):
+        """Test that data that is not a serialized filter is rejected."""
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(b'short')
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(BloomFilter(100).to_bytes()[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+"""
+Tests for AI classification cache backends.
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from ai_classification.cache_backend import SQLiteCacheBackend, MongoCacheBackend, create_cache_backend
+from ai_classification.cache_manager import CacheManager, NEVER_EXPIRES, cache_id
+from ai_classification.config import get_config, reload_config
+
+
+def create_entry(cache_key, expires_in_hours=1, created_hours_ago=0):
+    """Create a cache entry as written by the cache manager."""
+    created_at = datetime.utcnow() - timedelta(hours=created_hours_ago)
+    expires_at = datetime.utcnow() + timedelta(hours=expires_in_hours)
+    return {
+        'classification': {'primary_therapeutic_class': 'Antidiabetic Agents'},
+        'metadata': {'model': 'gpt-4o-mini', 'cache_key': cache_key},
+        'created_at': created_at,
+        'expires_at': expires_at,
+        'purge_at': expires_at + timedelta(days=7)
+    }
+
+
+class TestSQLiteCacheBackend(unittest.TestCase):
+    """Test cases for SQLiteCacheBackend class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.backend = SQLiteCacheBackend(':memory:')
+        self.addCleanup(self.backend.close)
+
+    def test_replace_and_find(self):
+        """Test that entries round-trip with their times and documents."""
+        entry = create_entry('a')
+
+        self.assertTrue(self.backend.replace(cache_id('a'), entry))
+        self.assertFalse(self.backend.replace(cache_id('a'), entry))
+
+        found = self.backend.find(cache_id('a'), datetime.utcnow())
+        self.assertEqual(found['_id'], cache_id('a'))
+        self.assertEqual(found['classification'], entry['classification'])
+        self.assertEqual(found['metadata'], entry['metadata'])
+        self.assertEqual(found['expires_at'], entry['expires_at'])
+        self.assertEqual(found['purge_at'], entry['purge_at'])
+
+    def test_find_respects_expiry(self):
+        """Test that entries expiring before the cutoff are not returned."""
+        self.backend.replace(cache_id('a'), create_entry('a', expires_in_hours=-2))
+
+        self.assertIsNone(self.backend.find(cache_id('a'), datetime.utcnow()))
+        self.assertIsNotNone(self.backend.find(cache_id('a'), datetime.utcnow() - timedelta(hours=3)))
+        self.assertIsNotNone(self.backend.find(cache_id('a')))
+
+    def test_batch_operations(self):
+        """Test batch replace, lookup and insert of existing keys."""
+        written, inserted = self.backend.replace_many({cache_id(key): create_entry(key) for key in 'abc'})
+        self.assertEqual(len(written), 3)
+        self.assertEqual(inserted, 3)
+
+        found = self.backend.find_many([cache_id('a'), cache_id('c'), cache_id('z')], datetime.utcnow())
+        self.assertEqual({entry['metadata']['cache_key'] for entry in found}, {'a', 'c'})
+
+        new_entries = [{'_id': cache_id(key), **create_entry(key)} for key in 'cd']
+        self.assertEqual(self.backend.insert_many(new_entries), ([cache_id('d')], 1))
+
+    def test_expired_entries_are_purged(self):
+        """Test that entries past their purge time are removed on connect."""
+        path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+        backend = SQLiteCacheBackend(path)
+        entry = create_entry('a', expires_in_hours=-2)
+        entry['purge_at'] = datetime.utcnow() - timedelta(hours=1)
+        backend.replace(cache_id('a'), entry)
+        backend.replace(cache_id('b'), create_entry('b'))
+        backend.close()
+
+        reopened = SQLiteCacheBackend(path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(list(reopened.iter_ids()), [cache_id('b')])
+
+    def test_least_recently_used_and_touch(self):
+        """Test that never-accessed entries come first, then oldest accesses."""
+        for key in 'abc':
+            self.backend.replace(cache_id(key), create_entry(key))
+        now = datetime.utcnow()
+        self.backend.touch([cache_id('a')], now)
+        self.backend.touch([cache_id('b')], now - timedelta(hours=1))
+
+        victims = self.backend.least_recently_used(3)
+
+        self.assertEqual([cache_key for _, cache_key in victims], ['c', 'b', 'a'])
+        self.assertEqual(self.backend.delete_ids([victims[0][0]]), 1)
+
+    def test_delete_batch_by_field(self):
+        """Test that batches follow _id order and only match the filter."""
+        for key in 'abcd':
+            self.backend.replace(cache_id(key), create_entry(key, created_hours_ago=48 if key != 'd' else 0))
+
+        cutoff = datetime.utcnow() - timedelta(hours=24)
+        ids, deleted = self.backend.delete_batch('created_at', cutoff, None, 2)
+        self.assertEqual(deleted, 2)
+        self.assertEqual(ids, sorted(ids))
+
+        ids, deleted = self.backend.delete_batch('created_at', cutoff, ids[-1], 2)
+        self.assertEqual(deleted, 1)
+        self.assertEqual(list(self.backend.iter_ids()), [cache_id('d')])
+
+        with self.assertRaises(ValueError):
+            self.backend.delete_batch('metadata', cutoff, None, 2)
+
+    def test_iter_entries_skips_negative_and_expired(self):
+        """Test that snapshots only stream live classification entries."""
+        self.backend.replace(cache_id('a'), create_entry('a'))
+        self.backend.replace(cache_id('b'), create_entry('b', expires_in_hours=-1))
+        negative_entry = create_entry('c')
+        del negative_entry['classification']
+        negative_entry['failure'] = {'reason': 'Invalid JSON response', 'attempts': 3}
+        self.backend.replace(cache_id('c'), negative_entry)
+
+        entries = list(self.backend.iter_entries(datetime.utcnow(), batch_size=1))
+
+        self.assertEqual([entry['metadata']['cache_key'] for entry in entries], ['a'])
+
+    def test_collection_stats(self):
+        """Test entry count, size and creation time boundaries."""
+        self.backend.replace(cache_id('a'), create_entry('a', created_hours_ago=5))
+        self.backend.replace(cache_id('b'), create_entry('b', created_hours_ago=1))
+
+        stats = self.backend.collection_stats()
+
+        self.assertEqual(stats['count'], 2)
+        self.assertGreater(stats['size'], 0)
+        self.assertGreater(stats['storage_size'], 0)
+        self.assertLess(stats['oldest_entry'], stats['newest_entry'])
+        self.assertAlmostEqual(self.backend.average_age_hours(), 3, places=1)
+
+    def test_concurrent_reads_and_writes(self):
+        """Test that rows are fetched before another thread can use the shared connection."""
+        errors = []
+
+        def read_and_write(key):
+            try:
+                for _ in range(100):
+                    self.backend.replace(cache_id(key), create_entry(key))
+                    self.backend.find(cache_id(key))
+                    list(self.backend.iter_ids())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read_and_write, args=(key,)) for key in 'abcd']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.backend.estimated_count(), 4)
+
+
+class TestSQLiteCacheManager(unittest.TestCase):
+    """Test cases for the cache manager on the embedded backend."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        env = {'AI_CACHE_BACKEND': 'sqlite', 'AI_CACHE_SQLITE_PATH': ':memory:',
+               'AI_CACHE_STATS_REFRESH_INTERVAL': '0', 'AI_CACHE_MEMORY_MAX_ENTRIES': '0'}
+        with patch.dict(os.environ, env):
+            reload_config()
+            self.cache_manager = CacheManager()
+        reload_config()
+        self.addCleanup(self.cache_manager.close)
+
+    def test_backend_selected_by_config(self):
+        """Test that AI_CACHE_BACKEND selects the embedded backend."""
+        self.assertIsInstance(self.cache_manager.backend, SQLiteCacheBackend)
+
+    def test_store_and_lookup(self):
+        """Test single and batch lookups served by SQLite."""
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {'model': 'm'})
+        self.cache_manager.store_many([('b', {'primary_therapeutic_class': 'Y'}, {})])
+
+        result = self.cache_manager.get_cached_classification('a')
+        self.assertEqual(result['cache_tier'], 'sqlite')
+        self.assertEqual(result['classification']['primary_therapeutic_class'], 'X')
+        self.assertFalse(result['stale'])
+
+        results = self.cache_manager.get_many(['a', 'b', 'c'])
+        self.assertEqual(set(results), {'a', 'b'})
+
+        metrics = self.cache_manager.get_metrics(refresh=True)
+        self.assertEqual(metrics['total_cached_entries'], 2)
+        self.assertEqual(metrics['cache_hits'], 3)
+
+    def test_negative_entries(self):
+        """Test that stored failures are served until they expire."""
+        self.cache_manager.store_failure('a', 'Invalid JSON response', 3)
+
+        result = self.cache_manager.get_cached_classification('a')
+
+        self.assertTrue(result['negative'])
+        self.assertEqual(result['failure']['attempts'], 3)
+
+    def test_clear_and_cleanup(self):
+        """Test batched clearing on the embedded backend."""
+        self.cache_manager.store_many([(key, {'primary_therapeutic_class': 'X'}, {}) for key in 'abc'])
+
+        self.assertEqual(self.cache_manager.cleanup_expired_entries(), 0)
+        self.assertEqual(self.cache_manager.clear_cache(batch_size=2, pause=0), 3)
+        self.assertIsNone(self.cache_manager.get_cached_classification('a'))
+
+    def test_snapshot_round_trip(self):
+        """Test that a snapshot moves entries between backends."""
+        self.cache_manager.store_many([(key, {'primary_therapeutic_class': 'X'}, {}) for key in 'ab'])
+        path = os.path.join(tempfile.mkdtemp(), 'cache.jsonl.gz')
+        self.addCleanup(os.remove, path)
+
+        self.assertEqual(self.cache_manager.export_snapshot(path), 2)
+        self.cache_manager.clear_cache()
+        results = self.cache_manager.import_snapshot(path)
+
+        self.assertEqual(results['imported'], 2)
+        self.assertIsNotNone(self.cache_manager.get_cached_classification('a'))
+
+    def test_lru_entries_never_expire(self):
+        """Test that LRU entries are stored with the far-future expiry."""
+        self.cache_manager.eviction_policy = 'lru'
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {})
+
+        self.assertEqual(self.cache_manager.backend.find(cache_id('a'))['expires_at'], NEVER_EXPIRES)
+
+
+class TestCreateCacheBackend(unittest.TestCase):
+    """Test cases for backend selection."""
+
+    def test_unknown_backend_falls_back_to_mongo(self):
+        """Test that an unknown backend name selects MongoDB."""
+        backend = create_cache_backend({**get_config(), 'AI_CACHE_BACKEND': 'redis'},
+                                       'mongodb://localhost:27017/', 'drug_facts', 'cache')
+        self.assertIsInstance(backend, MongoCacheBackend)
+        self.assertEqual(backend.client_options['maxPoolSize'], get_config()['MONGO_MAX_POOL_SIZE'])
+
+
+if __name__ == '__main__':
+    unittest.main()
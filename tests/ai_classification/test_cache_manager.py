@@ -0,0 +1,838 @@
+"""
+Tests for AI classification cache manager.
+"""
+
+import gzip
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from ai_classification.config import reload_config
+from ai_classification.cache_manager import CacheManager, CACHE_KEY_PREFIX, NEVER_EXPIRES, cache_id
+from ai_classification.memory_cache import MemoryCache
+from ai_classification.bloom_filter import BloomFilter
+
+
+def create_cache_entry(cache_key='test-key', expires_in_hours=1):
+    """Create a cache document as stored in MongoDB."""
+    now = datetime.utcnow()
+    return {
+        '_id': cache_id(cache_key),
+        'classification': {'primary_therapeutic_class': 'Antidiabetic Agents'},
+        'metadata': {'model': 'gpt-4o-mini', 'cache_key': cache_key},
+        'created_at': now - timedelta(hours=24),
+        'expires_at': now + timedelta(hours=expires_in_hours)
+    }
+
+
+class MockCollectionTestCase(unittest.TestCase):
+    """Base class for tests of a cache manager whose MongoDB collection is a mock."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache_manager = self.create_cache_manager()
+        self.collection = MagicMock()
+        patcher = patch.object(self.cache_manager.backend, '_get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_cache_manager(self):
+        """Create the cache manager under test."""
+        return CacheManager()
+
+
+class TestCacheKeys(unittest.TestCase):
+    """Test cases for cache key generation."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.cache_manager = CacheManager()
+        self.key_args = ('**Drug Name:** Mounjaro', 'gpt-4o-mini', 0.1, 'a' * 64)
+
+    def test_identical_requests_share_key(self):
+        """Test that identical prompts produce the same key."""
+        key = self.cache_manager.generate_cache_key(*self.key_args)
+
+        self.assertTrue(key.startswith(CACHE_KEY_PREFIX))
+        self.assertEqual(key, self.cache_manager.generate_cache_key(*self.key_args))
+
+    def test_request_changes_invalidate_key(self):
+        """Test that changing the prompt, model, temperature or system prompt changes the key."""
+        key = self.cache_manager.generate_cache_key(*self.key_args)
+        prompt, model, temperature, digest = self.key_args
+
+        self.assertNotEqual(key, self.cache_manager.generate_cache_key(prompt + ' ', model, temperature, digest))
+        self.assertNotEqual(key, self.cache_manager.generate_cache_key(prompt, 'gpt-4o', temperature, digest))
+        self.assertNotEqual(key, self.cache_manager.generate_cache_key(prompt, model, 0.2, digest))
+        self.assertNotEqual(key, self.cache_manager.generate_cache_key(prompt, model, temperature, 'b' * 64))
+
+
+class TestCacheIds(MockCollectionTestCase):
+    """Test cases for entries keyed by a binary digest _id."""
+
+    def test_cache_id_is_fixed_length(self):
+        """Test that keys of any length map to 16-byte ids."""
+        self.assertEqual(len(cache_id('a')), 16)
+        self.assertEqual(len(cache_id(CACHE_KEY_PREFIX + 'f' * 64)), 16)
+        self.assertNotEqual(cache_id('a'), cache_id('b'))
+
+    def test_store_keys_by_id(self):
+        """Test that entries are upserted by _id with the key in metadata."""
+        self.cache_manager.store_classification('test-key', {'primary_therapeutic_class': 'X'}, {'model': 'm'})
+
+        query, cache_doc = self.collection.replace_one.call_args[0]
+        self.assertEqual(query, {'_id': cache_id('test-key')})
+        self.assertNotIn('cache_key', cache_doc)
+        self.assertEqual(cache_doc['metadata'], {'model': 'm', 'cache_key': 'test-key'})
+
+    def test_lookup_by_id(self):
+        """Test that lookups are primary key queries."""
+        self.collection.find_one.return_value = None
+
+        self.cache_manager.get_cached_classification('test-key')
+
+        self.assertEqual(self.collection.find_one.call_args[0][0]['_id'], cache_id('test-key'))
+
+    def test_purge_deletes_legacy_entries_in_batches(self):
+        """Test that entries stored under legacy string keys are deleted, not re-keyed."""
+        self.collection.find.return_value.sort.return_value.limit.return_value = [{'_id': 'object-id'}]
+        self.collection.delete_many.return_value.deleted_count = 1
+
+        purged = self.cache_manager.purge_legacy_entries(batch_size=10, pause=0)
+
+        self.assertEqual(purged, 1)
+        self.assertEqual(self.collection.find.call_args_list[0][0][0], {'cache_key': {'$exists': True}})
+        self.collection.delete_many.assert_called_once_with(
+            {'cache_key': {'$exists': True}, '_id': {'$in': ['object-id']}}
+        )
+        self.collection.bulk_write.assert_not_called()
+        self.collection.insert_many.assert_not_called()
+
+    def test_legacy_ttl_index_dropped_after_backfill(self):
+        """Test that entries get a purge_at before the expires_at TTL index is dropped."""
+        backend = self.cache_manager.backend
+        backend.collection = self.collection
+        self.collection.update_many.return_value.modified_count = 1
+        self.collection.index_information.return_value = {
+            '_id_': {'key': [('_id', 1)]},
+            'expires_at_1': {'key': [('expires_at', 1)], 'expireAfterSeconds': 0}
+        }
+
+        backend._drop_legacy_indexes()
+
+        calls = [name for name, _, _ in self.collection.mock_calls]
+        self.assertLess(calls.index('update_many'), calls.index('drop_index'))
+        query, update = self.collection.update_many.call_args[0]
+        self.assertEqual(query['purge_at'], {'$exists': False})
+        self.assertEqual(update, [{'$set': {'purge_at': {
+            '$add': ['$expires_at', self.cache_manager.stale_grace * 1000]
+        }}}])
+        self.collection.drop_index.assert_called_once_with('expires_at_1')
+
+    def test_purge_backfills_purge_at(self):
+        """Test that the legacy purge gives entries left without purge_at one."""
+        self.collection.find.return_value.sort.return_value.limit.return_value = []
+
+        self.cache_manager.purge_legacy_entries(pause=0)
+
+        self.assertEqual(self.collection.update_many.call_args[0][0]['purge_at'], {'$exists': False})
+
+
+class TestMemoryCache(unittest.TestCase):
+    """Test cases for MemoryCache class."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted at capacity."""
+        cache = MemoryCache(max_entries=2)
+        cache.put('a', {'v': 1}, 10)
+        cache.put('b', {'v': 2}, 10)
+        cache.get('a')
+        cache.put('c', {'v': 3}, 10)
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_evicts_by_size(self):
+        """Test that the byte bound is enforced."""
+        cache = MemoryCache(max_entries=10, max_bytes=25)
+        cache.put('a', {'v': 1}, 10)
+        cache.put('b', {'v': 2}, 10)
+        cache.put('c', {'v': 3}, 10)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size_bytes, 20)
+
+    def test_expired_entries_are_not_served(self):
+        """Test that entries past their expiry are dropped."""
+        cache = MemoryCache()
+        cache.put('a', {'v': 1}, 10, expires_at=time.time() - 1)
+        self.assertIsNone(cache.get('a'))
+
+
+class TestCacheTiers(MockCollectionTestCase):
+    """Test cases for the in-process tier in front of MongoDB."""
+
+    def test_mongo_hit_populates_memory(self):
+        """Test that a second lookup is served from memory."""
+        self.collection.find_one.return_value = create_cache_entry()
+
+        first = self.cache_manager.get_cached_classification('test-key')
+        second = self.cache_manager.get_cached_classification('test-key')
+
+        self.assertEqual(first['cache_tier'], 'mongo')
+        self.assertEqual(second['cache_tier'], 'memory')
+        self.assertEqual(self.collection.find_one.call_count, 1)
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['mongo_hits'], 1)
+        self.assertEqual(metrics['memory_hits'], 1)
+        self.assertEqual(metrics['memory_misses'], 1)
+        self.assertEqual(metrics['cache_hits'], 2)
+
+    def test_store_populates_memory(self):
+        """Test that stored entries are served without a MongoDB lookup."""
+        self.cache_manager.store_classification('test-key', {'primary_therapeutic_class': 'X'}, {})
+
+        result = self.cache_manager.get_cached_classification('test-key')
+
+        self.assertEqual(result['classification']['primary_therapeutic_class'], 'X')
+        self.collection.find_one.assert_not_called()
+
+    def test_memory_entries_are_isolated_from_callers(self):
+        """Test that changing stored or returned results does not alter the cached entry."""
+        classification = {'primary_therapeutic_class': 'X', 'source_sections_used': ['indications']}
+        self.cache_manager.store_classification('test-key', classification, {})
+        classification['source_sections_used'].append('description')
+
+        result = self.cache_manager.get_cached_classification('test-key')
+        result['classification']['source_sections_used'].append('warnings')
+        result['metadata']['error'] = 'changed'
+
+        cached = self.cache_manager.get_many(['test-key'])['test-key']
+        self.assertEqual(cached['classification']['source_sections_used'], ['indications'])
+        self.assertNotIn('error', cached['metadata'])
+
+    def test_miss_counts_both_tiers(self):
+        """Test that a miss is recorded for each tier."""
+        self.collection.find_one.return_value = None
+
+        self.assertIsNone(self.cache_manager.get_cached_classification('missing'))
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['memory_misses'], 1)
+        self.assertEqual(metrics['mongo_misses'], 1)
+        self.assertEqual(metrics['cache_misses'], 1)
+
+    def test_concurrent_lookups_are_all_counted(self):
+        """Test that lookups from many threads lose no counter updates."""
+        self.cache_manager.store_classification('test-key', {'primary_therapeutic_class': 'X'}, {})
+
+        def look_up():
+            for _ in range(500):
+                self.cache_manager.get_cached_classification('test-key')
+
+        threads = [threading.Thread(target=look_up) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['total_requests'], 4000)
+        self.assertEqual(metrics['memory_hits'], 4000)
+        self.assertEqual(metrics['cache_hits'], 4000)
+
+
+class TestStaleEntries(MockCollectionTestCase):
+    """Test cases for serving expired entries within the grace window."""
+
+    def test_expired_entry_served_as_stale(self):
+        """Test that an expired entry is returned flagged and kept out of memory."""
+        self.collection.find_one.return_value = create_cache_entry(expires_in_hours=-1)
+
+        result = self.cache_manager.get_cached_classification('test-key')
+
+        self.assertTrue(result['stale'])
+        self.assertEqual(len(self.cache_manager.memory_cache), 0)
+        self.assertEqual(self.cache_manager.get_metrics()['stale_hits'], 1)
+
+        query = self.collection.find_one.call_args[0][0]
+        self.assertLess(query['expires_at']['$gt'], datetime.utcnow() - timedelta(hours=1))
+
+    def test_fresh_entry_not_stale(self):
+        """Test that unexpired entries are not flagged."""
+        self.collection.find_one.return_value = create_cache_entry()
+        self.assertFalse(self.cache_manager.get_cached_classification('test-key')['stale'])
+
+    def test_store_sets_purge_time_after_grace(self):
+        """Test that entries are purged only after the grace window."""
+        self.cache_manager.store_classification('test-key', {'primary_therapeutic_class': 'X'}, {})
+
+        cache_doc = self.collection.replace_one.call_args[0][1]
+        self.assertEqual(cache_doc['purge_at'] - cache_doc['expires_at'],
+                         timedelta(seconds=self.cache_manager.stale_grace))
+
+
+class TestNegativeEntries(MockCollectionTestCase):
+    """Test cases for negative caching of failed requests."""
+
+    def create_negative_entry(self, expires_in_hours=1):
+        """Create a negative cache document as stored in MongoDB."""
+        now = datetime.utcnow()
+        return {
+            '_id': cache_id('test-key'),
+            'failure': {'reason': 'Invalid JSON response', 'attempts': 3},
+            'metadata': {'cache_key': 'test-key'},
+            'created_at': now,
+            'expires_at': now + timedelta(hours=expires_in_hours)
+        }
+
+    def test_stored_failure_served_from_memory(self):
+        """Test that a stored failure is returned as a negative hit."""
+        self.cache_manager.store_failure('test-key', 'Invalid JSON response', 3)
+
+        cache_doc = self.collection.replace_one.call_args[0][1]
+        self.assertEqual(cache_doc['purge_at'], cache_doc['expires_at'])
+
+        result = self.cache_manager.get_cached_classification('test-key')
+
+        self.assertTrue(result['negative'])
+        self.assertEqual(result['failure']['attempts'], 3)
+        self.collection.find_one.assert_not_called()
+
+    def test_negative_hits_reported_separately(self):
+        """Test that negative hits are counted apart from hits and misses."""
+        self.collection.find_one.return_value = self.create_negative_entry()
+
+        result = self.cache_manager.get_cached_classification('test-key')
+
+        self.assertTrue(result['negative'])
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['negative_hits'], 1)
+        self.assertEqual(metrics['cache_hits'], 0)
+        self.assertEqual(metrics['cache_misses'], 0)
+
+    def test_expired_negative_entry_is_a_miss(self):
+        """Test that failures are not served stale."""
+        self.collection.find_one.return_value = self.create_negative_entry(expires_in_hours=-1)
+
+        self.assertIsNone(self.cache_manager.get_cached_classification('test-key'))
+        self.assertEqual(self.cache_manager.get_metrics()['cache_misses'], 1)
+
+
+class TestLRUEviction(MockCollectionTestCase):
+    """Test cases for the access-based eviction policy."""
+
+    def create_cache_manager(self):
+        """Create a cache manager with the LRU policy."""
+        with patch.dict('os.environ', {'AI_CACHE_EVICTION_POLICY': 'lru'}):
+            reload_config()
+            cache_manager = CacheManager()
+        reload_config()
+        cache_manager.touch_batch_size = 2
+        return cache_manager
+
+    def test_entries_never_expire(self):
+        """Test that LRU entries have no purge time and track access."""
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {})
+
+        cache_doc = self.collection.replace_one.call_args[0][1]
+        self.assertEqual(cache_doc['expires_at'], NEVER_EXPIRES)
+        self.assertNotIn('purge_at', cache_doc)
+        self.assertEqual(cache_doc['last_accessed_at'], cache_doc['created_at'])
+
+    def test_accesses_written_in_batches(self):
+        """Test that hits are recorded with one update per batch."""
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {})
+        self.cache_manager.store_classification('b', {'primary_therapeutic_class': 'Y'}, {})
+
+        self.cache_manager.get_cached_classification('a')
+        self.collection.update_many.assert_not_called()
+
+        self.cache_manager.get_cached_classification('b')
+        self.collection.update_many.assert_called_once()
+        self.assertEqual(set(self.collection.update_many.call_args[0][0]['_id']['$in']), {cache_id('a'), cache_id('b')})
+
+    def test_evicts_least_recently_used_beyond_cap(self):
+        """Test that only the excess entries are deleted, oldest access first."""
+        self.collection.database.command.return_value = {'count': 5, 'size': 500}
+        self.collection.find.return_value.sort.return_value.limit.return_value = [
+            {'_id': 1, 'metadata': {'cache_key': 'a'}}, {'_id': 2, 'metadata': {'cache_key': 'b'}}
+        ]
+        self.collection.delete_many.return_value.deleted_count = 2
+
+        evicted = self.cache_manager.evict_lru(max_entries=3, max_bytes=0)
+
+        self.assertEqual(evicted, 2)
+        self.collection.find.return_value.sort.assert_any_call('last_accessed_at', 1)
+        self.collection.find.return_value.sort.return_value.limit.assert_any_call(2)
+        self.collection.delete_many.assert_called_once_with({'_id': {'$in': [1, 2]}})
+
+    def test_nothing_evicted_within_caps(self):
+        """Test that no entries are deleted when under the caps."""
+        self.collection.database.command.return_value = {'count': 5, 'size': 500}
+
+        self.assertEqual(self.cache_manager.evict_lru(max_entries=10, max_bytes=1000), 0)
+        self.collection.delete_many.assert_not_called()
+
+
+class TestBatchOperations(MockCollectionTestCase):
+    """Test cases for batched cache lookups and stores."""
+
+    def test_get_many_uses_one_query(self):
+        """Test that a batch lookup is a single $in query with per-key metrics."""
+        self.collection.find.return_value = [create_cache_entry('a'), create_cache_entry('c')]
+
+        results = self.cache_manager.get_many(['a', 'b', 'c', 'a'])
+
+        self.assertEqual(set(results), {'a', 'c'})
+        self.collection.find.assert_called_once()
+        query = self.collection.find.call_args[0][0]
+        self.assertEqual(query['_id'], {'$in': [cache_id('a'), cache_id('b'), cache_id('c')]})
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['cache_hits'], 2)
+        self.assertEqual(metrics['cache_misses'], 1)
+        self.assertEqual(metrics['total_requests'], 3)
+
+    def test_get_many_skips_query_when_all_in_memory(self):
+        """Test that keys held in memory never reach MongoDB."""
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {})
+
+        results = self.cache_manager.get_many(['a'])
+
+        self.assertEqual(results['a']['cache_tier'], 'memory')
+        self.collection.find.assert_not_called()
+
+    def test_store_many_uses_unordered_bulk_write(self):
+        """Test that a batch store is one unordered bulk write of upserts."""
+        stored = self.cache_manager.store_many([
+            ('a', {'primary_therapeutic_class': 'X'}, {}),
+            ('b', {'primary_therapeutic_class': 'Y'}, {})
+        ])
+
+        self.assertEqual(stored, 2)
+        self.collection.bulk_write.assert_called_once()
+        operations = self.collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 2)
+        self.assertEqual(self.collection.bulk_write.call_args[1], {'ordered': False})
+        self.assertEqual(self.cache_manager.get_metrics()['cache_stores'], 2)
+
+
+class TestBloomFilterLookups(MockCollectionTestCase):
+    """Test cases for skipping MongoDB on keys the Bloom filter rejects."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.cache_manager.memory_cache = MemoryCache(max_entries=0)
+        self.cache_manager.bloom_filter = BloomFilter(100)
+        self.cache_manager.bloom_filter.add(cache_id('known'))
+
+    def test_rejected_key_skips_mongo(self):
+        """Test that a key absent from the filter is a miss without a query."""
+        self.assertIsNone(self.cache_manager.get_cached_classification('unknown'))
+
+        self.collection.find_one.assert_not_called()
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['bloom_rejections'], 1)
+        self.assertEqual(metrics['cache_misses'], 1)
+
+    def test_possible_key_queries_mongo(self):
+        """Test that a key the filter may hold is looked up."""
+        self.collection.find_one.return_value = create_cache_entry('known')
+
+        result = self.cache_manager.get_cached_classification('known')
+
+        self.assertEqual(result['cache_tier'], 'mongo')
+        self.collection.find_one.assert_called_once()
+
+    def test_get_many_queries_only_possible_keys(self):
+        """Test that rejected keys are left out of the batch query."""
+        self.collection.find.return_value = [create_cache_entry('known')]
+
+        results = self.cache_manager.get_many(['known', 'unknown'])
+
+        self.assertEqual(set(results), {'known'})
+        query = self.collection.find.call_args[0][0]
+        self.assertEqual(query['_id'], {'$in': [cache_id('known')]})
+        self.assertEqual(self.cache_manager.get_metrics()['cache_misses'], 1)
+
+    def test_get_many_skips_query_when_all_rejected(self):
+        """Test that a batch of rejected keys never reaches MongoDB."""
+        self.assertEqual(self.cache_manager.get_many(['a', 'b']), {})
+        self.collection.find.assert_not_called()
+
+    def test_stores_add_keys(self):
+        """Test that stored and failed keys are added to the filter."""
+        self.cache_manager.store_classification('stored', {'primary_therapeutic_class': 'X'}, {})
+        self.cache_manager.store_many([('batched', {'primary_therapeutic_class': 'Y'}, {})])
+        self.cache_manager.store_failure('failed', 'Unparseable response', 3)
+
+        for cache_key in ('stored', 'batched', 'failed'):
+            self.assertIn(cache_id(cache_key), self.cache_manager.bloom_filter)
+
+    def test_saturated_filter_rejects_nothing(self):
+        """Test that an over-capacity filter falls back to querying MongoDB."""
+        self.cache_manager.bloom_filter = BloomFilter(1)
+        self.cache_manager.bloom_filter.update(['x', 'y'])
+        self.collection.find_one.return_value = None
+
+        self.cache_manager.get_cached_classification('unknown')
+
+        self.collection.find_one.assert_called_once()
+
+    def test_load_streams_projected_keys(self):
+        """Test that the filter is built from entry _ids only."""
+        self.collection.estimated_document_count.return_value = 2
+        self.collection.find.return_value.batch_size.return_value = [{'_id': cache_id('a')}, {'_id': cache_id('b')}]
+
+        bloom_filter = self.cache_manager.load_bloom_filter()
+
+        self.assertEqual(self.collection.find.call_args[0], ({}, {'_id': 1}))
+        self.assertIn(cache_id('a'), bloom_filter)
+        self.assertIn(cache_id('b'), bloom_filter)
+
+    def test_refresh_adds_keys_stored_elsewhere(self):
+        """Test that keys other processes stored since the last read are added."""
+        built_at = datetime.utcnow() - timedelta(hours=1)
+        self.cache_manager._bloom_built_at = built_at
+        self.collection.find.return_value.batch_size.return_value = [{'_id': cache_id('elsewhere')}]
+
+        self.assertEqual(self.cache_manager.refresh_bloom_filter(), 1)
+
+        query = self.collection.find.call_args[0][0]
+        self.assertLess(query['created_at']['$gte'], built_at)
+        self.assertIn(cache_id('elsewhere'), self.cache_manager.bloom_filter)
+        self.assertGreater(self.cache_manager._bloom_built_at, built_at)
+
+    def test_repeated_refreshes_do_not_saturate(self):
+        """Test that keys read again by each refresh's overlap are counted once."""
+        self.cache_manager.bloom_filter = BloomFilter(20)
+        self.cache_manager._bloom_built_at = datetime.utcnow()
+        entry_ids = [cache_id(f'key-{i}') for i in range(15)]
+        self.cache_manager._bloom_add([f'key-{i}' for i in range(15)])
+        self.collection.find.return_value.batch_size.side_effect = (
+            lambda size: [{'_id': entry_id} for entry_id in entry_ids]
+        )
+
+        for _ in range(10):
+            self.cache_manager.refresh_bloom_filter()
+
+        self.assertLessEqual(len(self.cache_manager.bloom_filter), 15)
+        self.assertFalse(self.cache_manager.bloom_filter.saturated)
+
+    def test_imported_entries_are_marked_as_written_now(self):
+        """Test that snapshot entries get a current created_at, so other refreshes see them."""
+        path = os.path.join(tempfile.mkdtemp(), 'cache.jsonl.gz')
+        self.addCleanup(os.remove, path)
+        self.collection.find.return_value.batch_size.return_value = [create_cache_entry('a')]
+        self.cache_manager.export_snapshot(path)
+        self.collection.insert_many.return_value.inserted_ids = [cache_id('a')]
+        before = datetime.utcnow()
+
+        self.cache_manager.import_snapshot(path)
+
+        imported = self.collection.insert_many.call_args[0][0][0]
+        self.assertGreaterEqual(imported['created_at'], before - timedelta(seconds=1))
+
+    def test_saved_filter_is_topped_up(self):
+        """Test that a saved filter is loaded and only newer keys are read."""
+        path = os.path.join(tempfile.mkdtemp(), 'cache_keys.bloom')
+        self.addCleanup(os.remove, path)
+        self.cache_manager._bloom_built_at = datetime.utcnow()
+        self.assertTrue(self.cache_manager.save_bloom_filter(path))
+
+        self.cache_manager.bloom_path = path
+        self.collection.find.return_value.batch_size.return_value = [{'_id': cache_id('newer')}]
+        bloom_filter = self.cache_manager.load_bloom_filter()
+
+        query = self.collection.find.call_args[0][0]
+        self.assertIn('$gte', query['created_at'])
+        self.assertIn(cache_id('known'), bloom_filter)
+        self.assertIn(cache_id('newer'), bloom_filter)
+        self.collection.estimated_document_count.assert_not_called()
+
+
+class TestCacheWarming(MockCollectionTestCase):
+    """Test cases for parallel cache warming."""
+
+    def test_warm_cache_classifies_each_missing_request_once(self):
+        """Test deduplication, batch lookup and a single store per new result."""
+        self.collection.find.return_value = [create_cache_entry('a')]
+        classified = []
+
+        def classify(drug):
+            classified.append(drug['key'])
+            if drug['key'] == 'c':
+                raise ValueError('service unavailable')
+            return {'classification': {'primary_therapeutic_class': 'X'}, 'metadata': {}}
+
+        drugs = [{'key': 'a'}, {'key': 'b'}, {'key': 'b'}, {'key': 'c'}]
+        results = self.cache_manager.warm_cache(drugs, classify, lambda drug: drug['key'], max_workers=2)
+
+        self.assertEqual(sorted(classified), ['b', 'c'])
+        self.collection.find.assert_called_once()
+        self.collection.bulk_write.assert_called_once()
+        self.assertEqual(len(self.collection.bulk_write.call_args[0][0]), 1)
+        self.collection.replace_one.assert_not_called()
+
+        self.assertEqual(results['unique_keys'], 3)
+        self.assertEqual(results['duplicates'], 1)
+        self.assertEqual(results['already_cached'], 1)
+        self.assertEqual(results['newly_cached'], 1)
+        self.assertEqual(results['failed'], 1)
+
+    def test_warm_cache_does_not_store_failed_results(self):
+        """Test that results carrying an error are not cached."""
+        self.collection.find.return_value = []
+
+        results = self.cache_manager.warm_cache(
+            [{'key': 'a'}],
+            lambda drug: {'classification': {}, 'metadata': {'error': 'timeout'}},
+            lambda drug: drug['key']
+        )
+
+        self.collection.bulk_write.assert_not_called()
+        self.assertEqual(results['failed'], 1)
+
+
+class TestBatchedDeletes(MockCollectionTestCase):
+    """Test cases for throttled, _id-ordered bulk deletes."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.batches = [[{'_id': 1}, {'_id': 2}], [{'_id': 3}, {'_id': 4}], [{'_id': 5}]]
+        self.collection.find.return_value.sort.return_value.limit.side_effect = self.batches
+        self.collection.delete_many.side_effect = [
+            MagicMock(deleted_count=len(batch)) for batch in self.batches
+        ]
+
+    @patch('ai_classification.cache_manager.time.sleep')
+    def test_deletes_in_id_order_with_pauses(self, mock_sleep):
+        """Test that each batch resumes after the last _id and pauses before the next."""
+        deleted = self.cache_manager.delete_in_batches('expires_at', 1, batch_size=2, pause=0.5)
+
+        self.assertEqual(deleted, 5)
+        queries = [call[0][0] for call in self.collection.find.call_args_list]
+        self.assertEqual(queries[0], {'expires_at': {'$lt': 1}})
+        self.assertEqual(queries[1], {'expires_at': {'$lt': 1}, '$expr': {'$gt': ['$_id', 2]}})
+        self.assertEqual(queries[2], {'expires_at': {'$lt': 1}, '$expr': {'$gt': ['$_id', 4]}})
+        self.collection.find.return_value.sort.assert_called_with('_id', 1)
+        self.collection.delete_many.assert_any_call({'expires_at': {'$lt': 1}, '_id': {'$in': [3, 4]}})
+        self.assertEqual(mock_sleep.call_count, 2)
+        mock_sleep.assert_called_with(0.5)
+
+    def test_resumes_across_id_types(self):
+        """Test that a batch ending on a binary _id still reaches legacy ObjectId _ids."""
+        self.collection.find.return_value.sort.return_value.limit.side_effect = [
+            [{'_id': cache_id('a')}, {'_id': cache_id('b')}], [{'_id': ObjectId()}]
+        ]
+        self.collection.delete_many.side_effect = [MagicMock(deleted_count=2), MagicMock(deleted_count=1)]
+
+        deleted = self.cache_manager.delete_in_batches(batch_size=2, pause=0)
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(self.collection.find.call_args_list[1][0][0],
+                         {'$expr': {'$gt': ['$_id', cache_id('b')]}})
+
+    @patch('ai_classification.cache_manager.time.sleep')
+    def test_cleanup_uses_batches(self, mock_sleep):
+        """Test that expired entry cleanup deletes batch by batch."""
+        cleaned = self.cache_manager.cleanup_expired_entries(batch_size=2, pause=0)
+
+        self.assertEqual(cleaned, 5)
+        self.assertEqual(self.collection.delete_many.call_count, 3)
+        mock_sleep.assert_not_called()
+        self.assertEqual(self.cache_manager.get_metrics()['expired_entries_cleaned'], 5)
+
+
+class TestSnapshots(MockCollectionTestCase):
+    """Test cases for exporting and importing cache snapshots."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'cache.jsonl.gz')
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+        self.entries = [create_cache_entry('a'), create_cache_entry('b')]
+        self.collection.find.return_value.batch_size.return_value = self.entries
+
+    def test_round_trip(self):
+        """Test that exported entries are imported with their content unchanged."""
+        self.assertEqual(self.cache_manager.export_snapshot(self.path), 2)
+        query = self.collection.find.call_args[0][0]
+        self.assertIn('$gt', query['expires_at'])
+        self.assertEqual(query['failure'], {'$exists': False})
+
+        self.collection.insert_many.return_value.inserted_ids = [1, 2]
+        results = self.cache_manager.import_snapshot(self.path)
+
+        self.assertEqual(results, {'entries': 2, 'imported': 2, 'existing': 0, 'expired': 0})
+        imported = self.collection.insert_many.call_args[0][0]
+        self.assertEqual(self.collection.insert_many.call_args[1], {'ordered': False})
+        for original, restored in zip(self.entries, imported):
+            self.assertEqual(restored['_id'], original['_id'])
+            self.assertEqual(restored['metadata'], original['metadata'])
+            self.assertEqual(restored['classification'], original['classification'])
+
+    def test_imported_entries_follow_current_policy(self):
+        """Test that an LRU entry imported into a TTL cache gets TTL expiry fields."""
+        self.entries[:] = [create_cache_entry('a')]
+        self.entries[0]['expires_at'] = NEVER_EXPIRES
+        self.entries[0]['last_accessed_at'] = datetime.utcnow()
+        self.cache_manager.export_snapshot(self.path)
+        self.collection.insert_many.return_value.inserted_ids = [1]
+        before = datetime.utcnow()
+
+        self.cache_manager.import_snapshot(self.path)
+
+        imported = self.collection.insert_many.call_args[0][0][0]
+        expected_expiry = before + timedelta(seconds=self.cache_manager.ttl)
+        self.assertAlmostEqual(imported['expires_at'], expected_expiry, delta=timedelta(seconds=5))
+        self.assertGreaterEqual(imported['purge_at'], imported['expires_at'])
+        self.assertNotIn('last_accessed_at', imported)
+
+    def test_existing_keys_are_skipped(self):
+        """Test that duplicate keys are counted as already present."""
+        self.cache_manager.export_snapshot(self.path)
+        self.collection.insert_many.side_effect = BulkWriteError({
+            'nInserted': 1,
+            'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}]
+        })
+
+        results = self.cache_manager.import_snapshot(self.path)
+
+        self.assertEqual(results['imported'], 1)
+        self.assertEqual(results['existing'], 1)
+
+    def test_failed_inserts_are_not_added_to_bloom_filter(self):
+        """Test that only entries actually inserted are added to the Bloom filter."""
+        self.cache_manager.export_snapshot(self.path)
+        self.cache_manager.bloom_filter = BloomFilter(100)
+        self.collection.insert_many.side_effect = BulkWriteError({
+            'nInserted': 1,
+            'writeErrors': [{'index': 1, 'code': 121, 'errmsg': 'document failed validation'}]
+        })
+
+        results = self.cache_manager.import_snapshot(self.path)
+
+        self.assertEqual(results['imported'], 1)
+        self.assertIn(cache_id('a'), self.cache_manager.bloom_filter)
+        self.assertNotIn(cache_id('b'), self.cache_manager.bloom_filter)
+
+    def test_failed_export_removes_temporary_file(self):
+        """Test that an export interrupted by an error leaves no partial file behind."""
+        self.collection.find.return_value.batch_size.side_effect = PyMongoError('connection lost')
+
+        with self.assertRaises(PyMongoError):
+            self.cache_manager.export_snapshot(self.path)
+
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_expired_entries_are_skipped(self):
+        """Test that entries that expired since the export are not imported."""
+        self.entries[0]['purge_at'] = datetime.utcnow() - timedelta(seconds=1)
+        self.cache_manager.export_snapshot(self.path)
+        self.collection.insert_many.return_value.inserted_ids = [1]
+
+        results = self.cache_manager.import_snapshot(self.path)
+
+        self.assertEqual(results['expired'], 1)
+        self.assertEqual(len(self.collection.insert_many.call_args[0][0]), 1)
+
+    def test_corrupt_snapshot_is_rejected(self):
+        """Test that a snapshot failing its checksum is not imported."""
+        self.cache_manager.export_snapshot(self.path)
+        with gzip.open(self.path, 'rb') as f:
+            lines = f.readlines()
+        lines[1] = lines[1].replace(b'Antidiabetic', b'Antihypertensive')
+        with gzip.open(self.path, 'wb') as f:
+            f.writelines(lines)
+
+        with self.assertRaises(ValueError):
+            self.cache_manager.import_snapshot(self.path)
+        self.collection.insert_many.assert_not_called()
+
+
+class TestCollectionStats(MockCollectionTestCase):
+    """Test cases for cached collection-level statistics."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.collection.database.command.return_value = {
+            'count': 10, 'size': 5000, 'storageSize': 4096, 'totalIndexSize': 1024
+        }
+        self.created_at = datetime.utcnow() - timedelta(hours=2)
+        self.collection.find.return_value.sort.return_value.limit.return_value = [
+            {'created_at': self.created_at}
+        ]
+
+    def test_get_metrics_makes_no_database_calls(self):
+        """Test that polling metrics does not query MongoDB."""
+        self.cache_manager.get_metrics()
+        self.cache_manager.get_metrics()
+
+        self.collection.database.command.assert_not_called()
+        self.collection.estimated_document_count.assert_not_called()
+
+    def test_refresh_on_demand(self):
+        """Test that a requested refresh runs collStats once and is then served from memory."""
+        metrics = self.cache_manager.get_metrics(refresh=True)
+
+        self.assertEqual(metrics['total_cached_entries'], 10)
+        self.assertEqual(metrics['cache_storage_size_bytes'], 4096)
+        self.assertEqual(metrics['oldest_entry'], self.created_at)
+        self.assertIsNotNone(metrics['stats_refreshed_at'])
+        self.collection.find.return_value.sort.assert_any_call('created_at', 1)
+        self.collection.find.return_value.sort.assert_any_call('created_at', -1)
+
+        self.assertEqual(self.cache_manager.get_metrics()['total_cached_entries'], 10)
+        self.collection.database.command.assert_called_once()
+
+    def test_counters_follow_writes(self):
+        """Test that stores and clears update the counters between refreshes."""
+        self.cache_manager.refresh_collection_stats()
+        self.collection.replace_one.return_value.upserted_id = 'new-id'
+
+        self.cache_manager.store_classification('a', {'primary_therapeutic_class': 'X'}, {})
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['total_cached_entries'], 11)
+        self.assertGreater(metrics['newest_entry'], self.created_at)
+
+        self.collection.find.return_value.sort.return_value.limit.return_value = [{'_id': i} for i in range(11)]
+        self.collection.delete_many.return_value.deleted_count = 11
+        self.cache_manager.clear_cache(batch_size=100)
+
+        metrics = self.cache_manager.get_metrics()
+        self.assertEqual(metrics['total_cached_entries'], 0)
+        self.assertIsNone(metrics['oldest_entry'])
+
+    def test_statistics_scan_only_when_detailed(self):
+        """Test that the aggregation runs only for detailed statistics."""
+        stats = self.cache_manager.get_cache_statistics()
+
+        self.assertEqual(stats['total_entries'], 10)
+        self.collection.aggregate.assert_not_called()
+
+        self.collection.aggregate.return_value = [{'avg_age_hours': 1.5}]
+        stats = self.cache_manager.get_cache_statistics(detailed=True)
+
+        self.assertEqual(stats['avg_age_hours'], 1.5)
+        self.collection.aggregate.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
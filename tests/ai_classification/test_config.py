@@ -6,15 +6,20 @@ import os
 import unittest
 from unittest.mock import patch
 
-from ai_classification.config import get_config, is_ai_enabled
+from ai_classification.config import AIConfig, get_config, is_ai_enabled, reload_config
 
 
 class TestConfig(unittest.TestCase):
     """Test cases for AI classification configuration."""
     
+    def setUp(self):
+        """Set up test fixtures."""
+        # Tests change the environment; leave the configuration as it was
+        self.addCleanup(reload_config)
+    
     def test_default_config(self):
         """Test default configuration values."""
-        config = get_config()
+        config = reload_config()
         
         # Check default values
         self.assertEqual(config['AI_MODEL'], 'gpt-4o-mini')
@@ -30,7 +35,7 @@ class TestConfig(unittest.TestCase):
     })
     def test_environment_override(self):
         """Test environment variable overrides."""
-        config = get_config()
+        config = reload_config()
         
         # Check overridden values
         self.assertEqual(config['OPENPIPE_API_KEY'], 'test-api-key')
@@ -38,9 +43,29 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(config['AI_MAX_TOKENS'], 1000)
         self.assertEqual(config['AI_TEMPERATURE'], 0.5)
     
+    @patch.dict(os.environ, {
+        'AI_CACHE_STALE_GRACE': '0',
+        'AI_JOB_MAX_ATTEMPTS': '1',
+        'AI_CACHE_DELETE_PAUSE': '0',
+        'ENABLE_PROMPT_COMPRESSION': '0',
+        'ENABLE_CACHE_BLOOM_FILTER': '1'
+    })
+    def test_zero_and_one_keep_their_type(self):
+        """Test that "0" and "1" are numbers for numeric keys and booleans for boolean keys."""
+        config = reload_config()
+        
+        self.assertIs(type(config['AI_CACHE_STALE_GRACE']), int)
+        self.assertEqual(config['AI_CACHE_STALE_GRACE'], 0)
+        self.assertIs(type(config['AI_JOB_MAX_ATTEMPTS']), int)
+        self.assertEqual(config['AI_JOB_MAX_ATTEMPTS'], 1)
+        self.assertIs(type(config['AI_CACHE_DELETE_PAUSE']), float)
+        self.assertIs(config['ENABLE_PROMPT_COMPRESSION'], False)
+        self.assertIs(config['ENABLE_CACHE_BLOOM_FILTER'], True)
+    
     @patch.dict(os.environ, {'ENABLE_AI_CLASSIFICATION': 'false'})
     def test_ai_disabled(self):
         """Test AI classification disabled."""
+        reload_config()
         self.assertFalse(is_ai_enabled())
     
     @patch.dict(os.environ, {
@@ -49,6 +74,7 @@ class TestConfig(unittest.TestCase):
     })
     def test_ai_enabled(self):
         """Test AI classification enabled."""
+        reload_config()
         self.assertTrue(is_ai_enabled())
     
     @patch.dict(os.environ, {'ENABLE_AI_CLASSIFICATION': 'true'})
@@ -56,8 +82,32 @@ class TestConfig(unittest.TestCase):
         """Test AI classification disabled without API key."""
         # Clear API key
         with patch.dict(os.environ, {'OPENPIPE_API_KEY': ''}):
+            reload_config()
             self.assertFalse(is_ai_enabled())
+    
+    def test_config_loaded_once(self):
+        """Test that environment changes need an explicit reload."""
+        config = reload_config()
+        
+        with patch.dict(os.environ, {'AI_MODEL': 'custom-model'}):
+            self.assertIs(get_config(), config)
+            self.assertEqual(get_config().ai_model, config['AI_MODEL'])
+            self.assertEqual(reload_config().ai_model, 'custom-model')
+    
+    def test_config_is_immutable(self):
+        """Test attribute access and that values cannot be changed."""
+        config = AIConfig({'AI_MODEL': 'gpt-4o-mini', 'ENABLE_AI_CLASSIFICATION': False})
+        
+        self.assertEqual(config.ai_model, 'gpt-4o-mini')
+        self.assertFalse(config.ai_enabled)
+        self.assertEqual(config.get('AI_MAX_TOKENS', 2000), 2000)
+        with self.assertRaises(AttributeError):
+            config.ai_model = 'custom-model'
+        with self.assertRaises(AttributeError):
+            config.missing_key
+        with self.assertRaises(TypeError):
+            config['AI_MODEL'] = 'custom-model'
 
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Tests for AI drug classifier.
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+from ai_classification.drug_classifier import DrugClassifier
+from ai_classification.openai_client import CircuitOpenError, ClassificationFailedError
+
+
+def create_drug(drug_name, indication):
+    """Create a minimal drug document."""
+    return {
+        'drugName': drug_name,
+        'setId': f'{drug_name}-set-id',
+        'label': {
+            'genericName': drug_name.lower(),
+            'indicationsAndUsage': indication
+        }
+    }
+
+
+class TestDrugClassifier(unittest.TestCase):
+    """Test cases for DrugClassifier class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.classifier = DrugClassifier()
+        self.classifier.openai_client = Mock()
+        self.classifier.openai_client.get_classification.return_value = (
+            {'primary_therapeutic_class': 'Antidiabetic Agents', 'confidence_level': 'High'},
+            {'model': 'gpt-4o-mini', 'tokens_used': 100, 'attempts': 1}
+        )
+        self.classifier.cache_manager = Mock()
+        self.classifier.cache_manager.generate_cache_key.side_effect = (
+            lambda user_prompt, *args: f'key:{hash(user_prompt)}'
+        )
+
+        patcher = patch('ai_classification.drug_classifier.is_ai_enabled', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_classify_drugs_resolves_batch_in_one_lookup(self):
+        """Test that only cache misses reach the AI service, once per request."""
+        cached_drug = create_drug('Cached', 'Indicated for migraine.')
+        new_drug = create_drug('New', 'Indicated for type 2 diabetes.')
+        cached_key = self.classifier.generate_cache_key(cached_drug)
+        self.classifier.cache_manager.get_many.return_value = {
+            cached_key: {'classification': {'primary_therapeutic_class': 'Antimigraine Agents'},
+                         'metadata': {}, 'cached': True}
+        }
+
+        results = self.classifier.classify_drugs([cached_drug, new_drug, new_drug])
+
+        self.classifier.cache_manager.get_many.assert_called_once()
+        self.assertEqual(self.classifier.openai_client.get_classification.call_count, 1)
+        self.assertTrue(results[0]['cached'])
+        self.assertEqual(results[1]['classification']['primary_therapeutic_class'], 'Antidiabetic Agents')
+        self.assertEqual(results[2], results[1])
+        self.assertIsNot(results[2], results[1])
+
+    def test_classify_for_cache_leaves_storing_to_the_warmer(self):
+        """Test that classifications made for cache warming are not stored twice."""
+        result = self.classifier._classify_for_cache(create_drug('New', 'Indicated for type 2 diabetes.'))
+
+        self.assertEqual(result['classification']['primary_therapeutic_class'], 'Antidiabetic Agents')
+        self.classifier.cache_manager.store_classification.assert_not_called()
+
+    def test_stale_hit_refreshed_in_background(self):
+        """Test that a stale hit is returned immediately and reclassified once."""
+        stale_result = {'classification': {'primary_therapeutic_class': 'Antimigraine Agents'},
+                        'metadata': {}, 'cached': True, 'stale': True}
+        self.classifier.cache_manager.get_cached_classification.return_value = stale_result
+        drug = create_drug('New', 'Indicated for type 2 diabetes.')
+
+        self.assertIs(self.classifier.classify_drug(drug), stale_result)
+        self.classifier.wait_for_refreshes()
+
+        self.classifier.openai_client.get_classification.assert_called_once()
+        self.classifier.cache_manager.store_classification.assert_called_once()
+
+    def test_stale_hit_served_when_refresh_cannot_be_queued(self):
+        """Test that a shut-down refresh executor neither fails the hit nor blocks later refreshes."""
+        stale_result = {'classification': {'primary_therapeutic_class': 'Antimigraine Agents'},
+                        'metadata': {}, 'cached': True, 'stale': True}
+        self.classifier.cache_manager.get_cached_classification.return_value = stale_result
+        self.classifier._refresh_executor = ThreadPoolExecutor(max_workers=1)
+        self.classifier._refresh_executor.shutdown()
+
+        self.assertIs(self.classifier.classify_drug(create_drug('New', 'Indicated for type 2 diabetes.')),
+                      stale_result)
+        self.assertEqual(self.classifier._refreshing, set())
+
+    def test_concurrent_misses_share_one_api_call(self):
+        """Test that concurrent classifications of the same request are coalesced."""
+        self.classifier.cache_manager.get_cached_classification.return_value = None
+        get_classification = self.classifier.openai_client.get_classification
+
+        def slow_classification(*args, **kwargs):
+            time.sleep(0.1)
+            return get_classification.return_value
+
+        get_classification.side_effect = slow_classification
+        drug = create_drug('New', 'Indicated for type 2 diabetes.')
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(self.classifier.classify_drug(drug)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(get_classification.call_count, 1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len({id(result) for result in results}), 3)
+        self.assertEqual(self.classifier.get_stats()['coalesced_requests'], 2)
+
+    def test_cacheable_failure_stored_as_negative_entry(self):
+        """Test that a failure that would repeat is recorded."""
+        self.classifier.cache_manager.get_cached_classification.return_value = None
+        self.classifier.openai_client.get_classification.side_effect = ClassificationFailedError(
+            'Invalid JSON response', attempts=3, cacheable=True
+        )
+
+        result = self.classifier.classify_drug(create_drug('New', 'Indicated for type 2 diabetes.'))
+
+        self.assertEqual(result['metadata']['error'], 'Invalid JSON response')
+        self.classifier.cache_manager.store_failure.assert_called_once()
+        self.assertEqual(self.classifier.cache_manager.store_failure.call_args[0][1:], ('Invalid JSON response', 3))
+
+    def test_transient_failure_not_stored(self):
+        """Test that transient service failures are retried next time."""
+        self.classifier.cache_manager.get_cached_classification.return_value = None
+        self.classifier.openai_client.get_classification.side_effect = ClassificationFailedError(
+            'Connection reset', attempts=3, cacheable=False
+        )
+
+        self.classifier.classify_drug(create_drug('New', 'Indicated for type 2 diabetes.'))
+
+        self.classifier.cache_manager.store_failure.assert_not_called()
+
+    def test_circuit_open_failure_is_marked(self):
+        """Test that requests refused by the circuit breaker are flagged as such."""
+        self.classifier.cache_manager.get_cached_classification.return_value = None
+        self.classifier.openai_client.get_classification.side_effect = CircuitOpenError('circuit is open')
+
+        result = self.classifier.classify_drug(create_drug('New', 'Indicated for type 2 diabetes.'))
+
+        self.assertTrue(result['metadata']['circuit_open'])
+        self.classifier.cache_manager.store_failure.assert_not_called()
+
+    def test_negative_hit_skips_api_call(self):
+        """Test that known failures are not retried."""
+        self.classifier.cache_manager.get_cached_classification.return_value = {
+            'negative': True, 'cached': True, 'stale': False,
+            'failure': {'reason': 'Invalid JSON response', 'attempts': 3},
+            'expires_at': None
+        }
+
+        result = self.classifier.classify_drug(create_drug('New', 'Indicated for type 2 diabetes.'))
+
+        self.classifier.openai_client.get_classification.assert_not_called()
+        self.assertEqual(result['metadata']['error'], 'Invalid JSON response')
+        self.assertTrue(result['metadata']['negative_cached'])
+
+    def test_close_releases_cache_and_client(self):
+        """Test that closing the classifier releases the cache and the AI client's rate limiter."""
+        self.classifier.close()
+
+        self.classifier.cache_manager.close.assert_called_once()
+        self.classifier.openai_client.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
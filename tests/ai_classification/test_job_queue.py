@@ -0,0 +1,272 @@
+"""
+Tests for the classification job queue and worker.
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, Mock, patch
+
+from pymongo.errors import BulkWriteError
+
+from ai_classification.classification_worker import ClassificationWorker, classification_fields
+from ai_classification.job_queue import ClassificationJobQueue, PENDING, LEASED, DEAD
+
+
+def create_job(slug='drug-a', attempts=1):
+    """Create a job as returned by a lease."""
+    now = datetime.utcnow()
+    return {
+        '_id': slug,
+        'status': LEASED,
+        'attempts': attempts,
+        'worker_id': 'worker-1',
+        'enqueued_at': now,
+        'lease_expires_at': now + timedelta(minutes=5)
+    }
+
+
+def create_result(error=None, **metadata):
+    """Create a classification result as returned by DrugClassifier."""
+    return {
+        'classification': {'primary_therapeutic_class': 'Antidiabetic Agents', 'confidence_level': 'High'},
+        'metadata': {'model': 'gpt-4o-mini', 'tokens_used': 100, 'processing_time': 0.5, 'error': error,
+                     **metadata},
+        'cached': False
+    }
+
+
+class TestClassificationJobQueue(unittest.TestCase):
+    """Test cases for ClassificationJobQueue class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.queue = ClassificationJobQueue()
+        self.queue.max_attempts = 3
+        self.queue.retry_delay = 10
+        self.collection = MagicMock()
+        patcher = patch.object(self.queue, '_get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_upserts_one_job_per_slug(self):
+        """Test that duplicate slugs are queued once and leased jobs are skipped."""
+        self.collection.bulk_write.return_value = Mock(upserted_count=1, modified_count=1)
+
+        queued = self.queue.enqueue(['drug-a', 'drug-b', 'drug-a'])
+
+        operations = self.collection.bulk_write.call_args[0][0]
+        self.assertEqual(queued, 2)
+        self.assertEqual([operation._filter['_id'] for operation in operations[::2]], ['drug-a', 'drug-b'])
+        self.assertEqual(operations[0]._filter['status'], {'$ne': LEASED})
+        self.assertEqual(operations[0]._doc['$set']['status'], PENDING)
+        self.assertFalse(self.collection.bulk_write.call_args[1]['ordered'])
+
+    def test_enqueue_ignores_leased_jobs(self):
+        """Test that upserts colliding with leased jobs are not errors."""
+        self.collection.bulk_write.side_effect = BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}],
+            'nUpserted': 1, 'nModified': 0
+        })
+
+        self.assertEqual(self.queue.enqueue(['drug-a', 'drug-b']), 1)
+
+    def test_enqueue_flags_leased_jobs_for_requeue(self):
+        """Test that a slug re-imported while leased runs again after its job completes."""
+        self.collection.bulk_write.return_value = Mock(upserted_count=0, modified_count=1)
+
+        self.queue.enqueue(['drug-a'])
+
+        requeue = self.collection.bulk_write.call_args[0][0][1]
+        self.assertEqual(requeue._filter, {'_id': 'drug-a', 'status': LEASED})
+        self.assertEqual(requeue._doc, {'$set': {'requeue': True}})
+
+        self.collection.update_one.side_effect = [Mock(modified_count=0), Mock(modified_count=1)]
+
+        self.assertTrue(self.queue.complete(create_job()))
+        done_query = self.collection.update_one.call_args_list[0][0][0]
+        self.assertEqual(done_query['requeue'], {'$ne': True})
+        query, update = self.collection.update_one.call_args[0]
+        self.assertTrue(query['requeue'])
+        self.assertEqual(update['$set']['status'], PENDING)
+        self.assertEqual(update['$set']['attempts'], 0)
+        self.assertIn('requeue', update['$unset'])
+
+    def test_lease_prefers_pending_jobs(self):
+        """Test that pending jobs are leased atomically before expired leases."""
+        self.collection.find_one_and_update.return_value = create_job()
+
+        job = self.queue.lease('worker-1')
+
+        self.assertEqual(job['_id'], 'drug-a')
+        self.collection.find_one_and_update.assert_called_once()
+        query, update = self.collection.find_one_and_update.call_args[0]
+        self.assertEqual(query['status'], PENDING)
+        self.assertEqual(update['$set']['worker_id'], 'worker-1')
+        self.assertEqual(update['$inc'], {'attempts': 1})
+
+    def test_lease_reclaims_expired_leases(self):
+        """Test that expired leases with attempts left are claimed again."""
+        self.collection.find_one_and_update.side_effect = [None, create_job(attempts=2)]
+
+        job = self.queue.lease('worker-2')
+
+        self.assertEqual(job['attempts'], 2)
+        query = self.collection.find_one_and_update.call_args[0][0]
+        self.assertEqual(query['status'], LEASED)
+        self.assertEqual(query['attempts'], {'$lt': 3})
+
+    def test_complete_requires_lease(self):
+        """Test that only the lease holder can complete a job."""
+        self.collection.update_one.return_value = Mock(modified_count=0)
+
+        self.assertFalse(self.queue.complete(create_job()))
+        query, update = self.collection.update_one.call_args_list[0][0]
+        self.assertEqual(query, {'_id': 'drug-a', 'status': LEASED, 'worker_id': 'worker-1',
+                                 'requeue': {'$ne': True}})
+        self.assertIn('completed_at', update['$set'])
+
+    def test_release_does_not_count_attempt(self):
+        """Test that a released job is pending again after the delay with its attempt undone."""
+        self.collection.update_one.return_value = Mock(modified_count=1)
+        before = datetime.utcnow()
+
+        self.assertTrue(self.queue.release(create_job(), 60))
+
+        update = self.collection.update_one.call_args[0][1]
+        self.assertEqual(update['$set']['status'], PENDING)
+        self.assertGreaterEqual(update['$set']['available_at'], before + timedelta(seconds=60))
+        self.assertEqual(update['$inc'], {'attempts': -1})
+
+    def test_fail_retries_with_backoff(self):
+        """Test that failed jobs are retried later, doubling the delay."""
+        before = datetime.utcnow()
+
+        self.assertEqual(self.queue.fail(create_job(attempts=2), 'Timeout'), PENDING)
+
+        update = self.collection.update_one.call_args[0][1]
+        self.assertEqual(update['$set']['status'], PENDING)
+        self.assertGreaterEqual(update['$set']['available_at'], before + timedelta(seconds=20))
+
+    def test_fail_dead_letters_after_max_attempts(self):
+        """Test that jobs are dead-lettered on their last attempt or when not retryable."""
+        self.assertEqual(self.queue.fail(create_job(attempts=3), 'Timeout'), DEAD)
+        self.assertEqual(self.collection.update_one.call_args[0][1]['$set']['status'], DEAD)
+
+        self.assertEqual(self.queue.fail(create_job(attempts=1), 'Not found', retry=False), DEAD)
+
+    def test_get_stats(self):
+        """Test job counts per state and queue age."""
+        self.collection.aggregate.return_value = [{'_id': PENDING, 'count': 4}, {'_id': DEAD, 'count': 1}]
+        self.collection.count_documents.return_value = 12
+        self.collection.find_one.return_value = {'enqueued_at': datetime.utcnow() - timedelta(seconds=30)}
+
+        stats = self.queue.get_stats()
+
+        self.assertEqual(stats[PENDING], 4)
+        self.assertEqual(stats[LEASED], 0)
+        self.assertEqual(stats[DEAD], 1)
+        self.assertEqual(stats['completed_last_minute'], 12)
+        self.assertAlmostEqual(stats['oldest_pending_age'], 30, delta=5)
+
+
+class TestClassificationWorker(unittest.TestCase):
+    """Test cases for ClassificationWorker class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.queue = Mock(lease_seconds=300)
+        self.queue.complete.return_value = True
+        self.queue.fail.return_value = PENDING
+        self.classifier = Mock()
+        self.classifier.classify_drug.return_value = create_result()
+        self.collection = MagicMock()
+        self.collection.find_one.return_value = {'slug': 'drug-a', 'drugName': 'A'}
+        self.worker = ClassificationWorker(self.queue, self.classifier, self.collection,
+                                           concurrency=2, worker_id='worker-1')
+
+    def test_process_job_writes_classification(self):
+        """Test that results are written to the drug document and the job completed."""
+        self.assertTrue(self.worker.process_job(create_job()))
+
+        query, update = self.collection.update_one.call_args[0]
+        self.assertEqual(query, {'slug': 'drug-a'})
+        self.assertEqual(update['$set']['therapeuticClass'], 'Antidiabetic Agents')
+        self.queue.complete.assert_called_once()
+        self.assertEqual(self.worker.get_stats()['completed'], 1)
+
+    def test_process_job_retries_classification_errors(self):
+        """Test that failed classifications are retried and not written."""
+        self.classifier.classify_drug.return_value = create_result(error='Service unavailable')
+
+        job = create_job()
+        self.assertFalse(self.worker.process_job(job))
+
+        self.collection.update_one.assert_not_called()
+        self.queue.fail.assert_called_once_with(job, 'Service unavailable', retry=True)
+        self.assertEqual(self.worker.get_stats()['retried'], 1)
+
+    def test_circuit_open_defers_job(self):
+        """Test that a job refused by the open circuit is released without using an attempt."""
+        self.classifier.classify_drug.return_value = create_result(error='Circuit open', circuit_open=True)
+        self.queue.release.return_value = True
+
+        job = create_job()
+        self.assertFalse(self.worker.process_job(job))
+
+        self.queue.release.assert_called_once_with(job, self.worker.circuit_reset_timeout)
+        self.queue.fail.assert_not_called()
+        self.assertEqual(self.worker.get_stats()['deferred'], 1)
+
+    def test_negative_cache_hit_is_dead_lettered(self):
+        """Test that a negatively cached failure is not retried."""
+        self.classifier.classify_drug.return_value = create_result(error='Invalid JSON', negative_cached=True)
+        self.queue.fail.return_value = DEAD
+
+        job = create_job()
+        self.assertFalse(self.worker.process_job(job))
+
+        self.queue.fail.assert_called_once_with(job, 'Invalid JSON', retry=False)
+        self.assertEqual(self.worker.get_stats()['dead_lettered'], 1)
+
+    def test_missing_document_is_dead_lettered(self):
+        """Test that jobs for deleted documents are not retried."""
+        self.collection.find_one.return_value = None
+        self.queue.fail.return_value = DEAD
+
+        self.assertFalse(self.worker.process_job(create_job()))
+
+        self.assertFalse(self.queue.fail.call_args[1]['retry'])
+        self.assertEqual(self.worker.get_stats()['dead_lettered'], 1)
+
+    def test_run_drains_queue(self):
+        """Test that workers process jobs concurrently until the queue is empty."""
+        jobs = [create_job(f'drug-{index}') for index in range(5)]
+        self.queue.lease.side_effect = lambda worker_id: jobs.pop() if jobs else None
+
+        stats = self.worker.run(drain=True)
+
+        self.assertEqual(stats['completed'], 5)
+        self.assertEqual(stats['leased'], 5)
+        self.assertEqual(self.classifier.classify_drug.call_count, 5)
+        self.queue.dead_letter_expired.assert_called()
+
+    def test_run_stops_at_max_jobs(self):
+        """Test that no more than max_jobs jobs are leased."""
+        self.queue.lease.side_effect = lambda worker_id: create_job()
+
+        stats = self.worker.run(max_jobs=3)
+
+        self.assertEqual(stats['leased'], 3)
+        self.assertEqual(self.queue.lease.call_count, 3)
+
+    def test_classification_fields(self):
+        """Test the document fields built from a classification result."""
+        fields = classification_fields(create_result())
+
+        self.assertEqual(fields['therapeuticClass'], 'Antidiabetic Agents')
+        self.assertEqual(fields['aiProcessingMetadata']['processingTimeMs'], 500)
+        self.assertEqual(fields['aiProcessingMetadata']['confidence'], 'High')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for AI classification streaming metrics.
+"""
+
+import random
+import threading
+import unittest
+
+from ai_classification.metrics import LatencyHistogram
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test cases for LatencyHistogram class."""
+
+    def test_empty_histogram(self):
+        """Test the summary of an empty histogram."""
+        snapshot = LatencyHistogram().snapshot()
+        self.assertEqual(snapshot['count'], 0)
+        self.assertEqual(snapshot['mean'], 0.0)
+        self.assertEqual(snapshot['p99'], 0.0)
+
+    def test_quantiles_within_relative_accuracy(self):
+        """Test that quantiles are within the configured relative error."""
+        histogram = LatencyHistogram(relative_accuracy=0.01)
+        rng = random.Random(42)
+        values = sorted(rng.lognormvariate(-4, 1) for _ in range(10000))
+        for value in values:
+            histogram.record(value)
+
+        for q in (0.5, 0.95, 0.99):
+            expected = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(histogram.quantile(q) / expected, 1.0, delta=0.02)
+
+        self.assertAlmostEqual(histogram.mean, sum(values) / len(values))
+
+    def test_memory_is_bounded(self):
+        """Test that the number of buckets does not grow with the sample count."""
+        histogram = LatencyHistogram()
+        for _ in range(5):
+            for value in (0.001, 0.01, 0.1, 1.0):
+                histogram.record(value)
+
+        self.assertEqual(len(histogram._buckets), 4)
+        self.assertEqual(histogram.count, 20)
+
+    def test_concurrent_records(self):
+        """Test that concurrent updates are all counted."""
+        histogram = LatencyHistogram()
+
+        def record_many():
+            for _ in range(1000):
+                histogram.record(0.005)
+
+        threads = [threading.Thread(target=record_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(histogram.count, 8000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for the shared MongoDB client registry.
+"""
+
+import argparse
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from ai_classification.config import get_config
+from ai_classification.mongo_clients import (
+    acquire_client, release_client, shared_client_count, mongo_client_options,
+    add_mongo_client_arguments, apply_mongo_client_arguments
+)
+
+
+class TestMongoClientRegistry(unittest.TestCase):
+    """Test cases for shared client reference counting."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        patcher = patch('pymongo.MongoClient', side_effect=lambda *args, **kwargs: MagicMock())
+        self.mongo_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_uri_and_options_share_a_client(self):
+        """Test that a client is created once and closed after its last release."""
+        first = acquire_client('mongodb://db:27017/', maxPoolSize=10)
+        second = acquire_client('mongodb://db:27017/', maxPoolSize=10)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.mongo_client.call_count, 1)
+        self.assertEqual(shared_client_count(), 1)
+
+        release_client(first)
+        first.close.assert_not_called()
+        release_client(second)
+        first.close.assert_called_once()
+        self.assertEqual(shared_client_count(), 0)
+
+    def test_different_options_get_separate_clients(self):
+        """Test that the registry is keyed by URI and options."""
+        clients = [
+            acquire_client('mongodb://db:27017/', compressors=['zstd']),
+            acquire_client('mongodb://db:27017/', compressors=['snappy']),
+            acquire_client('mongodb://other:27017/', compressors=['zstd']),
+        ]
+
+        self.assertEqual(len({id(client) for client in clients}), 3)
+        for client in clients:
+            release_client(client)
+        self.assertEqual(shared_client_count(), 0)
+
+    def test_release_unshared_client_closes_it(self):
+        """Test that releasing a client the registry does not own closes it."""
+        client = MagicMock()
+        release_client(client)
+        client.close.assert_called_once()
+
+
+class TestMongoClientOptions(unittest.TestCase):
+    """Test cases for client options from configuration and the CLI."""
+
+    def test_options_from_config(self):
+        """Test pool size, timeouts and compressor parsing."""
+        config = {**get_config(), 'MONGO_MAX_POOL_SIZE': 20, 'MONGO_SOCKET_TIMEOUT_MS': 0,
+                  'MONGO_COMPRESSORS': 'zstd, snappy,lz4'}
+
+        options = mongo_client_options(config)
+
+        self.assertEqual(options['maxPoolSize'], 20)
+        self.assertEqual(options['compressors'], ['zstd', 'snappy'])
+        self.assertNotIn('socketTimeoutMS', options)
+
+    def test_cli_arguments_set_environment(self):
+        """Test that only the given options are applied."""
+        parser = argparse.ArgumentParser()
+        add_mongo_client_arguments(parser)
+        args = parser.parse_args(['--mongo-pool-size', '25', '--mongo-compressors', 'zstd'])
+
+        with patch.dict(os.environ):
+            os.environ.pop('MONGO_CONNECT_TIMEOUT_MS', None)
+            apply_mongo_client_arguments(args)
+            self.assertEqual(os.environ['MONGO_MAX_POOL_SIZE'], '25')
+            self.assertEqual(os.environ['MONGO_COMPRESSORS'], 'zstd')
+            self.assertNotIn('MONGO_CONNECT_TIMEOUT_MS', os.environ)
+
+
+if __name__ == '__main__':
+    unittest.main()
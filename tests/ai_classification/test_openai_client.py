@@ -5,10 +5,25 @@ Tests for OpenPipe AI client wrapper.
 import unittest
 import time
 import json
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, call
 from datetime import datetime, timedelta
 
-from ai_classification.openai_client import OpenPipeClient, RateLimiter
+from ai_classification.openai_client import (
+    OpenPipeClient, RateLimiter, CircuitBreaker, CircuitOpenError, DeadlineExceededError,
+    ClassificationFailedError
+)
+
+
+class APIConnectionError(Exception):
+    """Stand-in for the SDK connection error."""
+
+
+class AuthenticationError(Exception):
+    """Stand-in for the SDK error raised for a bad API key."""
+
+
+class BadRequestError(Exception):
+    """Stand-in for the SDK error raised for a rejected request."""
 
 
 class TestRateLimiter(unittest.TestCase):
@@ -62,6 +77,79 @@ class TestRateLimiter(unittest.TestCase):
         limiter.wait_if_needed()
         elapsed = time.time() - start_time
         self.assertLess(elapsed, 0.1)
+    
+    def test_rate_limiter_returns_early_beyond_max_wait(self):
+        """Test that a wait longer than allowed is refused without waiting."""
+        limiter = RateLimiter(max_requests=1, time_window=60)
+        limiter.wait_if_needed()
+        
+        start_time = time.time()
+        self.assertFalse(limiter.wait_if_needed(max_wait=1))
+        self.assertLess(time.time() - start_time, 0.1)
+        self.assertEqual(len(limiter.requests), 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker class."""
+    
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the failure threshold."""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.get_stats()['rejected_requests'], 1)
+    
+    def test_success_resets_failure_count(self):
+        """Test that only consecutive failures count."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_half_open_allows_single_probe(self):
+        """Test that one probe is let through after the reset timeout."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_failed_probe_reopens(self):
+        """Test that a failed probe opens the circuit again."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        breaker.allow_request()
+        
+        breaker.record_failure()
+        
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.times_opened, 2)
+    
+    def test_lost_probe_is_replaced(self):
+        """Test that a probe that never reports back does not keep the circuit half-open forever."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        
+        time.sleep(0.15)
+        
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
 
 
 class TestOpenPipeClient(unittest.TestCase):
@@ -80,11 +168,40 @@ class TestOpenPipeClient(unittest.TestCase):
             'AI_MAX_RETRIES': 3
         }
     
+    def mock_sdk(self, mock_load_sdk, openpipe=True):
+        """
+        Make the mocked SDK loader return a mocked OpenAI client class.
+        
+        Args:
+            mock_load_sdk: Patched _load_sdk
+            openpipe: Whether the mocked SDK is the OpenPipe SDK
+        """
+        mock_openai = MagicMock()
+        mock_load_sdk.return_value = (mock_openai, openpipe)
+        return mock_openai
+    
+    def create_client(self, api_side_effect):
+        """
+        Create a client with the test configuration and a mocked SDK.
+        
+        Args:
+            api_side_effect: Side effect of the SDK's chat completion calls
+        """
+        for target, value in (('get_config', Mock(return_value=self.mock_config)),
+                              ('_load_sdk', Mock(return_value=(MagicMock(), True)))):
+            patcher = patch(f'ai_classification.openai_client.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        client = OpenPipeClient()
+        client.client.chat.completions.create.side_effect = api_side_effect
+        return client
+    
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_client_initialization_with_openpipe(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_client_initialization_with_openpipe(self, mock_load_sdk, mock_get_config):
         """Test client initialization with OpenPipe SDK."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         mock_client_instance = Mock()
         mock_openai.return_value = mock_client_instance
@@ -111,10 +228,10 @@ class TestOpenPipeClient(unittest.TestCase):
         )
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', False)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_client_initialization_fallback(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_client_initialization_fallback(self, mock_load_sdk, mock_get_config):
         """Test client initialization with fallback to OpenAI."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=False)
         mock_get_config.return_value = self.mock_config
         mock_client_instance = Mock()
         mock_openai.return_value = mock_client_instance
@@ -129,20 +246,19 @@ class TestOpenPipeClient(unittest.TestCase):
         )
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', False)
-    def test_client_initialization_no_modules(self, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk', return_value=(None, False))
+    def test_client_initialization_no_modules(self, mock_load_sdk, mock_get_config):
         """Test client initialization fails when no modules available."""
         mock_get_config.return_value = self.mock_config
         
-        with patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', False):
-            with self.assertRaises(ImportError):
-                OpenPipeClient()
+        with self.assertRaises(ImportError):
+            OpenPipeClient()
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_get_stats(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_get_stats(self, mock_load_sdk, mock_get_config):
         """Test getting client statistics."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         mock_openai.return_value = Mock()
         
@@ -157,16 +273,22 @@ class TestOpenPipeClient(unittest.TestCase):
             'total_requests': 10,
             'total_tokens': 5000,
             'total_cost': 2.50,
-            'model': 'gpt-4o-mini'
+            'model': 'gpt-4o-mini',
+            'circuit_breaker': {
+                'state': 'closed',
+                'consecutive_failures': 0,
+                'times_opened': 0,
+                'rejected_requests': 0
+            }
         }
         
         self.assertEqual(stats, expected_stats)
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_successful_classification(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_successful_classification(self, mock_load_sdk, mock_get_config):
         """Test successful classification request."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         
         # Mock successful API response
@@ -219,10 +341,10 @@ class TestOpenPipeClient(unittest.TestCase):
         self.assertEqual(client.total_tokens, 800)
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_json_decode_error(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_json_decode_error(self, mock_load_sdk, mock_get_config):
         """Test handling of JSON decode errors."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         
         # Mock response with invalid JSON
@@ -242,16 +364,17 @@ class TestOpenPipeClient(unittest.TestCase):
             client.get_classification("system", "user")
         
         self.assertIn("Invalid JSON response", str(context.exception))
+        self.assertTrue(context.exception.cacheable)
         
         # Should have attempted all retries
         self.assertEqual(mock_client_instance.chat.completions.create.call_count, 3)
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
+    @patch('ai_classification.openai_client._load_sdk')
     @patch('time.sleep')  # Mock sleep to speed up tests
-    def test_api_error_retry(self, mock_sleep, mock_openai, mock_get_config):
+    def test_api_error_retry(self, mock_sleep, mock_load_sdk, mock_get_config):
         """Test retry logic for API errors."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         
         # Mock API error
@@ -278,11 +401,11 @@ class TestOpenPipeClient(unittest.TestCase):
         mock_sleep.assert_has_calls(expected_sleep_calls)
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
+    @patch('ai_classification.openai_client._load_sdk')
     @patch('time.sleep')  # Mock sleep to speed up tests
-    def test_rate_limit_error_handling(self, mock_sleep, mock_openai, mock_get_config):
+    def test_rate_limit_error_handling(self, mock_sleep, mock_load_sdk, mock_get_config):
         """Test special handling for rate limit errors."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         
         # Mock rate limit error
@@ -307,10 +430,10 @@ class TestOpenPipeClient(unittest.TestCase):
         self.assertTrue(any(call[0][0] >= 2 for call in sleep_calls))  # At least one call >= 2 seconds
     
     @patch('ai_classification.openai_client.get_config')
-    @patch('ai_classification.openai_client.OPENPIPE_AVAILABLE', True)
-    @patch('ai_classification.openai_client.OpenAI')
-    def test_rate_limiter_integration(self, mock_openai, mock_get_config):
+    @patch('ai_classification.openai_client._load_sdk')
+    def test_rate_limiter_integration(self, mock_load_sdk, mock_get_config):
         """Test rate limiter integration."""
+        mock_openai = self.mock_sdk(mock_load_sdk, openpipe=True)
         mock_get_config.return_value = self.mock_config
         
         # Mock successful response
@@ -327,7 +450,7 @@ class TestOpenPipeClient(unittest.TestCase):
         
         # Mock rate limiter to simulate waiting
         with patch.object(client.rate_limiter, 'wait_if_needed') as mock_wait:
-            mock_wait.side_effect = lambda: time.sleep(0.2)  # Simulate 200ms wait
+            mock_wait.side_effect = lambda **kwargs: time.sleep(0.2) or True  # Simulate 200ms wait
             
             classification, metadata = client.get_classification("system", "user")
             
@@ -336,7 +459,124 @@ class TestOpenPipeClient(unittest.TestCase):
             
             # Should indicate rate limiting in metadata
             self.assertTrue(metadata['rate_limited'])
-
+    
+    @patch('time.sleep')  # Mock sleep to speed up tests
+    def test_circuit_breaker_fails_fast(self, mock_sleep):
+        """Test that an outage stops retries and later requests fail without API calls."""
+        client = self.create_client(APIConnectionError("Connection refused"))
+        client.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        create = client.client.chat.completions.create
+        
+        with self.assertRaises(CircuitOpenError):
+            client.get_classification("system", "user")
+        self.assertEqual(create.call_count, 2)
+        
+        with self.assertRaises(CircuitOpenError):
+            client.get_classification("system", "user")
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(client.get_stats()['circuit_breaker']['state'], CircuitBreaker.OPEN)
+    
+    def test_deadline_bounds_retries(self):
+        """Test that request timeouts and backoff are clipped to the deadline."""
+        client = self.create_client(APIConnectionError("Connection reset"))
+        create = client.client.chat.completions.create
+        start_time = time.time()
+        
+        with self.assertRaises(DeadlineExceededError):
+            client.get_classification("system", "user", deadline=start_time + 0.3)
+        
+        self.assertLess(time.time() - start_time, 1)
+        self.assertEqual(create.call_count, 1)
+        self.assertLessEqual(create.call_args[1]['timeout'], 0.3)
+    
+    def test_probe_stopped_by_deadline_is_released(self):
+        """Test that a half-open probe that never reaches the API lets the next request probe."""
+        client = self.create_client(APIConnectionError("Connection refused"))
+        client.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        client.circuit_breaker.record_failure()
+        client.circuit_breaker.opened_at -= 61
+        client.rate_limiter.wait_if_needed = Mock(return_value=False)
+        
+        with self.assertRaises(DeadlineExceededError):
+            client.get_classification("system", "user", deadline=time.time() + 5)
+        
+        client.client.chat.completions.create.assert_not_called()
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(client.circuit_breaker.allow_request())
+    
+    @patch('time.sleep')  # Mock sleep to speed up tests
+    def test_connection_failure_not_cacheable(self, mock_sleep):
+        """Test that transient service failures are marked as not cacheable."""
+        client = self.create_client(APIConnectionError("Connection reset"))
+        
+        with self.assertRaises(ClassificationFailedError) as context:
+            client.get_classification("system", "user")
+        
+        self.assertFalse(context.exception.cacheable)
+        self.assertEqual(context.exception.attempts, 3)
+    
+    @patch('time.sleep')  # Mock sleep to speed up tests
+    def test_only_deterministic_failures_cacheable(self, mock_sleep):
+        """Test that configuration and unknown errors are not cached, rejected requests are."""
+        for error, cacheable in ((AuthenticationError("Invalid API key"), False),
+                                 (RuntimeError("Unexpected"), False),
+                                 (BadRequestError("Invalid request"), True)):
+            with self.subTest(error=type(error).__name__):
+                client = self.create_client(error)
+                
+                with self.assertRaises(ClassificationFailedError) as context:
+                    client.get_classification("system", "user")
+                
+                self.assertEqual(context.exception.cacheable, cacheable)
+    
+    def test_rejected_request_not_retried(self):
+        """Test that a rejected request fails on its first attempt without tripping the circuit."""
+        client = self.create_client(BadRequestError("Context length exceeded"))
+        client.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        
+        for _ in range(3):
+            with self.assertRaises(ClassificationFailedError) as context:
+                client.get_classification("system", "user")
+            self.assertEqual(context.exception.attempts, 1)
+        
+        self.assertEqual(client.client.chat.completions.create.call_count, 3)
+        self.assertEqual(client.circuit_breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_content_filtered_response_cached_without_retry(self):
+        """Test that a response blocked by the content filter fails once and is cacheable."""
+        client = self.create_client(None)
+        response = Mock()
+        response.choices = [Mock(finish_reason='content_filter')]
+        response.choices[0].message.content = None
+        client.client.chat.completions.create.return_value = response
+        
+        with self.assertRaises(ClassificationFailedError) as context:
+            client.get_classification("system", "user")
+        
+        self.assertTrue(context.exception.cacheable)
+        self.assertEqual(context.exception.attempts, 1)
+        self.assertEqual(client.client.chat.completions.create.call_count, 1)
+        self.assertEqual(client.circuit_breaker.consecutive_failures, 0)
+    
+    @patch('time.sleep')  # Mock sleep to speed up tests
+    def test_failed_calls_refund_estimated_tokens(self, mock_sleep):
+        """Test that tokens taken for calls that fail are returned to the rate limiter."""
+        client = self.create_client(APIConnectionError("Connection reset"))
+        client.rate_limiter.record_usage = Mock()
+        
+        with self.assertRaises(ClassificationFailedError):
+            client.get_classification("system", "user")
+        
+        self.assertEqual(client.rate_limiter.record_usage.call_args_list, [call(0)] * 3)
+    
+    def test_close_releases_rate_limiter(self):
+        """Test that closing the client releases its rate limiter."""
+        client = self.create_client(None)
+        client.rate_limiter = Mock()
+        
+        client.close()
+        
+        client.rate_limiter.close.assert_called_once()
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Tests for AI classification prompt construction.
+"""
+
+import unittest
+
+from ai_classification.prompt_manager import PromptManager, TRUNCATION_MARKER
+from ai_classification.section_compressor import SectionCompressor, compute_term_weights
+from ai_classification.token_counter import TokenCounter
+
+
+class TestTokenCounter(unittest.TestCase):
+    """Test cases for TokenCounter class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.counter = TokenCounter('gpt-4o-mini')
+
+    def test_empty_text(self):
+        """Test that empty text has no tokens."""
+        self.assertEqual(self.counter.count(''), 0)
+
+    def test_truncate_short_text_unchanged(self):
+        """Test that text within the limit is returned unchanged."""
+        text, truncated = self.counter.truncate('Treatment of type 2 diabetes.', 100)
+        self.assertEqual(text, 'Treatment of type 2 diabetes.')
+        self.assertFalse(truncated)
+
+    def test_truncate_respects_limit(self):
+        """Test that truncated text fits within the limit."""
+        text = 'tirzepatide is a GIP receptor and GLP-1 receptor agonist. ' * 50
+        truncated_text, truncated = self.counter.truncate(text, 40)
+        self.assertTrue(truncated)
+        self.assertLessEqual(self.counter.count(truncated_text), 40)
+        self.assertTrue(text.startswith(truncated_text))
+
+
+class TestSectionCompressor(unittest.TestCase):
+    """Test cases for SectionCompressor class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        corpus = [
+            {'label': {
+                'indicationsAndUsage': 'Kinase inhibitor indicated for the treatment of lymphoma.',
+                'mechanismOfAction': 'Pirtobrutinib is a kinase inhibitor of BTK.',
+                'adverseReactions': 'Fatigue occurred in 29% of patients versus 12% on placebo.'
+            }},
+            {'label': {
+                'indicationsAndUsage': 'Receptor agonist indicated to improve glycemic control.',
+                'mechanismOfAction': 'Tirzepatide is a GIP receptor and GLP-1 receptor agonist.',
+                'adverseReactions': 'Nausea occurred in 18% of patients versus 4% on placebo.'
+            }}
+        ]
+        self.counter = TokenCounter('gpt-4o-mini')
+        self.compressor = SectionCompressor(compute_term_weights(corpus, lambda text: text))
+
+    def test_term_weights_favour_key_sections(self):
+        """Test that terms from key sections outweigh trial vocabulary."""
+        weights = dict(zip(self.compressor.vocabulary, self.compressor.weights))
+        self.assertGreater(weights['inhibitor'], 0)
+        self.assertNotIn('placebo', weights)
+
+    def test_compress_keeps_relevant_sentences(self):
+        """Test that class-relevant sentences survive compression."""
+        text = ('Diarrhea occurred in 19% of patients versus 7% on placebo in Study 1. '
+                'The drug is a kinase inhibitor with activity against BTK. '
+                'Neutropenia occurred in 24% of patients and 11% discontinued.')
+
+        compressed = self.compressor.compress(text, 20, self.counter.count)
+
+        self.assertEqual(compressed, 'The drug is a kinase inhibitor with activity against BTK.')
+
+    def test_compress_skips_excluded_sentences(self):
+        """Test that sentences already in the prompt are not repeated."""
+        sentence = 'The drug is a kinase inhibitor with activity against BTK.'
+        self.assertEqual(self.compressor.compress(sentence, 50, self.counter.count, {sentence}), '')
+
+
+class TestPromptManager(unittest.TestCase):
+    """Test cases for PromptManager class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.prompt_manager = PromptManager()
+        self.prompt_manager.token_budget = 400
+
+    def test_allocation_redistributes_unused_budget(self):
+        """Test that short sections release their share to long ones."""
+        allocations = self.prompt_manager._allocate_token_budget([10, 1000, 1000], [4, 4, 1], 300)
+
+        self.assertEqual(allocations[0], 10)
+        self.assertEqual(sum(allocations), 300)
+        self.assertGreater(allocations[1], allocations[2])
+
+    def test_allocation_keeps_sections_that_fit(self):
+        """Test that nothing is cut when everything fits."""
+        allocations = self.prompt_manager._allocate_token_budget([50, 60, 0], [4, 4, 1], 300)
+        self.assertEqual(allocations, [50, 60, 0])
+
+    def test_clean_html_handles_attributed_tags(self):
+        """Test that tags with attributes are converted like bare tags."""
+        html_content = ('<h2 class="Title">12.1 Mechanism</h2>'
+                        '<p class="First">Binds <span class="Bold">IL-17A</span>.</p>'
+                        '<ul class="Disc"><li class="Item">Psoriasis</li></ul>')
+
+        self.assertEqual(
+            self.prompt_manager._clean_html(html_content),
+            '## 12.1 Mechanism\n\nBinds IL-17A.\n\n- Psoriasis'
+        )
+
+    def test_clean_html_decodes_entities_and_tables(self):
+        """Test entity decoding and table rows."""
+        html_content = ('<table><tbody><tr><td>HbA1c &lt; 7%</td><td>A &amp; B</td></tr></tbody></table>'
+                        '<script>var x = 1;</script><!-- comment -->')
+
+        self.assertEqual(self.prompt_manager._clean_html(html_content), '| HbA1c < 7% | A & B |')
+
+    def test_label_content_within_budget(self):
+        """Test that long labels are cut to the token budget by priority."""
+        self.prompt_manager.compressor = None
+        drug_data = {
+            'label': {
+                'indicationsAndUsage': '<p>Indicated for the treatment of plaque psoriasis.</p>',
+                'mechanismOfAction': '<p>Humanized IgG4 monoclonal antibody that binds IL-17A.</p>',
+                'adverseReactions': '<p>' + 'Injection site reactions were reported in 17% of patients. ' * 200 + '</p>'
+            }
+        }
+
+        content = self.prompt_manager.extract_label_content(drug_data)
+
+        self.assertLessEqual(self.prompt_manager.count_tokens(content), 400)
+        self.assertIn('Indicated for the treatment of plaque psoriasis.', content)
+        self.assertIn('binds IL-17A.', content)
+        self.assertTrue(content.endswith(TRUNCATION_MARKER))
+
+    def test_compress_section_truncates_when_nothing_qualifies(self):
+        """Test that a section with no relevant sentences still fits its budget."""
+        self.prompt_manager.compressor = SectionCompressor({'inhibitor': 1.0})
+        self.prompt_manager.compressed_section_tokens = 30
+        content = 'Injection site reactions were reported in 17% of patients. ' * 50
+
+        compressed = self.prompt_manager._compress_section(content, set())
+
+        self.assertLessEqual(self.prompt_manager.count_tokens(compressed), 30)
+        self.assertTrue(compressed.endswith(TRUNCATION_MARKER))
+
+    def test_compress_section_fallback_skips_repeated_sentences(self):
+        """Test that the truncated fallback keeps each new sentence once."""
+        self.prompt_manager.compressor = SectionCompressor({'inhibitor': 1.0})
+        self.prompt_manager.compressed_section_tokens = 30
+        quoted = 'Nausea was reported in 5% of patients.'
+        repeated = 'Injection site reactions were reported in 17% of patients.'
+        content = ' '.join([quoted] + [repeated] * 50)
+
+        compressed = self.prompt_manager._compress_section(content, {quoted})
+
+        self.assertEqual(compressed, repeated + TRUNCATION_MARKER)
+
+    def test_compress_section_drops_already_quoted_section(self):
+        """Test that a section made only of quoted sentences is left out."""
+        self.prompt_manager.compressor = SectionCompressor({'inhibitor': 1.0})
+        self.prompt_manager.compressed_section_tokens = 5
+        quoted = 'Injection site reactions were reported in 17% of patients.'
+
+        self.assertEqual(self.prompt_manager._compress_section(quoted + ' ' + quoted, {quoted}), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests for the shared rate limiter.
+"""
+
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+
+from pymongo.errors import DuplicateKeyError
+
+from ai_classification.config import get_config
+from ai_classification.openai_client import RateLimiter, create_rate_limiter
+from ai_classification.shared_rate_limiter import (
+    InMemoryTokenBucketStore, MongoTokenBucketStore, SharedRateLimiter
+)
+
+
+class TestInMemoryTokenBucketStore(unittest.TestCase):
+    """Test cases for InMemoryTokenBucketStore class."""
+
+    def test_take_until_empty(self):
+        """Test that a full bucket grants its capacity and then reports the wait."""
+        store = InMemoryTokenBucketStore()
+
+        self.assertEqual(store.take('bucket', 2, 1.0, 1), 0.0)
+        self.assertEqual(store.take('bucket', 2, 1.0, 1), 0.0)
+        self.assertAlmostEqual(store.take('bucket', 2, 1.0, 1), 1.0, delta=0.05)
+
+    def test_adjust_returns_tokens(self):
+        """Test that returned tokens can be taken again, up to the capacity."""
+        store = InMemoryTokenBucketStore()
+        store.take('bucket', 2, 0.001, 2)
+
+        store.adjust('bucket', 2, 5)
+
+        self.assertEqual(store.take('bucket', 2, 0.001, 2), 0.0)
+        self.assertGreater(store.take('bucket', 2, 0.001, 1), 0)
+
+
+class TestMongoTokenBucketStore(unittest.TestCase):
+    """Test cases for MongoTokenBucketStore class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.store = MongoTokenBucketStore('mongodb://localhost:27017/')
+        self.collection = MagicMock()
+        patcher = patch.object(self.store, '_get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_take_is_one_atomic_upsert(self):
+        """Test that refilling and taking is a single pipeline update on the bucket."""
+        self.collection.find_one_and_update.return_value = {'_id': 'openpipe:requests', 'tokens': 9, 'granted': True}
+
+        self.assertEqual(self.store.take('openpipe:requests', 60, 1.0, 1), 0.0)
+
+        self.collection.find_one_and_update.assert_called_once()
+        query, pipeline = self.collection.find_one_and_update.call_args[0]
+        self.assertEqual(query, {'_id': 'openpipe:requests'})
+        self.assertIsInstance(pipeline, list)
+        self.assertTrue(self.collection.find_one_and_update.call_args[1]['upsert'])
+
+    def test_take_reports_wait(self):
+        """Test the wait until enough tokens have refilled."""
+        self.collection.find_one_and_update.return_value = {'tokens': 100, 'granted': False}
+
+        self.assertAlmostEqual(self.store.take('openpipe:tokens', 60000, 1000.0, 5100), 5.0)
+
+    def test_take_retries_concurrent_bucket_creation(self):
+        """Test that losing the race to create a bucket retries the update once."""
+        self.collection.find_one_and_update.side_effect = [
+            DuplicateKeyError('duplicate key', 11000),
+            {'tokens': 59, 'granted': True}
+        ]
+
+        self.assertEqual(self.store.take('openpipe:requests', 60, 1.0, 1), 0.0)
+        self.assertEqual(self.collection.find_one_and_update.call_count, 2)
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+    """Test cases for SharedRateLimiter class."""
+
+    def test_limiters_share_one_budget(self):
+        """Test that limiters with the same name draw from the same buckets."""
+        store = InMemoryTokenBucketStore()
+        first = SharedRateLimiter(store, requests_per_minute=2)
+        second = SharedRateLimiter(store, requests_per_minute=2)
+
+        self.assertTrue(first.wait_if_needed())
+        self.assertTrue(first.wait_if_needed())
+        self.assertFalse(second.wait_if_needed(max_wait=0.1))
+        self.assertTrue(SharedRateLimiter(store, name='other', requests_per_minute=2).wait_if_needed(max_wait=0))
+
+    def test_waits_for_refill(self):
+        """Test that a request waits until its bucket refills."""
+        limiter = SharedRateLimiter(InMemoryTokenBucketStore(), requests_per_minute=600)
+        for _ in range(600):
+            limiter.wait_if_needed()
+
+        with patch('ai_classification.shared_rate_limiter.time.sleep') as mock_sleep:
+            mock_sleep.side_effect = lambda seconds: limiter.store.adjust('openpipe:requests', 600, 1)
+            self.assertTrue(limiter.wait_if_needed())
+
+        self.assertEqual(limiter.waits, 1)
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 0.1, delta=0.06)
+
+    def test_token_refusal_returns_request(self):
+        """Test that a request refused by the token limit does not use up a request."""
+        store = InMemoryTokenBucketStore()
+        limiter = SharedRateLimiter(store, requests_per_minute=1, tokens_per_minute=1000, tokens_per_request=600)
+
+        self.assertTrue(limiter.wait_if_needed())
+        limiter.record_usage(100)
+        store.adjust('openpipe:requests', 1, 1)
+        self.assertTrue(limiter.wait_if_needed(max_wait=0))
+
+        store.adjust('openpipe:requests', 1, 1)
+        self.assertFalse(limiter.wait_if_needed(max_wait=0))
+        self.assertEqual(store.take('openpipe:requests', 1, 1 / 60, 1), 0.0)
+
+    def test_store_errors_fail_open(self):
+        """Test that requests proceed while the store is unavailable."""
+        store = Mock()
+        store.take.side_effect = ConnectionError('store down')
+        limiter = SharedRateLimiter(store)
+
+        self.assertTrue(limiter.wait_if_needed())
+        self.assertEqual(limiter.store_errors, 1)
+
+    def test_create_rate_limiter(self):
+        """Test that the configured backend selects the rate limiter."""
+        limiter = create_rate_limiter({'AI_RATE_LIMIT_RPM': 30})
+        self.assertIsInstance(limiter, RateLimiter)
+        self.assertEqual(limiter.max_requests, 30)
+
+        limiter = create_rate_limiter({**get_config(), 'AI_RATE_LIMIT_BACKEND': 'mongo', 'AI_RATE_LIMIT_TPM': 100000,
+                                       'AI_PROMPT_TOKEN_BUDGET': 3000, 'AI_MAX_TOKENS': 1000})
+        self.assertIsInstance(limiter, SharedRateLimiter)
+        self.assertIsInstance(limiter.store, MongoTokenBucketStore)
+        self.assertEqual(limiter.tokens_per_request, 4000)
+
+        with self.assertRaises(ValueError):
+            create_rate_limiter({'AI_RATE_LIMIT_BACKEND': 'redis'})
+
+
+if __name__ == '__main__':
+    unittest.main()
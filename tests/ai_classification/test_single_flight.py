@@ -0,0 +1,94 @@
+"""
+Tests for AI classification request coalescing.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from ai_classification.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for SingleFlight class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.single_flight = SingleFlight()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_call(self, value='result'):
+        """Count a call and take long enough for others to join it."""
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.1)
+        return value
+
+    def test_concurrent_threads_share_one_call(self):
+        """Test that threads with the same key share one execution."""
+        results = []
+
+        def worker():
+            results.append(self.single_flight.do('key', self.slow_call))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(self.single_flight.coalesced, 4)
+        self.assertEqual(self.single_flight.in_flight, 0)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Test that a finished call is not reused."""
+        self.single_flight.do('key', self.slow_call)
+        self.single_flight.do('key', self.slow_call)
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.single_flight.coalesced, 0)
+
+    def test_exception_reaches_every_caller(self):
+        """Test that a failure is raised to the leader and to waiters."""
+        errors = []
+
+        def failing_call():
+            time.sleep(0.1)
+            raise ValueError('service unavailable')
+
+        def worker():
+            try:
+                self.single_flight.do('key', failing_call)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+
+    def test_concurrent_tasks_share_one_call(self):
+        """Test that asyncio tasks with the same key share one execution."""
+        async def run():
+            return await asyncio.gather(
+                self.single_flight.do_async('key', self.slow_call),
+                self.single_flight.do_async('key', self.slow_call),
+                self.single_flight.do_async('other', self.slow_call)
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, ['result'] * 3)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.single_flight.coalesced, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
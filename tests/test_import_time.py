@@ -0,0 +1,74 @@
+"""
+Startup import tests for the seeder command line entry points.
+
+Each CLI mode is run in a fresh interpreter with ``-X importtime``; a mode fails
+when it imports a heavy dependency it does not need.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from typing import Set
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third-party packages that dominate startup time
+HEAVY_MODULES = {'openai', 'openpipe', 'pymongo', 'bson', 'jsonschema', 'yaml', 'requests', 'numpy', 'tiktoken'}
+
+# A real drug label, so dry runs get past their file checks
+LABEL_FILE = os.path.join('data', 'drugs', 'mounjaro-d2d7da5.json')
+
+# CLI mode and the heavy modules it may import
+CLI_MODES = [
+    (('run_enhanced_import.py', '--dry-run', '--disable-ai', '-j', LABEL_FILE), set()),
+    (('run_enhanced_import.py', '--dry-run', '-j', LABEL_FILE), set()),
+    (('hardened_mongo_import.py', '--dry-run', '-j', LABEL_FILE), set()),
+    (('manage_ai_cache.py', '--help'), {'pymongo', 'bson'}),
+    (('-c', 'import enhanced_drug_importer'), {'pymongo', 'bson', 'tiktoken'}),
+]
+
+
+def imported_packages(*args: str) -> Set[str]:
+    """
+    Run Python with -X importtime and collect the packages it imports.
+
+    Args:
+        *args: Script and arguments, or -c and code
+
+    Returns:
+        Set[str]: Top-level packages imported
+    """
+    env = dict(os.environ, OPENPIPE_API_KEY='test-api-key')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0:
+        raise AssertionError(f"{' '.join(args)} exited with {result.returncode}: {result.stderr[-2000:]}")
+
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue  # Column header
+        packages.add(name.strip().split('.')[0])
+
+    return packages
+
+
+class TestImportTime(unittest.TestCase):
+    """Test cases for CLI startup imports."""
+
+    def test_cli_modes_import_only_what_they_use(self):
+        """Test that each CLI mode skips unneeded heavy dependencies."""
+        for args, allowed in CLI_MODES:
+            with self.subTest(mode=' '.join(args)):
+                packages = imported_packages(*args)
+                self.assertEqual(packages & HEAVY_MODULES - allowed, set())
+
+
+if __name__ == '__main__':
+    unittest.main()